@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""
+Regression benchmark for AdjacencyGraph.parseFile.
+
+Parses random properties-format graphs of increasing size and reports the
+cost per edge.  Parsing should be linear in the number of edges, so the
+per-edge cost of the largest input should stay close to that of the
+smallest; the script exits non-zero when it drifts past --max-ratio.
+"""
+import os, sys, gc, time, optparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from graph_adjacency_list import AdjacencyGraph, optionalNumpy
+from generators import random_adjacency, properties_lines
+
+
+def time_parse(num_edges, seed):
+    lines = list(properties_lines(random_adjacency(num_edges, seed=seed)))
+
+    # like timeit, keep the cyclic collector out of the measurement; its
+    # cost depends on heap size rather than on the parser
+    gc.disable()
+    try:
+        start = time.time()
+        graph = AdjacencyGraph()
+        graph.parseFile(lines)
+        graph.core.freeze()
+        elapsed = time.time() - start
+    finally:
+        gc.enable()
+
+    return elapsed, len(graph)
+
+
+if __name__ == '__main__':
+
+    op = optparse.OptionParser(usage="usage: %prog [options]")
+    op.add_option("--sizes", dest="sizes", default="10000,100000,1000000", help="Comma separated edge counts to benchmark")
+    op.add_option("--seed", dest="seed", type="int", default=0, help="Random seed for the generated graphs")
+    op.add_option("--max-ratio", dest="max_ratio", type="float", default=3.0, help="Largest allowed growth of the per-edge cost between the smallest and largest input")
+
+    (options, args) = op.parse_args()
+
+    sizes = [int(x) for x in options.sizes.split(',')]
+    # numpy is imported on first use, which the smallest size shouldn't pay for
+    optionalNumpy()
+    per_edge = []
+
+    print('%12s %12s %10s %14s' % ('edges', 'nodes', 'seconds', 'usec/edge'))
+    for size in sizes:
+        elapsed, nodes = time_parse(size, options.seed)
+        per_edge.append(elapsed / size)
+        print('%12d %12d %10.3f %14.3f' % (size, nodes, elapsed, 1e6 * elapsed / size))
+
+    ratio = per_edge[-1] / per_edge[0]
+    print('per-edge cost ratio (largest/smallest): %.2f' % ratio)
+
+    if ratio > options.max_ratio:
+        print('FAIL: parse time is growing faster than linearly')
+        sys.exit(1)
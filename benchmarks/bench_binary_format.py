@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+Compares reading graphs from text with opening them in the binary format
+of graph_binary.py, for both scripts.
+
+For graph_adjacency_list.py a random properties file is parsed, saved as
+bin and opened again; then both copies answer the same shallow --root
+--depth query, which on the mapped copy reads only the pages it needs.
+For mvndepgraph.py a generated mvn dependency:tree file is read with
+MavenDotReader and loaded from its bin copy.  Results are checked for
+equality.
+"""
+import os, sys, time, tempfile, optparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from graph_adjacency_list import AdjacencyGraph
+from mvndepgraph import MavenDotReader, DependencyGraph
+from graph_binary import BinaryGraphFile
+from generators import random_adjacency, properties_lines, maven_dot_lines
+
+
+def timed(fn, *args):
+    start = time.time()
+    result = fn(*args)
+    return time.time() - start, result
+
+
+def temp_file(suffix, lines=None):
+    fd, file_name = tempfile.mkstemp(suffix=suffix)
+    f = os.fdopen(fd, 'w')
+    if lines is not None:
+        f.writelines(lines)
+    f.close()
+    return file_name
+
+
+def mb(file_name):
+    return os.path.getsize(file_name) / float(1<<20)
+
+
+if __name__ == '__main__':
+
+    op = optparse.OptionParser(usage="usage: %prog [options]")
+    op.add_option("--edges", dest="edges", type="int", default=1000000, help="Edges in the generated graphs")
+    op.add_option("--depth", dest="depth", type="int", default=2, help="Depth of the subgraph query")
+    op.add_option("--seed", dest="seed", type="int", default=0, help="Random seed for the generated graphs")
+
+    (options, args) = op.parse_args()
+
+    text_name = temp_file('.properties', properties_lines(random_adjacency(options.edges, seed=options.seed)))
+    bin_name = temp_file('.bin')
+    try:
+        parse_time, parsed = timed(AdjacencyGraph.load, text_name)
+        write_time, ignored = timed(parsed.writeBinary, bin_name)
+        open_time, mapped = timed(AdjacencyGraph.fromBinary, bin_name)
+
+        root = parsed.core.names[len(parsed) // 2]
+        text_query, expected = timed(parsed.subgraph, [root], options.depth)
+        bin_query, found = timed(mapped.subgraph, [root], options.depth)
+        assert list(expected.core.names) == list(found.core.names), 'subgraphs differ'
+        assert expected.core.outAdjacency() == found.core.outAdjacency(), 'subgraphs differ'
+
+        print('graph_adjacency_list.py, %d edges, %d nodes' % (parsed.core.edgeCount(), len(parsed)))
+        print('  properties %.1f MB: parse %.3fs' % (mb(text_name), parse_time))
+        print('  bin %.1f MB: write %.3fs, open %.4fs' % (mb(bin_name), write_time, open_time))
+        print('  --root --depth %d (%d nodes): %.4fs parsed, %.4fs mapped, %.4fs open + query' % (
+            options.depth, len(found), text_query, bin_query, open_time + bin_query))
+    finally:
+        os.remove(text_name)
+        os.remove(bin_name)
+
+    dot_name = temp_file('.dot', maven_dot_lines(options.edges, seed=options.seed))
+    bin_name = temp_file('.bin')
+    try:
+        read_time, graph = timed(MavenDotReader().read_file, dot_name)
+        write_time, ignored = timed(graph.write_binary, bin_name)
+        load_time, loaded = timed(lambda: DependencyGraph.from_binary(BinaryGraphFile(bin_name)))
+        assert (graph.edges, graph.nodes, graph.node_positions) == (loaded.edges, loaded.nodes, loaded.node_positions), 'graphs differ'
+
+        print('mvndepgraph.py, %d edges' % len(graph.edges))
+        print('  dot %.1f MB: read %.3fs' % (mb(dot_name), read_time))
+        print('  bin %.1f MB: write %.3fs, load %.3fs (%.1fx)' % (mb(bin_name), write_time, load_time, read_time / load_time))
+    finally:
+        os.remove(dot_name)
+        os.remove(bin_name)
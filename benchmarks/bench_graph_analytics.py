@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""
+Times the phases of graph_analytics.GraphAnalytics on generated graphs of
+increasing size: a random graph, which is mostly one big cycle, and a DAG
+shaped like a dependency graph.
+
+Components, the condensation and the layers are linear in the size of the
+graph, so their per-edge cost should stay flat; the script exits non-zero
+when it grows past --max-ratio between the smallest and largest input.
+The transitive reduction is reported but not checked, as its cost
+depends on the shape of the graph.
+"""
+import os, sys, gc, time, optparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from graph_adjacency_list import AdjacencyGraph
+from graph_analytics import GraphAnalytics
+from generators import random_adjacency, dag_adjacency, properties_lines
+
+
+SHAPES = {'random': random_adjacency, 'dag': dag_adjacency}
+PHASES = ['components', 'condensation', 'layers', 'reduction']
+
+
+def time_phases(shape, num_edges, seed):
+    graph = AdjacencyGraph()
+    graph.parseFile(properties_lines(SHAPES[shape](num_edges, seed=seed)))
+
+    analytics = GraphAnalytics(graph)
+    timings = []
+
+    gc.disable()
+    try:
+        for phase in PHASES:
+            start = time.time()
+            getattr(analytics, phase)()
+            timings.append(time.time() - start)
+    finally:
+        gc.enable()
+
+    return graph.core.edgeCount(), analytics, timings
+
+
+if __name__ == '__main__':
+
+    op = optparse.OptionParser(usage="usage: %prog [options]")
+    op.add_option("--sizes", dest="sizes", default="100000,1000000", help="Comma separated edge counts to benchmark")
+    op.add_option("--shapes", dest="shapes", default="random,dag", help="Comma separated graph shapes, from %s" % ', '.join(sorted(SHAPES)))
+    op.add_option("--seed", dest="seed", type="int", default=0, help="Random seed for the generated graphs")
+    op.add_option("--max-ratio", dest="max_ratio", type="float", default=3.0, help="Largest allowed growth of the per-edge cost of the linear phases between the smallest and largest input")
+
+    (options, args) = op.parse_args()
+
+    sizes = [int(x) for x in options.sizes.split(',')]
+    failed = False
+
+    for shape in options.shapes.split(','):
+        print('%s graphs' % shape)
+        print('%10s %10s %8s  %s' % ('edges', 'sccs', 'layers', '  '.join('%14s' % ('%s (s)' % x) for x in PHASES)))
+        per_edge = []
+
+        for size in sizes:
+            edges, analytics, timings = time_phases(shape, size, options.seed)
+            per_edge.append(sum(timings[:3]) / edges)
+            print('%10d %10d %8d  %s' % (edges, analytics.componentCount, max(analytics.layers()) + 1, '  '.join('%14.3f' % x for x in timings)))
+
+        ratio = per_edge[-1] / per_edge[0]
+        print('per-edge cost ratio of the linear phases (largest/smallest): %.2f\n' % ratio)
+        failed = failed or ratio > options.max_ratio
+
+    if failed:
+        print('FAIL: components, condensation or layers are growing faster than linearly')
+        sys.exit(1)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+Times graph_analytics.GraphCoarsening on a generated reactor graph: picking
+a level for each of a few --max-nodes budgets and building the graph of
+clusters at that level, by groupId and by component.  Every edge must end
+up either inside a cluster or counted in the multiplicity of an edge
+between two clusters, which is checked.
+"""
+import os, sys, time, optparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from graph_analytics import GraphCoarsening
+from mvndepgraph import MavenDotReader, GraphProcessor
+from generators import maven_dot_lines
+
+
+def timed(fn, *args):
+    start = time.time()
+    result = fn(*args)
+    return time.time() - start, result
+
+
+def reactor(num_edges, modules, seed=0):
+    per_module = max(1, num_edges // modules)
+    graphs = [MavenDotReader().read(maven_dot_lines(per_module, 'module-%d' % i, per_module, seed)) for i in range(modules)]
+    return GraphProcessor.merge_graphs(graphs).to_adjacency()
+
+
+def internal_edges(coarsening, level, expand=()):
+    keys = coarsening.keys(level)
+    expand = set(expand)
+    offsets, targets = coarsening.graph.core.outAdjacency()
+    total = 0
+    for v in range(len(keys)):
+        if keys[v] is None or keys[v] in expand:
+            continue
+        for w in targets[offsets[v]:offsets[v+1]]:
+            if keys[w] == keys[v]:
+                total += 1
+    return total
+
+
+if __name__ == '__main__':
+
+    op = optparse.OptionParser(usage="usage: %prog [options]")
+    op.add_option("--edges", dest="edges", type="int", default=200000, help="Edges in the merged reactor graph")
+    op.add_option("--modules", dest="modules", type="int", default=10, help="Number of module trees in the reactor")
+    op.add_option("--budgets", dest="budgets", default='100000,1000,50', help="Comma separated --max-nodes budgets to try")
+    op.add_option("--seed", dest="seed", type="int", default=0, help="Random seed for the graph")
+
+    (options, args) = op.parse_args()
+
+    graph = reactor(options.edges, options.modules, options.seed)
+    edges = graph.core.edgeCount()
+    print('%d edges, %d nodes' % (edges, len(graph)))
+
+    for mode in ('group', 'scc'):
+        coarsening = GraphCoarsening(graph, mode)
+        for budget in [int(x) for x in options.budgets.split(',')]:
+            choose_time, level = timed(coarsening.chooseLevel, budget)
+            coarsen_time, (clusters, members, multiplicities) = timed(coarsening.coarsen, level)
+
+            assert sum(multiplicities.values()) + internal_edges(coarsening, level) == edges, 'edges were lost'
+
+            print('%s, --max-nodes %d: level %d chosen in %.3fs, %d nodes and %d edges built in %.3fs' % (
+                mode, budget, level, choose_time, len(clusters), clusters.core.edgeCount(), coarsen_time))
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+Times mvndepgraph's GraphDiff on two releases of a generated module: the
+second drops and adds a --churn share of the edges of the first and
+upgrades the same share of its artifacts.  Times the diff with and
+without squashing versions, and the changed neighborhood graph.  A sample
+of the changes is checked by scanning the edge lists.
+"""
+import os, sys, time, random, optparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from mvndepgraph import MavenDotReader, DependencyGraph, SquashVersionRule, GraphDiff
+from generators import maven_dot_lines
+
+
+def timed(fn, *args):
+    start = time.time()
+    result = fn(*args)
+    return time.time() - start, result
+
+
+def next_release(graph, churn, seed=0):
+    """
+    A copy of graph with a churn share of its edges dropped, as many
+    random ones added and a churn share of its artifacts given a new
+    version.
+    """
+    rnd = random.Random(seed)
+    names = graph.edge_node_names()
+
+    upgraded = {}
+    for name in rnd.sample(names, int(len(names) * churn)):
+        parts = name.split(':')
+        if len(parts) > SquashVersionRule.MVN_VERSION_POSITION:
+            parts[SquashVersionRule.MVN_VERSION_POSITION] += '-next'
+            upgraded[name] = ':'.join(parts)
+
+    release = DependencyGraph(graph.name, graph.graph_type, graph.attributes)
+    for src, dst, attributes in graph.edges:
+        if rnd.random() >= churn:
+            release.add_edge(upgraded.get(src, src), upgraded.get(dst, dst))
+
+    for _ in range(int(len(graph.edges) * churn)):
+        release.add_edge(rnd.choice(names), rnd.choice(names))
+
+    return release
+
+
+if __name__ == '__main__':
+
+    op = optparse.OptionParser(usage="usage: %prog [options]")
+    op.add_option("--edges", dest="edges", type="int", default=200000, help="Edges in each release")
+    op.add_option("--churn", dest="churn", type="float", default=0.01, help="Share of edges and artifacts that change between the releases")
+    op.add_option("--context", dest="context", type="int", default=1, help="Context levels of the changed neighborhood")
+    op.add_option("--check", dest="check", type="int", default=100, help="Number of changed edges to check against a scan of the edge lists")
+    op.add_option("--seed", dest="seed", type="int", default=0, help="Random seed for the graphs")
+
+    (options, args) = op.parse_args()
+
+    old = MavenDotReader().read(maven_dot_lines(options.edges, 'app', seed=options.seed))
+    new = next_release(old, options.churn, options.seed)
+
+    print('%d and %d edges, %.1f%% churn' % (len(old.edges), len(new.edges), 100 * options.churn))
+
+    for squash in (False, True):
+        diff_time, diff = timed(GraphDiff, old, new, squash)
+        graph_time, changed = timed(diff.changed_graph, options.context)
+        changes_time, changes = timed(diff.changes)
+
+        old_edges = [(src, dst) for src, dst, attributes in diff.old.edges]
+        new_edges = [(src, dst) for src, dst, attributes in diff.new.edges]
+        for edge in diff.added_edges[:options.check]:
+            assert edge in new_edges and edge not in old_edges, 'added edge is wrong'
+        for edge in diff.removed_edges[:options.check]:
+            assert edge in old_edges and edge not in new_edges, 'removed edge is wrong'
+
+        print('%s: diff %.3fs (%d edges added, %d removed, %d nodes added, %d removed, %d version changes)' % (
+            'squashed' if squash else 'versioned', diff_time, len(diff.added_edges), len(diff.removed_edges),
+            len(diff.added_nodes), len(diff.removed_nodes), len(diff.changed_versions)))
+        print('  neighborhood %.3fs (%d edges), change list %.3fs' % (graph_time, len(changed.edges), changes_time))
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+"""
+Compares mvndepgraph's MavenDotReader with pydot's general DOT parser on
+generated mvn dependency:tree files.
+
+pydot takes minutes on large inputs, so it is skipped above --pydot-max
+edges.  Where both run, their results are checked for equality.
+"""
+import os, sys, time, tempfile, optparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from mvndepgraph import MavenDotReader, DependencyGraph, read_dot_file
+from generators import maven_dot_lines
+
+
+def timed(fn, *args):
+    start = time.time()
+    result = fn(*args)
+    return time.time() - start, result
+
+
+def read_with_pydot(file_name):
+    return DependencyGraph.from_pydot(read_dot_file(file_name))
+
+
+if __name__ == '__main__':
+
+    op = optparse.OptionParser(usage="usage: %prog [options]")
+    op.add_option("--sizes", dest="sizes", default="10000,100000,1000000", help="Comma separated edge counts to benchmark")
+    op.add_option("--pydot-max", dest="pydot_max", type="int", default=10000, help="Largest input, in edges, to also parse with pydot")
+    op.add_option("--seed", dest="seed", type="int", default=0, help="Random seed for the generated files")
+
+    (options, args) = op.parse_args()
+
+    print('%10s %10s %12s %12s %10s' % ('edges', 'MB', 'native (s)', 'pydot (s)', 'speedup'))
+    for size in [int(x) for x in options.sizes.split(',')]:
+        fd, file_name = tempfile.mkstemp(suffix='.dot')
+        try:
+            f = os.fdopen(fd, 'w')
+            f.writelines(maven_dot_lines(size, seed=options.seed))
+            f.close()
+            mb = os.path.getsize(file_name) / float(1<<20)
+
+            native_time, native = timed(MavenDotReader().read_file, file_name)
+            assert native is not None
+
+            if size <= options.pydot_max:
+                pydot_time, parsed = timed(read_with_pydot, file_name)
+                assert (native.name, native.edges) == (parsed.name, parsed.edges), 'readers disagree'
+                print('%10d %10.1f %12.3f %12.3f %9.0fx' % (size, mb, native_time, pydot_time, pydot_time / native_time))
+            else:
+                print('%10d %10.1f %12.3f %12s %10s' % (size, mb, native_time, 'skipped', '-'))
+        finally:
+            os.remove(file_name)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+"""
+Output throughput of the DOT and GraphML printers, in MB/s.
+
+Each printer writes the same random graph to a temporary file, once with
+the default batching and output buffer and once with both disabled, so
+that every node and edge statement goes straight to file.write.
+"""
+import os, sys, time, tempfile, optparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from graph_adjacency_list import AdjacencyGraph, DotPrinter, GraphmlPrinter
+from generators import random_adjacency, properties_lines
+
+
+def time_print(printer, lines):
+    graph = AdjacencyGraph()
+    graph.parseFile(lines)
+
+    out = tempfile.TemporaryFile(mode='w')
+    try:
+        start = time.time()
+        printer.printGraph(graph, out)
+        out.flush()
+        elapsed = time.time() - start
+        size = out.tell()
+    finally:
+        out.close()
+
+    return elapsed, size
+
+
+if __name__ == '__main__':
+
+    op = optparse.OptionParser(usage="usage: %prog [options]")
+    op.add_option("--size", dest="size", type="int", default=500000, help="Number of edges in the generated graph")
+    op.add_option("--seed", dest="seed", type="int", default=0, help="Random seed for the generated graph")
+
+    (options, args) = op.parse_args()
+
+    lines = list(properties_lines(random_adjacency(options.size, seed=options.seed)))
+
+    print('%-8s %-10s %10s %10s %10s' % ('format', 'buffer', 'MB', 'seconds', 'MB/s'))
+    for fmt, printerClass in [('dot', DotPrinter), ('graphml', GraphmlPrinter)]:
+        for label, batchSize, bufferSize in [('batched', 4096, 1<<20), ('none', 1, 0)]:
+            printer = printerClass(None)
+            printer.batchSize = batchSize
+            printer.bufferSize = bufferSize
+            elapsed, size = time_print(printer, lines)
+            mb = size / float(1<<20)
+            print('%-8s %-10s %10.1f %10.3f %10.1f' % (fmt, label, mb, elapsed, mb / elapsed))
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+Compares the explicit-stack traversal used by the printers against the
+recursive printNode they used to have, on wide and deep synthetic graphs.
+
+The recursive version runs with a raised recursion limit; inputs deeper
+than it can handle are reported as failures rather than timed.
+"""
+import os, sys, time, optparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from graph_adjacency_list import AdjacencyGraph, DotPrinter, GraphmlPrinter
+from generators import chain_adjacency, fan_adjacency, cycle_adjacency, random_adjacency, properties_lines
+
+
+class NullFile(object):
+    """
+    Output sink that only counts what was written.
+    """
+
+    def __init__(self):
+        self.size=0
+
+    def write(self, data):
+        self.size+=len(data)
+
+
+class RecursiveMixin(object):
+    """
+    The recursive printNode the printers used before the shared traversal.
+    """
+
+    def printNode(self, node, file, skipNode=False, printed=None):
+        if printed[node.id]:
+            return
+
+        printed[node.id]=1
+
+        if not skipNode:
+            self.printNodeDeclaration(file, node.name)
+
+        for x in node.out_edges:
+            self.printNode(x, file, False, printed)
+            if not skipNode:
+                self.printEdge(file, self.makeNodeName(node.name), self.makeNodeName(x.name))
+
+
+class RecursiveDotPrinter(RecursiveMixin, DotPrinter):
+    pass
+
+
+class RecursiveGraphmlPrinter(RecursiveMixin, GraphmlPrinter):
+    pass
+
+
+def make_graph(lines):
+    graph = AdjacencyGraph()
+    graph.parseFile(lines)
+    return graph
+
+
+def time_print(printer, graph):
+    out = NullFile()
+
+    start = time.time()
+    try:
+        printer.printGraph(graph, out)
+    except RuntimeError:
+        # RecursionError is a RuntimeError
+        return None, out.size
+
+    return time.time() - start, out.size
+
+
+if __name__ == '__main__':
+
+    op = optparse.OptionParser(usage="usage: %prog [options]")
+    op.add_option("--size", dest="size", type="int", default=100000, help="Approximate number of edges per generated graph")
+    op.add_option("--recursion-limit", dest="recursion_limit", type="int", default=10000, help="Recursion limit used for the recursive printers")
+
+    (options, args) = op.parse_args()
+
+    size = options.size
+    shapes = [
+        ('deep chain', list(properties_lines(chain_adjacency(size)))),
+        ('large cycle', list(properties_lines(cycle_adjacency(size)))),
+        ('wide fan', list(properties_lines(fan_adjacency(size)))),
+        ('fan tree', list(properties_lines(fan_adjacency(int(size ** 0.5), 2)))),
+        ('random', list(properties_lines(random_adjacency(size)))),
+    ]
+    printers = [
+        ('dot', DotPrinter, RecursiveDotPrinter),
+        ('graphml', GraphmlPrinter, RecursiveGraphmlPrinter),
+    ]
+
+    sys.setrecursionlimit(options.recursion_limit)
+
+    print('%-12s %-8s %14s %14s' % ('graph', 'format', 'iterative (s)', 'recursive (s)'))
+    for shape, lines in shapes:
+        graph = make_graph(lines)
+        for fmt, iterative, recursive in printers:
+            it_time, it_size = time_print(iterative(None), graph)
+            rec_time, rec_size = time_print(recursive(None), graph)
+
+            if rec_time is None:
+                rec_col = 'RecursionError'
+            else:
+                rec_col = '%.3f' % rec_time
+                if rec_size != it_size:
+                    rec_col += ' (output differs)'
+
+            print('%-12s %-8s %14.3f %14s' % (shape, fmt, it_time, rec_col))
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+Times mvndepgraph's ReachabilityIndex on a generated reactor: building,
+saving and loading the index, then answering random point queries.  A
+sample of the answers is checked against a breadth-first search of the
+graph.
+"""
+import os, sys, time, random, tempfile, optparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from mvndepgraph import MavenDotReader, GraphProcessor, ReachabilityIndex
+from generators import maven_dot_lines
+
+
+def reactor(num_edges, modules, seed=0):
+    per_module = max(1, num_edges // modules)
+    graphs = [MavenDotReader().read(maven_dot_lines(per_module, 'module-%d' % i, per_module, seed)) for i in range(modules)]
+    return GraphProcessor.merge_graphs(graphs)
+
+
+def search(graph, src, dst):
+    adjacency = graph.adjacency()
+    seen = set([src])
+    queue = [src]
+    for name in queue:
+        if name == dst:
+            return True
+        for i in adjacency.get(name, ()):
+            x = graph.edges[i][1]
+            if x not in seen:
+                seen.add(x)
+                queue.append(x)
+    return False
+
+
+def walk_pair(graph, names, rnd, steps=8):
+    """
+    A (source, target) pair of node names where the target is found by a
+    random walk from the source, so that it is reachable.
+    """
+    adjacency = graph.adjacency()
+    src = dst = rnd.choice(names)
+    for _ in range(rnd.randint(1, steps)):
+        out = adjacency.get(dst)
+        if not out:
+            break
+        dst = graph.edges[rnd.choice(out)][1]
+    return src, dst
+
+
+def timed(fn, *args):
+    start = time.time()
+    result = fn(*args)
+    return time.time() - start, result
+
+
+if __name__ == '__main__':
+
+    op = optparse.OptionParser(usage="usage: %prog [options]")
+    op.add_option("--edges", dest="edges", type="int", default=100000, help="Edges in the merged reactor graph")
+    op.add_option("--modules", dest="modules", type="int", default=10, help="Number of module trees in the reactor")
+    op.add_option("--queries", dest="queries", type="int", default=100000, help="Number of point queries to time")
+    op.add_option("--check", dest="check", type="int", default=200, help="Number of answers to check against a graph search")
+    op.add_option("--seed", dest="seed", type="int", default=0, help="Random seed for the graph and the queries")
+
+    (options, args) = op.parse_args()
+
+    graph = reactor(options.edges, options.modules, options.seed)
+
+    build_time, index = timed(ReachabilityIndex.build, graph)
+
+    fd, file_name = tempfile.mkstemp(suffix='.index')
+    os.close(fd)
+    try:
+        save_time, ignored = timed(index.save, file_name)
+        size = os.path.getsize(file_name)
+        load_time, index = timed(ReachabilityIndex.load, file_name)
+    finally:
+        os.remove(file_name)
+
+    rnd = random.Random(options.seed)
+    n = len(index.names)
+    # half random pairs, mostly unreachable, and half found by walking edges
+    pairs = [(rnd.randrange(n), rnd.randrange(n)) for _ in range(options.queries // 2)]
+    sources = [name for name in index.names if graph.adjacency().get(name)]
+    for _ in range(options.queries - len(pairs)):
+        src, dst = walk_pair(graph, sources, rnd)
+        pairs.append((index.ids[src], index.ids[dst]))
+    rnd.shuffle(pairs)
+
+    # the first pass also decodes the labels it needs
+    cold_time, answers = timed(lambda: [index.reaches(s, d) for s, d in pairs])
+    warm_time, answers = timed(lambda: [index.reaches(s, d) for s, d in pairs])
+
+    for s, d in pairs[:options.check]:
+        assert index.reaches(s, d) == search(graph, index.names[s], index.names[d]), 'index disagrees with search'
+
+    print('%d edges, %d nodes, %d components' % (len(graph.edges), n, len(index.offsets) - 1))
+    print('build %.3fs, save %.3fs (%.1f MB), load %.3fs' % (build_time, save_time, size / float(1<<20), load_time))
+    print('%d queries, %d%% reachable: %.2f usec/query cold, %.2f usec/query warm' % (
+        len(pairs), 100 * sum(answers) // max(1, len(answers)), 1e6 * cold_time / len(pairs), 1e6 * warm_time / len(pairs)))
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+Times mvndepgraph's version squashing on a generated reactor: several
+module trees drawn from a shared artifact pool, merged into one graph.
+
+SquashVersionRule.squash_graph, which makes one pass with memoized keys
+and deduplicated edges, is compared with calling apply() edge by edge.
+Both must give the same edges, ignoring duplicates, and the same version
+sets.
+"""
+import os, sys, time, optparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from mvndepgraph import MavenDotReader, DependencyGraph, GraphProcessor, SquashVersionRule
+from generators import maven_dot_lines
+
+
+def reactor(num_edges, modules, seed=0):
+    """
+    Merge modules generated module trees into one DependencyGraph with
+    about num_edges edges.
+    """
+    per_module = max(1, num_edges // modules)
+    graphs = [MavenDotReader().read(maven_dot_lines(per_module, 'module-%d' % i, per_module, seed)) for i in range(modules)]
+    return GraphProcessor.merge_graphs(graphs)
+
+
+def squash_per_edge(graph):
+    rule = SquashVersionRule()
+    squashed = DependencyGraph(graph.name, graph.graph_type, graph.attributes)
+    for name, attributes in graph.nodes:
+        squashed.add_node(name, dict(attributes))
+    for e in graph.edges:
+        rule.apply(squashed, e)
+    return squashed
+
+
+def summary(graph):
+    return (sorted(set((src, dst) for src, dst, attributes in graph.edges)),
+            sorted((name, sorted(attributes.get('versions') or ())) for name, attributes in graph.nodes))
+
+
+def timed(fn, *args):
+    start = time.time()
+    result = fn(*args)
+    return time.time() - start, result
+
+
+if __name__ == '__main__':
+
+    op = optparse.OptionParser(usage="usage: %prog [options]")
+    op.add_option("--edges", dest="edges", type="int", default=100000, help="Edges in the merged reactor graph")
+    op.add_option("--modules", dest="modules", type="int", default=10, help="Number of module trees in the reactor")
+    op.add_option("--repeat", dest="repeat", type="int", default=3, help="Runs of each variant; the fastest is reported")
+    op.add_option("--seed", dest="seed", type="int", default=0, help="Random seed for the generated modules")
+
+    (options, args) = op.parse_args()
+
+    graph = reactor(options.edges, options.modules, options.seed)
+
+    one_pass = min(timed(SquashVersionRule().squash_graph, graph) for _ in range(options.repeat))
+    per_edge = min(timed(squash_per_edge, graph) for _ in range(options.repeat))
+
+    assert summary(one_pass[1]) == summary(per_edge[1]), 'squash variants disagree'
+
+    print('%d edges in %d modules, %d after squashing (%d without deduplication)' % (
+        len(graph.edges), options.modules, len(one_pass[1].edges), len(per_edge[1].edges)))
+    print('%-12s %10s' % ('variant', 'time (s)'))
+    print('%-12s %10.3f' % ('per edge', per_edge[0]))
+    print('%-12s %10.3f' % ('one pass', one_pass[0]))
+    print('speedup %.1fx' % (per_edge[0] / one_pass[0]))
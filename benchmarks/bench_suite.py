@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+"""
+Times every phase of both scripts on generated inputs of several sizes
+and saves the results as JSON, so that runs can be compared.
+
+Each case is a kind of input, and each (case, size) pair runs in a fresh
+interpreter, so that its peak RSS isn't inflated by earlier runs.  After
+each phase the child process records the wall time of the phase and the
+peak RSS of the process so far.
+
+  adjacency cases (chain, fan, random, dag, cycle): properties files read
+  by graph_adjacency_list.py; phases parse, print_dot and print_graphml.
+
+  maven: a reactor of --modules generated mvn dependency:tree files which
+  disagree on some versions, put through the steps of
+  GraphProcessor.process_graphs; phases pydot_load (up to --pydot-max
+  edges only, it is slow), read, squash, merge, analyze, styles and
+  write_dot.
+
+With --baseline, or given two saved result files and no run, prints the
+change in time of every phase and exits non-zero when one got slower than
+--max-slowdown times (phases quicker than --min-seconds are only shown).
+"""
+import os, sys, time, json, shutil, platform, tempfile, subprocess, optparse
+from itertools import islice
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from graph_adjacency_list import AdjacencyGraph, PRINTERS
+from instrumentation import peak_rss_mb
+from mvndepgraph import (NodeStyleRule, NodeStyleRuleSet, SquashVersionRule, GraphProcessor, DependencyGraph,
+                         DotWriter, read_dot_file)
+from generators import (random_adjacency, properties_lines, chain_adjacency, fan_adjacency, cycle_adjacency,
+                        dag_adjacency, maven_dot_lines)
+
+
+FAN_WIDTH=8
+
+ADJACENCY_CASES={
+    'chain': lambda size, seed: chain_adjacency(size),
+    # enough levels for size edges, cut off there
+    'fan': lambda size, seed: islice(fan_adjacency(FAN_WIDTH, 12), max(1, size // FAN_WIDTH)),
+    'random': lambda size, seed: random_adjacency(size, seed=seed),
+    'dag': lambda size, seed: dag_adjacency(size, seed=seed),
+    'cycle': lambda size, seed: cycle_adjacency(size),
+}
+
+CASES=sorted(ADJACENCY_CASES) + ['maven']
+
+STYLE_RULES=[
+    {'pattern': '^.*$', 'attributes': {'shape': 'box'}},
+    {'pattern': '^"org\\.example\\.g1[0-9]*:.*$', 'attributes': {'fillcolor': '#ff0000', 'style': 'filled'}},
+    {'pattern': '^.*:test"$', 'attributes': {'fillcolor': '#cccccc', 'style': 'filled'}},
+    {'pattern': '^.*artifact-[0-9]*7:.*$', 'attributes': {'color': '#0000ff'}},
+]
+
+
+class PhaseTimer(object):
+    """
+    Collects the time and peak RSS of consecutive phases.
+    """
+
+    def __init__(self):
+        self.phases=[]
+
+    def run(self, phase, fn, *args):
+        start = time.time()
+        result = fn(*args)
+        self.phases.append({'phase': phase, 'seconds': time.time() - start, 'peak_rss_mb': peak_rss_mb()})
+        return result
+
+
+def print_to_file(printer, graph, file_name):
+    out = open(file_name, 'w')
+    try:
+        printer.printGraph(graph, out)
+    finally:
+        out.close()
+
+
+def run_adjacency(case, size, seed, work_dir, timer):
+    file_name = os.path.join(work_dir, 'graph.properties')
+    f = open(file_name, 'w')
+    f.writelines(properties_lines(ADJACENCY_CASES[case](size, seed)))
+    f.close()
+
+    def parse():
+        graph = AdjacencyGraph()
+        f = open(file_name, 'r')
+        try:
+            graph.parseFile(f)
+        finally:
+            f.close()
+        return graph
+
+    graph = timer.run('parse', parse)
+
+    for fmt in sorted(PRINTERS):
+        # every node is printed, whether the first one reaches it or not
+        printer = PRINTERS[fmt](None)
+        printer.printUnreached = True
+        timer.run('print_%s' % fmt, print_to_file, printer, graph, os.path.join(work_dir, 'out.' + fmt))
+
+
+def run_maven(size, seed, modules, pydot_max, work_dir, timer):
+    per_module = max(1, size // modules)
+    file_names = []
+
+    for i in range(modules):
+        file_names.append(os.path.join(work_dir, 'module-%d.dot' % i))
+        f = open(file_names[-1], 'w')
+        f.writelines(maven_dot_lines(per_module, 'module-%d' % i, per_module, seed))
+        f.close()
+
+    if size <= pydot_max:
+        timer.run('pydot_load', lambda: [DependencyGraph.from_pydot(read_dot_file(x)) for x in file_names])
+
+    graphs = timer.run('read', GraphProcessor.load_graphs, file_names)
+    graphs = timer.run('squash', lambda: [GraphProcessor.do_squash_versions(g) for g in graphs])
+    graph = timer.run('merge', GraphProcessor.merge_graphs, graphs)
+    timer.run('analyze', GraphProcessor.analyze_graphs, graph, graphs)
+
+    def styles():
+        for name, attributes in graph.nodes:
+            SquashVersionRule.clean_version_tag(attributes)
+        rules = NodeStyleRule.from_json(STYLE_RULES)
+        NodeStyleRuleSet(rules).apply(graph, graph.edge_node_names())
+
+    timer.run('styles', styles)
+
+    def write_dot():
+        out = open(os.path.join(work_dir, 'out.dot'), 'w')
+        try:
+            DotWriter(out).write(graph)
+        finally:
+            out.close()
+
+    timer.run('write_dot', write_dot)
+
+
+def run_case(case, size, options):
+    """
+    Run one case in this process, returning the list of its phases.
+    """
+    timer = PhaseTimer()
+    work_dir = tempfile.mkdtemp(prefix='bench-suite-')
+    try:
+        if case == 'maven':
+            run_maven(size, options.seed, options.modules, options.pydot_max, work_dir, timer)
+        else:
+            run_adjacency(case, size, options.seed, work_dir, timer)
+    finally:
+        shutil.rmtree(work_dir)
+    return timer.phases
+
+
+def spawn_case(case, size, options):
+    """
+    Run one case in a child interpreter and return its phases.
+    """
+    command = [sys.executable, os.path.abspath(__file__), '--run-case', '%s:%d' % (case, size),
+               '--seed', str(options.seed), '--modules', str(options.modules), '--pydot-max', str(options.pydot_max)]
+    output = subprocess.check_output(command)
+    return json.loads(output.decode('utf-8'))
+
+
+def best_of(runs):
+    """
+    Merge repeated runs of one case: the fastest time and the highest
+    peak RSS of every phase.
+    """
+    phases = runs[0]
+    for run in runs[1:]:
+        for best, phase in zip(phases, run):
+            best['seconds'] = min(best['seconds'], phase['seconds'])
+            if phase['peak_rss_mb'] is not None:
+                best['peak_rss_mb'] = max(best['peak_rss_mb'], phase['peak_rss_mb'])
+    return phases
+
+
+def result_key(result):
+    return (result['case'], result['size'], result['phase'])
+
+
+def compare(old, new, max_slowdown, min_seconds):
+    """
+    Print the time of each phase in both result sets, returning the keys
+    of the phases more than max_slowdown times slower in new, ignoring
+    those that took less than min_seconds in old.
+    """
+    before = dict((result_key(x), x) for x in old['results'])
+    slower = []
+
+    print('%-8s %10s %-14s %10s %10s %8s' % ('case', 'edges', 'phase', 'old (s)', 'new (s)', 'ratio'))
+    for result in new['results']:
+        key = result_key(result)
+        if key not in before:
+            continue
+        ratio = result['seconds'] / max(before[key]['seconds'], 1e-6)
+        flag = ''
+        if ratio > max_slowdown and before[key]['seconds'] >= min_seconds:
+            slower.append(key)
+            flag = ' SLOWER'
+        print('%-8s %10d %-14s %10.3f %10.3f %8.2f%s' % (key + (before[key]['seconds'], result['seconds'], ratio, flag)))
+
+    return slower
+
+
+def load_results(file_name):
+    f = open(file_name, 'r')
+    try:
+        return json.load(f)
+    finally:
+        f.close()
+
+
+if __name__ == '__main__':
+
+    op = optparse.OptionParser(usage="usage: %prog [options] [OLD_RESULTS NEW_RESULTS]")
+    op.add_option("--cases", dest="cases", default=','.join(CASES), help="Comma separated cases to run, out of %s" % ', '.join(CASES))
+    op.add_option("--sizes", dest="sizes", default="1000,10000,100000", help="Comma separated edge counts to benchmark")
+    op.add_option("--repeat", dest="repeat", type="int", default=1, help="Runs of each case, keeping the fastest time of each phase")
+    op.add_option("--modules", dest="modules", type="int", default=4, help="Number of module trees in the maven case")
+    op.add_option("--pydot-max", dest="pydot_max", type="int", default=1000, help="Largest maven case, in edges, to also load with pydot")
+    op.add_option("--seed", dest="seed", type="int", default=0, help="Random seed for the generated inputs")
+    op.add_option("-o", dest="output_file", default=None, help="Save the results to this JSON file")
+    op.add_option("--baseline", dest="baseline", default=None, help="Compare the results with those saved in this JSON file")
+    op.add_option("--max-slowdown", dest="max_slowdown", type="float", default=1.25, help="Largest allowed ratio of a phase's time to its baseline")
+    op.add_option("--min-seconds", dest="min_seconds", type="float", default=0.05, help="Phases faster than this in the baseline are too noisy to count as slower")
+    op.add_option("--run-case", dest="run_case", default=None, help=optparse.SUPPRESS_HELP)
+
+    (options, args) = op.parse_args()
+
+    if options.run_case:
+        case, size = options.run_case.split(':')
+        sys.stdout.write(json.dumps(run_case(case, int(size), options)))
+        sys.exit(0)
+
+    if args:
+        if len(args) != 2:
+            op.error("Give two result files to compare, or none to run the benchmarks.")
+        sys.exit(1 if compare(load_results(args[0]), load_results(args[1]), options.max_slowdown, options.min_seconds) else 0)
+
+    cases = options.cases.split(',')
+    for case in cases:
+        if case not in CASES:
+            op.error("Unknown case '%s'." % case)
+
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'seed': options.seed,
+        'modules': options.modules,
+        'results': [],
+    }
+
+    print('%-8s %10s %-14s %10s %12s' % ('case', 'edges', 'phase', 'seconds', 'peak RSS MB'))
+    for case in cases:
+        for size in [int(x) for x in options.sizes.split(',')]:
+            phases = best_of([spawn_case(case, size, options) for _ in range(options.repeat)])
+            for phase in phases:
+                phase.update(case=case, size=size)
+                results['results'].append(phase)
+                rss = phase['peak_rss_mb']
+                print('%-8s %10d %-14s %10.3f %12s' % (case, size, phase['phase'], phase['seconds'], '-' if rss is None else '%.1f' % rss))
+
+    if options.output_file:
+        f = open(options.output_file, 'w')
+        try:
+            json.dump(results, f, indent=2, sort_keys=True)
+        finally:
+            f.close()
+
+    if options.baseline:
+        print('')
+        if compare(load_results(options.baseline), results, options.max_slowdown, options.min_seconds):
+            sys.exit(1)
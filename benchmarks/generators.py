@@ -0,0 +1,141 @@
+"""
+Seeded synthetic graph generators shared by the benchmark scripts.
+
+Every generator is deterministic for a given seed, so timings taken on
+different runs (or different checkouts) are made against identical input.
+"""
+import random
+
+
+def random_adjacency(num_edges, fanout=4, seed=0):
+    """
+    Yield (source, [targets]) pairs describing a random directed graph with
+    roughly num_edges edges and an average out-degree of fanout.
+    """
+    rnd = random.Random(seed)
+    num_nodes = max(2, num_edges // fanout)
+    emitted = 0
+    src = 0
+
+    while emitted < num_edges:
+        count = min(rnd.randint(1, 2 * fanout - 1), num_edges - emitted)
+        targets = ['n%d' % rnd.randrange(num_nodes) for _ in range(count)]
+        yield ('n%d' % (src % num_nodes), targets)
+        emitted += count
+        src += 1
+
+
+def properties_lines(adjacency):
+    """
+    Render (source, [targets]) pairs in the properties format read by
+    graph_adjacency_list.AdjacencyGraph.
+    """
+    for src, targets in adjacency:
+        yield '%s=%s\n' % (src, ','.join(targets))
+
+
+def chain_adjacency(length, prefix='c'):
+    """
+    Yield a single path of length edges: c0 -> c1 -> ... -> c<length>.
+    """
+    for i in range(length):
+        yield ('%s%d' % (prefix, i), ['%s%d' % (prefix, i + 1)])
+
+
+def fan_adjacency(width, depth=1, prefix='f'):
+    """
+    Yield a tree in which every node has width children, depth levels deep.
+    """
+    level = ['%s0' % prefix]
+    counter = 1
+
+    for _ in range(depth):
+        next_level = []
+        for src in level:
+            targets = ['%s%d' % (prefix, counter + i) for i in range(width)]
+            counter += width
+            next_level.extend(targets)
+            yield (src, targets)
+        level = next_level
+
+
+def cycle_adjacency(length, prefix='k'):
+    """
+    Yield a root feeding a single cycle of length nodes.
+    """
+    yield ('%sroot' % prefix, ['%s0' % prefix])
+    for i in range(length):
+        yield ('%s%d' % (prefix, i), ['%s%d' % (prefix, (i + 1) % length)])
+
+
+def maven_coordinates(num_artifacts, versions_per_artifact=3, seed=0):
+    """
+    Return a list of num_artifacts lists of group:artifact:type:version
+    coordinates, one entry per available version of the artifact.
+    """
+    rnd = random.Random(seed)
+    groups = ['org.example.g%d' % i for i in range(max(1, num_artifacts // 20))]
+    artifacts = []
+
+    for i in range(num_artifacts):
+        ga = '%s:artifact-%d:jar' % (rnd.choice(groups), i)
+        major = rnd.randint(1, 9)
+        artifacts.append(['%s:%d.%d.%d' % (ga, major, minor, rnd.randint(0, 20)) for minor in range(versions_per_artifact)])
+
+    return artifacts
+
+
+def maven_dot_lines(num_edges, name='module', num_artifacts=None, seed=0):
+    """
+    Yield the lines of a mvn dependency:tree -DoutputType=dot file with
+    num_edges edges.  Artifacts are drawn from a pool shared by every file
+    generated with the same num_artifacts and seed, so graphs generated
+    for different modules overlap and disagree on some versions.
+    """
+    if num_artifacts is None:
+        num_artifacts = max(10, num_edges // 2)
+
+    pool = maven_coordinates(num_artifacts, seed=seed)
+    rnd = random.Random('%s-%d' % (name, seed))
+    scopes = ['compile', 'compile', 'compile', 'runtime', 'test', 'provided']
+
+    root = 'org.example:%s:jar:1.0-SNAPSHOT' % name
+    yield 'digraph "%s" { \n' % root
+
+    # each module resolves one version per artifact, picked per module
+    chosen = {}
+    def coordinate(i):
+        if i not in chosen:
+            chosen[i] = '%s:%s' % (rnd.choice(pool[i]), rnd.choice(scopes))
+        return chosen[i]
+
+    # direct dependencies of the root, then a random DAG beneath them
+    direct = min(num_edges, max(1, num_edges // 10))
+    for i in range(direct):
+        yield '\t"%s" -> "%s" ; \n' % (root, coordinate(i))
+
+    for _ in range(num_edges - direct):
+        src = rnd.randrange(num_artifacts - 1)
+        dst = rnd.randrange(src + 1, num_artifacts)
+        yield '\t"%s" -> "%s" ; \n' % (coordinate(src), coordinate(dst))
+
+    yield ' } \n'
+
+
+def dag_adjacency(num_edges, fanout=4, window=1000, seed=0):
+    """
+    Yield (source, [targets]) pairs describing a random DAG with roughly
+    num_edges edges, where node i only depends on nodes numbered up to
+    window above it, much like libraries depending on lower level ones.
+    """
+    rnd = random.Random(seed)
+    num_nodes = max(2, num_edges // fanout)
+    emitted = 0
+
+    for src in range(num_nodes - 1):
+        if emitted >= num_edges:
+            break
+        top = min(num_nodes - 1, src + window)
+        count = min(rnd.randint(1, 2 * fanout - 1), num_edges - emitted, top - src)
+        yield ('d%d' % src, ['d%d' % x for x in rnd.sample(range(src + 1, top + 1), count)])
+        emitted += count
@@ -1,6 +1,30 @@
 #!/usr/bin/env python
 
 import sys, re, optparse
+from array import array
+
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+# looked for on first use, as it takes longer to import than most runs
+# spend building CSR arrays; None once found missing
+numpy = False
+
+def optionalNumpy():
+    global numpy
+    if numpy is False:
+        try:
+            import numpy as module
+        except ImportError:
+            module = None
+        numpy = module
+    return numpy
+
+import instrumentation
+from instrumentation import stats
+import graph_binary
 
 __doc__="""
 
@@ -12,31 +36,248 @@ For more information on graphviz, see http://www.graphviz.org. For more informat
 
 """
 
+class GraphCore(object):
+    """
+    Compact storage behind AdjacencyGraph.  Node names are interned to dense
+    integer IDs, and edges are kept in compressed sparse row (CSR) form for
+    both directions: the out-neighbours of node i are
+    outTargets[outOffsets[i]:outOffsets[i+1]], and likewise for in-neighbours.
+
+    Edges are appended to a pending list while parsing and folded into the
+    CSR arrays the first time adjacency is asked for.  Out-neighbours keep
+    the order their edges were added in.
+    """
+
+    def __init__(self):
+        self.names=[]
+        self.ids={}
+        self.pendingSources=array('i')
+        self.pendingTargets=array('i')
+        self.outOffsets=array('l', [0])
+        self.outTargets=array('i')
+        self.inOffsets=array('l', [0])
+        self.inTargets=array('i')
+
+    def intern(self, name):
+        i = self.ids.get(name)
+
+        if i is None:
+            i = len(self.names)
+            self.ids[name] = i
+            self.names.append(name)
+
+        return i
+
+    def addEdge(self, src, dst):
+        self.pendingSources.append(src)
+        self.pendingTargets.append(dst)
+
+    def freeze(self):
+        """
+        Rebuild the CSR arrays if edges or nodes were added since the last
+        build.
+        """
+        n = len(self.names)
+
+        if not self.pendingSources and len(self.outOffsets) == n + 1:
+            return
+
+        if self.outTargets:
+            # expand the current CSR back to an edge list, then append pending
+            sources = array('i')
+            for i in range(len(self.outOffsets) - 1):
+                sources.extend(array('i', [i]) * (self.outOffsets[i+1] - self.outOffsets[i]))
+            sources.extend(self.pendingSources)
+            targets = self.outTargets + self.pendingTargets
+        else:
+            sources = self.pendingSources
+            targets = self.pendingTargets
+
+        self.outOffsets, self.outTargets = GraphCore.buildCsr(n, sources, targets)
+        self.inOffsets, self.inTargets = GraphCore.buildCsr(n, targets, sources)
+        self.pendingSources = array('i')
+        self.pendingTargets = array('i')
+
+    def outAdjacency(self):
+        self.freeze()
+        return self.outOffsets, self.outTargets
+
+    def inAdjacency(self):
+        self.freeze()
+        return self.inOffsets, self.inTargets
+
+    def edgeCount(self):
+        return len(self.outTargets) + len(self.pendingTargets)
+
+    @staticmethod
+    def arrayFromBytes(typecode, data):
+        a = array(typecode)
+        if hasattr(a, 'frombytes'):
+            a.frombytes(data)
+        else:
+            a.fromstring(data)
+        return a
+
+    @staticmethod
+    def buildCsr(n, keys, values):
+        """
+        Stable counting sort of values by keys, returning (offsets, sorted
+        values).  Uses NumPy when it is installed.
+        """
+        numpy = optionalNumpy() if keys else None
+        if numpy is not None:
+            k = numpy.frombuffer(keys, dtype=numpy.intc)
+            order = numpy.argsort(k, kind='stable')
+            offsets = numpy.zeros(n + 1, dtype=numpy.dtype('l'))
+            numpy.cumsum(numpy.bincount(k, minlength=n), out=offsets[1:])
+            sortedValues = numpy.frombuffer(values, dtype=numpy.intc)[order]
+            return GraphCore.arrayFromBytes('l', offsets.tobytes()), GraphCore.arrayFromBytes('i', sortedValues.tobytes())
+
+        counts = [0] * (n + 1)
+        for k in keys:
+            counts[k + 1] += 1
+        for i in range(n):
+            counts[i + 1] += counts[i]
+
+        offsets = array('l', counts)
+        position = counts[:n]
+        sortedValues = array('i', [0]) * len(values)
+
+        for k, v in zip(keys, values):
+            sortedValues[position[k]] = v
+            position[k] += 1
+
+        return offsets, sortedValues
+
+
+
+class MappedGraphCore(GraphCore):
+    """
+    GraphCore over the sections of a graph_binary file: the names and CSR
+    arrays are read from the mapping as they are used, and names are
+    looked up by binary search rather than in a dict.  The first change to
+    the graph copies everything into an ordinary GraphCore layout.
+    """
+
+    def __init__(self, binary):
+        self.binary=binary
+        self.names=binary.names()
+        self.ids=graph_binary.NameIndex(self.names)
+        self.pendingSources=array('i')
+        self.pendingTargets=array('i')
+        self.outOffsets=binary.section('out.offsets')
+        self.outTargets=binary.section('out.targets')
+        self.inOffsets=binary.section('in.offsets')
+        self.inTargets=binary.section('in.targets')
+        self.mapped=True
+
+    def thaw(self):
+        if self.mapped:
+            self.names = list(self.names)
+            self.ids = dict((name, i) for i, name in enumerate(self.names))
+            self.outOffsets = array('l', self.outOffsets)
+            self.outTargets = array('i', self.outTargets)
+            self.inOffsets = array('l', self.inOffsets)
+            self.inTargets = array('i', self.inTargets)
+            self.mapped = False
+
+    def intern(self, name):
+        self.thaw()
+        return GraphCore.intern(self, name)
+
+    def addEdge(self, src, dst):
+        self.thaw()
+        GraphCore.addEdge(self, src, dst)
+
+
+
 class Node(object):
+    """
+    Lightweight view of one node of an AdjacencyGraph.  Views are created on
+    demand and compare equal when they refer to the same node.
+    """
 
-    def __init__(self, name):
-        self.color=None
-        self.name=name
-        self.out_edges=[]
-        self.in_edges=[]
-        self.printed=False
+    __slots__ = ('graph', 'id')
 
-    def add_out_edge(self, out_node):
-        self.out_edges.append(out_node)
-        out_node.add_in_edge(self)
+    def __init__(self, graph, id):
+        self.graph=graph
+        self.id=id
 
-    def add_in_edge(self, in_node):
-        self.in_edges.append(in_node)
+    def __eq__(self, other):
+        return isinstance(other, Node) and self.graph is other.graph and self.id == other.id
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.id)
+
+    @property
+    def name(self):
+        return self.graph.core.names[self.id]
+
+    @property
+    def out_edges(self):
+        offsets, targets = self.graph.core.outAdjacency()
+        return [Node(self.graph, x) for x in targets[offsets[self.id]:offsets[self.id+1]]]
+
+    @property
+    def in_edges(self):
+        offsets, targets = self.graph.core.inAdjacency()
+        return [Node(self.graph, x) for x in targets[offsets[self.id]:offsets[self.id+1]]]
+
+    def add_out_edge(self, out_node):
+        self.graph.core.addEdge(self.id, out_node.id)
 
 
 class AdjacencyGraph(object):
 
     def __init__(self):
-        self.nodes=[]
+        # names are interned in order of first appearance, which keeps the
+        # output deterministic
+        self.core=GraphCore()
+
+    def __len__(self):
+        return len(self.core.names)
+
+    @property
+    def nodes(self):
+        return [Node(self, i) for i in range(len(self.core.names))]
+
+    @staticmethod
+    def load(fileName):
+        """
+        Read the named file, a graph_binary file or a properties file.
+        """
+        if graph_binary.is_binary(fileName):
+            return AdjacencyGraph.fromBinary(fileName)
+
+        graph = AdjacencyGraph()
+        inputFile = open(fileName, 'r')
+        try:
+            graph.parseFile(inputFile)
+        finally:
+            inputFile.close()
+        return graph
+
+    @staticmethod
+    def fromBinary(fileName):
+        """
+        Open a graph_binary file without reading it: see MappedGraphCore.
+        """
+        graph = AdjacencyGraph()
+        graph.core = MappedGraphCore(graph_binary.BinaryGraphFile(fileName))
+        return graph
+
+    def writeBinary(self, fileName):
+        core = self.core
+        graph_binary.write_graph(fileName, core.names, core.outAdjacency(), core.inAdjacency())
 
     def parseFile(self, inputFile):
         for line in inputFile:
             self.parseLine(line)
+        # build the adjacency arrays now, so printing only ever reads them
+        self.core.freeze()
 
 
     def parseLine(self, line):
@@ -45,17 +286,17 @@ class AdjacencyGraph(object):
         if not matchPair:
             return
 
-        src = self.makeNode(matchPair[0])
-        self.nodes.append(src)
+        core = self.core
+        src = core.intern(matchPair[0])
 
         for x in matchPair[1]:
-            dest = self.makeNode(x)
+            dest = core.intern(x)
             if not dest == src:
-                src.add_out_edge(dest)
-                self.nodes.append(dest)
+                core.addEdge(src, dest)
 
 
-    def matchLine(self, line):
+    @staticmethod
+    def matchLine(line):
         kv = line.strip().split('=')
         vals = []
 
@@ -69,13 +310,87 @@ class AdjacencyGraph(object):
     
 
     def makeNode(self, name):
-        f = filter(lambda y: y.name == name, self.nodes)
+        """
+        Look up the node with the given name, creating it on first sight.
+        """
+        return Node(self, self.core.intern(name))
+
+    def getNode(self, name):
+        i = self.core.ids.get(name)
 
-        if len(f) == 0:
-            n = Node(name)
-            return n
-        else: 
-            return f[0]
+        if i is None:
+            return None
+
+        return Node(self, i)
+
+    def roots(self):
+        """
+        Nodes without in-edges, in order of first appearance.
+        """
+        offsets, targets = self.core.inAdjacency()
+        return [Node(self, i) for i in range(len(self.core.names)) if offsets[i] == offsets[i+1]]
+
+    def reachable(self, roots, depth=None, reverse=False):
+        """
+        Breadth-first walk from the named roots along out-edges, or along
+        in-edges when reverse is set, going at most depth edges deep when
+        depth is given.  Returns the IDs reached, in the order they were
+        reached; unknown root names are ignored.  Only the adjacency of
+        the nodes reached is read.
+        """
+        if reverse:
+            offsets, targets = self.core.inAdjacency()
+        else:
+            offsets, targets = self.core.outAdjacency()
+
+        ids = self.core.ids
+        seen = set()
+        order = []
+        for name in roots:
+            i = ids.get(name)
+            if i is not None and i not in seen:
+                seen.add(i)
+                order.append(i)
+
+        start = 0
+        level = 0
+        while start < len(order) and (depth is None or level < depth):
+            end = len(order)
+            for i in order[start:end]:
+                for x in targets[offsets[i]:offsets[i+1]]:
+                    if x not in seen:
+                        seen.add(x)
+                        order.append(x)
+            start = end
+            level += 1
+
+        return order
+
+    def subgraph(self, roots, depth=None, reverse=False):
+        """
+        A new AdjacencyGraph induced by the nodes reachable(roots, depth,
+        reverse): those nodes and every edge between them, in their
+        original direction and order.  Nothing is printed, and the rest of
+        the graph is never visited.
+        """
+        reached = sorted(self.reachable(roots, depth, reverse))
+        inside = set(reached)
+        names = self.core.names
+        offsets, targets = self.core.outAdjacency()
+
+        graph = AdjacencyGraph()
+        core = graph.core
+        for i in reached:
+            core.intern(names[i])
+
+        for i in reached:
+            src = core.ids[names[i]]
+            for x in targets[offsets[i]:offsets[i+1]]:
+                if x in inside:
+                    core.addEdge(src, core.ids[names[x]])
+
+        core.freeze()
+        return graph
 
 
 
@@ -90,6 +405,33 @@ class Font(object):
 
 
 
+class BufferedWriter(object):
+    """
+    Collects small writes and hands them to the underlying file in large
+    joined chunks, so printing costs a handful of file.write calls instead
+    of several per node and edge.
+    """
+
+    def __init__(self, file, bufferSize=1<<20):
+        self.file=file
+        self.bufferSize=bufferSize
+        self.chunks=[]
+        self.size=0
+
+    def write(self, data):
+        self.chunks.append(data)
+        self.size+=len(data)
+        if self.size >= self.bufferSize:
+            self.flush()
+
+    def flush(self):
+        if self.chunks:
+            self.file.write(''.join(self.chunks))
+            self.chunks=[]
+            self.size=0
+
+
+
 class GraphPrinter(object):
     """
     Base class for graph printing.
@@ -98,21 +440,187 @@ class GraphPrinter(object):
     def __init__(self, root, suppressRoots=False):
         self.root=root
         self.suppressRoots=suppressRoots
+        self.bufferSize=1<<20
+        self.batchSize=4096
+        # also print nodes that no root leads to, i.e. cycles
+        self.printUnreached=False
+        # fill color by node name, for the nodes that don't use the default
+        self.nodeColors=None
+        # label by node name, for nodes not labelled with their name, and
+        # label by (source name, target name), for edges with a label
+        self.nodeLabels=None
+        self.edgeLabels=None
 
 
     def printGraph(self, graph, file):
+        file = BufferedWriter(file, self.bufferSize)
         self.printGraphHeader(file)
 
-        root_filter = lambda x: len(x.in_edges) == 0
+        if self.root:
+            roots = [n for n in [graph.getNode(self.root)] if n]
+        else:
+            roots = graph.roots()
+
+        # visited flags belong to this print, not to the graph, so the same
+        # graph can be printed any number of times and from several threads
+        printed = bytearray(len(graph))
+
+        for n in roots:
+            self.printNode(n, file, self.suppressRoots, printed)
 
+        if self.printUnreached:
+            for n in graph.nodes:
+                self.printNode(n, file, False, printed)
+
+        self.printGraphFooter(file)
+        file.flush()
+
+
+
+    def streamGraph(self, inputFile, file):
+        """
+        Print the graph while the input is being read, without building an
+        AdjacencyGraph: nodes are declared the first time they are seen and
+        edges are written as their line is read.  Only the set of node names
+        seen so far is kept in memory.
+
+        Unlike printGraph, every node and edge is written, including cycles
+        that are not reachable from any root.  Suppressing roots needs to
+        know which nodes have in-edges, so in that case the input is read
+        twice and must be seekable.  Printing from a given root needs the
+        whole graph and is not supported here.
+        """
         if self.root:
-            root_filter = lambda x: x.name == self.root
+            raise ValueError('streamGraph cannot print from a given root')
+
+        targets = None
+
+        if self.suppressRoots:
+            targets = set()
+            for line in inputFile:
+                matchPair = AdjacencyGraph.matchLine(line)
+                if matchPair:
+                    targets.update(x for x in matchPair[1] if x != matchPair[0])
+            inputFile.seek(0)
+
+        file = BufferedWriter(file, self.bufferSize)
+        self.printGraphHeader(file)
 
-        for n in filter(root_filter, graph.nodes):
-            self.printNode(n, file, self.suppressRoots)
+        seen = set()
+        out = []
+        formatNode = self.formatNodeDeclaration
+        formatEdge = self.formatEdge
+        makeNodeName = self.makeNodeName
 
+        for line in inputFile:
+            matchPair = AdjacencyGraph.matchLine(line)
+
+            if not matchPair:
+                continue
+
+            src = matchPair[0]
+            # roots are the nodes that never show up as a target
+            skipNode = targets is not None and src not in targets
+
+            if src not in seen:
+                seen.add(src)
+                if not skipNode:
+                    out.append(formatNode(src))
+
+            for x in matchPair[1]:
+                if x == src:
+                    continue
+                if x not in seen:
+                    seen.add(x)
+                    out.append(formatNode(x))
+                # if we're skipping this node, we don't need its out edges either
+                if not skipNode:
+                    out.append(formatEdge(makeNodeName(src), makeNodeName(x)))
+
+            if len(out) >= self.batchSize:
+                file.write(''.join(out))
+                out = []
+
+        file.write(''.join(out))
         self.printGraphFooter(file)
+        file.flush()
+
+
+    def printNode(self, node, file, skipNode=False, printed=None):
+        # statements are formatted into a batch and written with one join
+        out = []
+        formatNode = self.formatNodeDeclaration
+        formatEdge = self.formatEdge
+        makeNodeName = self.makeNodeName
+
+        names = node.graph.core.names
+
+        for fromNode, toNode in self.walk(node, skipNode, printed):
+            if toNode is None:
+                out.append(formatNode(names[fromNode]))
+            else:
+                out.append(formatEdge(makeNodeName(names[fromNode]), makeNodeName(names[toNode])))
 
+            if len(out) >= self.batchSize:
+                file.write(''.join(out))
+                out = []
+
+        file.write(''.join(out))
+
+
+    def printNodeDeclaration(self, file, name):
+        file.write(self.formatNodeDeclaration(name))
+
+
+    def printEdge(self, file, fromNode, toNode):
+        file.write(self.formatEdge(fromNode, toNode))
+
+
+    def walk(self, node, skipNode=False, printed=None):
+        """
+        Depth-first walk from node over nodes not yet printed, yielding
+        (id, None) for each node to declare and (fromId, toId) for each
+        edge, where ids index graph.core.names.  Edges are yielded once the
+        subtree below their target is done, and nothing is yielded for a
+        skipped node or its out edges.  An explicit stack is used instead of
+        recursion, so the depth of the graph is not limited by the Python
+        stack.
+
+        printed holds one byte per node ID and is updated as nodes are
+        visited; pass the same bytearray to walk from several roots without
+        repeating nodes.  A fresh one is used when it is omitted.
+        """
+        if printed is None:
+            printed = bytearray(len(node.graph))
+        offsets, targets = node.graph.core.outAdjacency()
+        start = node.id
+
+        if printed[start]:
+            return
+
+        printed[start]=1
+        if not skipNode:
+            yield (start, None)
+
+        stack=[(start, skipNode, iter(targets[offsets[start]:offsets[start+1]]))]
+
+        while stack:
+            current, skip, children = stack[-1]
+
+            for x in children:
+                if not printed[x]:
+                    printed[x]=1
+                    yield (x, None)
+                    stack.append((x, False, iter(targets[offsets[x]:offsets[x+1]])))
+                    break
+                # if we're skipping this node, we don't need its out edges either
+                if not skip:
+                    yield (current, x)
+            else:
+                stack.pop()
+                # the edge into a finished node comes after its subtree
+                if stack and not stack[-1][1]:
+                    yield (stack[-1][0], current)
 
 
     def makeNodeName(self, name):
@@ -143,17 +651,9 @@ class GraphmlPrinter(GraphPrinter):
         file.write(xml_header)
 
 
-    def printEdge(self, file, fromNode, toNode):
-        file.write('<edge source="%s" target="%s"/>' % (fromNode, toNode))
-
-    def printNode(self, node, file, skipNode=False):
-        if node.printed:
-            return
-
-        node.printed=True
-        nodeName=self.makeNodeName(node.name)
-
-        nodeXml="""<node id="%s"><data key="d1">
+    # the node template split around its two substitutions, so writing a
+    # node only concatenates the name into the fixed parts
+    nodeXmlParts="""<node id="%s"><data key="d1">
         <y:ShapeNode>
           <y:Shape type="rectangle"/>                              <!-- node shape -->
           <y:Geometry height="30.0" width="60.0" x="0.0" y="0.0"/> <!-- position and size -->
@@ -161,18 +661,23 @@ class GraphmlPrinter(GraphPrinter):
           <y:BorderStyle color="#000000" type="line" width="1.0"/> <!-- border -->
           <y:NodeLabel>%s</y:NodeLabel>                    <!-- label text -->
         </y:ShapeNode>
-      </data></node>"""
+      </data></node>""".split('%s')
 
-        if not skipNode:
-            file.write(nodeXml % (nodeName, nodeName))
+    def formatEdge(self, fromNode, toNode):
+        return '<edge source="' + fromNode + '" target="' + toNode + '"/>'
+
+    def formatNodeDeclaration(self, name):
+        nodeName=self.makeNodeName(name)
+        head, middle, tail = self.nodeXmlParts
+
+        if self.nodeColors and name in self.nodeColors:
+            middle = middle.replace('#FFCC00', self.nodeColors[name])
+
+        label = nodeName
+        if self.nodeLabels and name in self.nodeLabels:
+            label = self.nodeLabels[name]
 
-        for x in node.out_edges:
-            self.printNode(x, file)
-            # if we're skipping this node, we don't need its out edges either
-            if not skipNode:
-                nodeFrom=nodeName
-                nodeTo=self.makeNodeName(x.name)
-                self.printEdge(file, nodeFrom, nodeTo)
+        return head + nodeName + middle + label + tail
 
 
 
@@ -215,27 +720,61 @@ class DotPrinter(GraphPrinter):
 
         graphFmt=(self.rankDir, self.rankSep, self.colors['background'])
         file.write('rankdir=%s;\nranksep=%d;\nbgcolor=%s;\n' % graphFmt)
+
+        # the same for every edge, so format it once per graph
+        self.edgeSuffix=' [arrowhead=%s,arrowtail=%s];\n' % (self.edgeArrowHead, self.edgeArrowTail)
                   
 
-    def printNode(self, node, file, skipNode=False):
-        if node.printed:
-            return
+    def formatEdge(self, fromNode, toNode):
+        if self.edgeLabels and (fromNode, toNode) in self.edgeLabels:
+            label = self.edgeLabels[(fromNode, toNode)]
+            return '\n  ' + fromNode + ' -> ' + toNode + ' [label="' + label + '",' + self.edgeSuffix[2:]
+        return '\n  ' + fromNode + ' -> ' + toNode + self.edgeSuffix
 
-        node.printed=True
+
+    def formatNodeDeclaration(self, name):
         nodeColor = 'green'
-        sep=","
-        nodeName=self.makeNodeName(node.name)
+        if self.nodeColors and name in self.nodeColors:
+            nodeColor = '"%s"' % self.nodeColors[name]
+        nodeName=self.makeNodeName(name)
+        label = name
+        if self.nodeLabels and name in self.nodeLabels:
+            label = self.nodeLabels[name]
 
-        if not skipNode:
-            file.write('\n  %s [label="%s"  fillcolor=%s ];\n' % (nodeName, node.name, nodeColor))
+        return '\n  ' + nodeName + ' [label="' + label + '"  fillcolor=' + nodeColor + ' ];\n'
+
+
+
+PRINTERS={'dot': DotPrinter, 'graphml': GraphmlPrinter}
+
+
+def renderGraph(graph, formats, roots=(None,), suppressRoots=False, openOutput=None):
+    """
+    Print one parsed graph in several formats and from several roots.
+    formats are keys of PRINTERS and a root of None autodetects roots.
+
+    Each (format, root) combination is written to openOutput(format, root)
+    when it is given, and to a string otherwise.  Returns a dict mapping
+    (format, root) to the file or string.  Printing does not change the
+    graph, so the same graph can also be rendered from several threads.
+    """
+    results = {}
+    graph.core.freeze()
+
+    for fmt in formats:
+        for root in roots:
+            printer = PRINTERS[fmt](root, suppressRoots)
 
-        for x in node.out_edges:
-            self.printNode(x, file)
-            # if we're skipping this node, we don't need its out edges either
-            if not skipNode:
-                nodeFrom=nodeName
-                nodeTo=self.makeNodeName(x.name)
-                file.write('\n  %s -> %s [arrowhead=%s,arrowtail=%s];\n' % (nodeFrom, nodeTo, self.edgeArrowHead, self.edgeArrowTail))
+            if openOutput:
+                out = openOutput(fmt, root)
+                printer.printGraph(graph, out)
+                results[(fmt, root)] = out
+            else:
+                out = StringIO()
+                printer.printGraph(graph, out)
+                results[(fmt, root)] = out.getvalue()
+
+    return results
 
 
 
@@ -247,13 +786,22 @@ Takes an input file representing a directed graph in a simple Java-style propert
 
 SOURCE_NODE_ID=TARGET_NODE_ID_1,TARGET_NODE_ID_2,...,TARGET_NODE_ID_N
 
-The program can print its output in Graphviz 'dot' format, or in GraphML format (compatible with yEd)."""
+The program can print its output in Graphviz 'dot' format, or in GraphML format (compatible with yEd), or save it with
+--format bin in a binary format that later runs, given it as input, open without parsing."""
 
     op = optparse.OptionParser(usage=usage)
     op.add_option("-o", dest="output_file", default=None, help="Output file name (stdout by default)")
     op.add_option("--root", dest="root_node", default=None, help="Identifier of root node (otherwise, autodetect roots)")
     op.add_option("--suppress-roots", dest="suppress_roots", action="store_true", default=False, help="Suppress printing of root nodes")
-    op.add_option("--format", dest="format", default='dot', help="Output format, must be one of 'dot' or 'graphml'")
+    op.add_option("--format", dest="format", default='dot', help="Output format, must be one of 'dot', 'graphml' or 'bin' (the binary format of graph_binary.py, which is also accepted as input)")
+    op.add_option("--depth", dest="depth", type="int", default=None, help="With --root, only print nodes at most this many edges away from the root")
+    op.add_option("--reverse", dest="reverse", action="store_true", default=False, help="With --root, print the nodes that lead to the root (its dependents) instead of those it leads to")
+    op.add_option("--stream", dest="stream", action="store_true", default=False, help="Write output while reading the input instead of building the graph in memory. Writes every node, including cycles unreachable from a root. Reads the input twice with --suppress-roots, and is ignored with --root, --cluster or binary input or output")
+    op.add_option("--cluster", dest="cluster", default=None, help="Collapse nodes into clusters, printed with their number of members, before printing: 'group' by Maven groupId (the part of names before the first ':'), 'scc' by cycle, or 'pattern' by --cluster-pattern")
+    op.add_option("--cluster-pattern", dest="cluster_pattern", default=None, help="Regular expression whose first group, or whole match, is the cluster of the names it is found in; implies --cluster pattern")
+    op.add_option("--max-nodes", dest="max_nodes", type="int", default=None, help="With --cluster, use the finest clustering with at most this many nodes, e.g. org.apache.commons before org.apache")
+    op.add_option("--expand", dest="expand", action="append", default=[], help="With --cluster, print the members of this cluster instead of the cluster (may be repeated)")
+    instrumentation.add_options(op)
 
     (options, args) = op.parse_args()
 
@@ -264,26 +812,99 @@ The program can print its output in Graphviz 'dot' format, or in GraphML format
 
     root = options.root_node
     suppressRoots = options.suppress_roots
+    binaryOutput = options.format == 'bin'
 
-    inputFile = open(args[0], 'r')
-    outputFile = sys.stdout
+    if options.format not in PRINTERS and not binaryOutput:
+        op.error("Invalid format '%s'. Use -h option to display help message." % options.format)
+
+    if binaryOutput and not options.output_file:
+        op.error("--format bin requires -o. Use -h option to display help message.")
+
+    if binaryOutput and suppressRoots:
+        op.error("--suppress-roots does not apply to --format bin. Use -h option to display help message.")
+
+    if (options.depth is not None or options.reverse) and not root:
+        op.error("--depth and --reverse require --root. Use -h option to display help message.")
+
+    if options.depth is not None and options.depth < 0:
+        op.error("--depth must not be negative. Use -h option to display help message.")
+
+    if options.output_file == args[0]:
+        op.error("You may not specify the same file name (%s) as both input and output file." % options.output_file)
+
+    if options.cluster_pattern and not options.cluster:
+        options.cluster = 'pattern'
 
-    if options.output_file:
-        if options.output_file == args[0]:
-            op.error("You may not specify the same file name (%s) as both input and output file." % options.output_file)
+    if (options.max_nodes is not None or options.expand) and not options.cluster:
+        op.error("--max-nodes and --expand require --cluster. Use -h option to display help message.")
+
+    if options.cluster and options.cluster not in ('group', 'scc', 'pattern'):
+        op.error("Invalid --cluster '%s'. Use -h option to display help message." % options.cluster)
+
+    if options.cluster == 'pattern' and not options.cluster_pattern:
+        op.error("--cluster pattern requires --cluster-pattern. Use -h option to display help message.")
+
+    if instrumentation.start(options).enabled:
+        stats().count_calls(AdjacencyGraph, 'getNode', 'getNode lookups')
+
+    binaryInput = graph_binary.is_binary(args[0])
+
+    outputFile = sys.stdout
+    if options.output_file and not binaryOutput:
         outputFile = open(options.output_file, 'w')
 
-    printer = None
-    if options.format == 'dot':
-        printer = DotPrinter(root, suppressRoots)
-    elif options.format == 'graphml':
-        printer = GraphmlPrinter(root, suppressRoots)
+    if options.stream and not root and not options.cluster and not binaryInput and not binaryOutput:
+        printer = PRINTERS[options.format](root, suppressRoots)
+        inputFile = open(args[0], 'r')
+        with stats().phase('stream'):
+            printer.streamGraph(inputFile, stats().wrap_file(outputFile))
+        inputFile.close()
     else:
-        op.error("Invalid format '%s'. Use -h option to display help message." % options.format)
-
-    graph = AdjacencyGraph()
-    graph.parseFile(inputFile)
-    inputFile.close()
-    printer.printGraph(graph, outputFile)
-    outputFile.close()
+        with stats().phase('parse'):
+            graph = AdjacencyGraph.load(args[0])
+
+        # binary output holds the whole graph, or all of it a root leads
+        # to, and clusters are made of the part a root leads to
+        if options.depth is not None or options.reverse or (root and (binaryOutput or options.cluster)):
+            with stats().phase('subgraph'):
+                graph = graph.subgraph([root], options.depth, options.reverse)
+
+        members = multiplicities = None
+        if options.cluster:
+            # imported here, as graph_analytics imports this module
+            from graph_analytics import GraphCoarsening
+            with stats().phase('coarsen'):
+                coarsening = GraphCoarsening(graph, options.cluster, options.cluster_pattern)
+                if options.max_nodes is not None:
+                    level = coarsening.chooseLevel(options.max_nodes)
+                else:
+                    level = min(1, coarsening.levelCount() - 1)
+                graph, members, multiplicities = coarsening.coarsen(level, options.expand)
+            stats().record('cluster level', level)
+
+        stats().record('nodes', len(graph))
+        stats().record('edges', graph.core.edgeCount())
+
+        if binaryOutput:
+            with stats().phase('write'):
+                graph.writeBinary(options.output_file)
+        else:
+            printer = PRINTERS[options.format](root, suppressRoots)
+            # the dependents of a root don't hang off it, and clusters may
+            # form cycles, so print them all
+            if options.reverse or options.cluster:
+                printer.root = None
+                printer.printUnreached = True
+
+            if options.cluster:
+                printer.nodeLabels = GraphCoarsening.labels(members)
+                printer.edgeLabels = dict((edge, str(count)) for edge, count in multiplicities.items() if count > 1)
+
+            with stats().phase('print'):
+                printer.printGraph(graph, stats().wrap_file(outputFile))
+
+    if outputFile is not sys.stdout:
+        outputFile.close()
+
+    instrumentation.finish(options)
 
@@ -0,0 +1,596 @@
+#!/usr/bin/env python
+
+import sys, re, optparse, colorsys
+from array import array
+
+from graph_adjacency_list import AdjacencyGraph, GraphCore, PRINTERS
+
+__doc__="""
+
+Structural analysis of the directed graphs read by graph_adjacency_list.py: strongly connected components (the
+cycles), topological layers of the graph of components, and its transitive reduction.  Everything works on the
+CSR arrays of an AdjacencyGraph and runs in time linear in the size of the graph, except the transitive reduction
+(see GraphAnalytics.reduction).  GraphCoarsening collapses nodes into clusters, by Maven groupId, by a regular
+expression or by component, to shrink graphs before layout.
+
+"""
+
+def distinctColor(i):
+    """
+    The i-th of a series of light fill colors, as #RRGGBB.  Hues are
+    spaced by the golden ratio, so neighbours in the series look apart.
+    """
+    rgb = colorsys.hsv_to_rgb((i * 0.618033988749895) % 1.0, 0.45, 1.0)
+    return '#%02X%02X%02X' % tuple(int(x * 255) for x in rgb)
+
+
+class GraphAnalytics(object):
+    """
+    Analyses of one AdjacencyGraph, each computed on first use.
+
+    Components are numbered in the order Tarjan's algorithm completes
+    them, which is a reverse topological order: every edge between two
+    components goes from a higher number to a lower one.  The
+    condensation, the DAG of components, is kept in CSR form like the
+    graph itself.
+    """
+
+    def __init__(self, graph):
+        self.graph=graph
+        self.component=None
+        self.componentCount=0
+        self.condensed=None
+        self.representatives=None
+        self.layer=None
+        self.reducedEdges=None
+
+    def components(self):
+        """
+        Run an iterative Tarjan over the graph, returning an array with the
+        component number of every node ID.
+        """
+        if self.component is not None:
+            return self.component
+
+        offsets, targets = self.graph.core.outAdjacency()
+        n = len(self.graph)
+
+        index = [-1] * n
+        low = [0] * n
+        onStack = bytearray(n)
+        component = [-1] * n
+        stack = []
+        counter = 0
+        count = 0
+
+        for start in range(n):
+            if index[start] != -1:
+                continue
+
+            index[start] = low[start] = counter
+            counter += 1
+            stack.append(start)
+            onStack[start] = 1
+            # (node, position of the next out edge to look at)
+            work = [(start, offsets[start])]
+
+            while work:
+                v, i = work[-1]
+                end = offsets[v+1]
+
+                while i < end:
+                    w = targets[i]
+                    i += 1
+                    if index[w] == -1:
+                        work[-1] = (v, i)
+                        index[w] = low[w] = counter
+                        counter += 1
+                        stack.append(w)
+                        onStack[w] = 1
+                        work.append((w, offsets[w]))
+                        break
+                    elif onStack[w] and index[w] < low[v]:
+                        low[v] = index[w]
+                else:
+                    work.pop()
+
+                    if low[v] == index[v]:
+                        while True:
+                            x = stack.pop()
+                            onStack[x] = 0
+                            component[x] = count
+                            if x == v:
+                                break
+                        count += 1
+
+                    if work:
+                        u = work[-1][0]
+                        if low[v] < low[u]:
+                            low[u] = low[v]
+
+        self.component = array('i', component)
+        self.componentCount = count
+        return self.component
+
+    def members(self):
+        """
+        (offsets, node IDs) listing the nodes of each component in CSR form.
+        """
+        component = self.components()
+        return GraphCore.buildCsr(self.componentCount, component, array('i', range(len(component))))
+
+    def condensation(self):
+        """
+        (offsets, targets) of the DAG of components, without duplicate
+        edges.  Each of its edges remembers, in self.representatives, the
+        first graph edge found that joins the two components, as
+        (source ID, target ID).
+        """
+        if self.condensed is not None:
+            return self.condensed
+
+        component = self.components()
+        count = self.componentCount
+        offsets, targets = self.graph.core.outAdjacency()
+        memberOffsets, memberIds = self.members()
+
+        # last component that added an edge to each component
+        mark = array('i', [-1]) * count
+        condensedOffsets = array('l', [0])
+        condensedTargets = array('i')
+        representatives = []
+
+        for c in range(count):
+            for v in memberIds[memberOffsets[c]:memberOffsets[c+1]]:
+                for w in targets[offsets[v]:offsets[v+1]]:
+                    d = component[w]
+                    if d != c and mark[d] != c:
+                        mark[d] = c
+                        condensedTargets.append(d)
+                        representatives.append((v, w))
+            condensedOffsets.append(len(condensedTargets))
+
+        self.condensed = (condensedOffsets, condensedTargets)
+        self.representatives = representatives
+        return self.condensed
+
+    def layers(self):
+        """
+        Topological layer of every component: 0 for components nothing
+        leads to, otherwise one more than the deepest component with an
+        edge into it.  Returned as an array indexed by component.
+        """
+        if self.layer is not None:
+            return self.layer
+
+        offsets, targets = self.condensation()
+        layer = array('i', [0]) * self.componentCount
+
+        # higher numbers come first topologically
+        for c in range(self.componentCount - 1, -1, -1):
+            next = layer[c] + 1
+            for d in targets[offsets[c]:offsets[c+1]]:
+                if layer[d] < next:
+                    layer[d] = next
+
+        self.layer = layer
+        return layer
+
+    def nodeLayers(self):
+        """
+        Topological layer of every node ID, that of its component.
+        """
+        layer = self.layers()
+        return array('i', [layer[c] for c in self.components()])
+
+    def reduction(self):
+        """
+        Indexes into the condensation targets of the edges that its
+        transitive reduction keeps: those not implied by a longer path.
+
+        Components are visited sinks first, keeping for each the set of
+        components it reaches as a bitset (a Python int).  A component's
+        successors are tried closest first, and an edge is dropped when an
+        earlier kept successor already reaches its target.  A set only
+        ever gets asked about components numbered from need[c] up, the
+        lowest successor of anything that leads to c, so it only keeps
+        those bits, shifted down by need[c], and is released once every
+        component with an edge into it is done.  The worst case is still
+        O(E * C / 64) word operations, but on dependency graphs, where
+        edges mostly join nearby layers, the sets stay short.
+        """
+        if self.reducedEdges is not None:
+            return self.reducedEdges
+
+        offsets, targets = self.condensation()
+        count = self.componentCount
+
+        remaining = [0] * count
+        for d in targets:
+            remaining[d] += 1
+
+        # lowest component any predecessor will look up, in topological order
+        need = list(range(count))
+        for c in range(count - 1, -1, -1):
+            start, end = offsets[c], offsets[c+1]
+            if start < end:
+                low = min(need[c], min(targets[start:end]))
+                for d in targets[start:end]:
+                    if low < need[d]:
+                        need[d] = low
+
+        reach = [0] * count
+        kept = []
+
+        for c in range(count):
+            start, end = offsets[c], offsets[c+1]
+            # a successor can only reach successors numbered lower than it
+            order = sorted(range(start, end), key=lambda i: -targets[i])
+            base = min(need[c], min(targets[start:end])) if start < end else need[c]
+            covered = 0
+
+            for i in order:
+                d = targets[i]
+                if not covered >> (d - base) & 1:
+                    kept.append(i)
+                    covered |= reach[d] >> (base - need[d])
+                remaining[d] -= 1
+                if not remaining[d]:
+                    reach[d] = 0
+
+            if remaining[c]:
+                reach[c] = (covered | (1 << (c - base))) >> (need[c] - base)
+
+        kept.sort()
+        self.reducedEdges = kept
+        return kept
+
+    def reducedGraph(self):
+        """
+        A new AdjacencyGraph with the same nodes, the edges inside each
+        component, and between components only one edge for each edge of
+        the reduced condensation.  It reaches the same nodes from every
+        node as the original graph does.
+        """
+        self.condensation()
+        component = self.components()
+        keep = set(self.representatives[i] for i in self.reduction())
+
+        names = self.graph.core.names
+        offsets, targets = self.graph.core.outAdjacency()
+
+        graph = AdjacencyGraph()
+        core = graph.core
+        for name in names:
+            core.intern(name)
+
+        for v in range(len(names)):
+            for w in targets[offsets[v]:offsets[v+1]]:
+                if component[v] == component[w]:
+                    core.addEdge(v, w)
+                elif (v, w) in keep:
+                    # only once, should the input repeat the edge
+                    keep.discard((v, w))
+                    core.addEdge(v, w)
+
+        core.freeze()
+        return graph
+
+    def cycles(self):
+        """
+        Components of more than one node, as lists of node names, largest
+        first.
+        """
+        memberOffsets, memberIds = self.members()
+        names = self.graph.core.names
+        cycles = []
+
+        for c in range(self.componentCount):
+            if memberOffsets[c+1] - memberOffsets[c] > 1:
+                cycles.append([names[i] for i in memberIds[memberOffsets[c]:memberOffsets[c+1]]])
+
+        cycles.sort(key=lambda x: -len(x))
+        return cycles
+
+    def cycleColors(self):
+        """
+        Map the name of every node on a cycle to a fill color, one color per
+        component.
+        """
+        colors = {}
+
+        for i, names in enumerate(self.cycles()):
+            color = distinctColor(i)
+            for name in names:
+                colors[name] = color
+
+        return colors
+
+    def printReport(self, file):
+        layer = self.layers()
+        offsets, targets = self.condensation()
+        cycles = self.cycles()
+        # edges inside components are all kept
+        reduced = self.graph.core.edgeCount() - self.interComponentEdges() + len(self.reduction())
+
+        file.write('nodes: %d\n' % len(self.graph))
+        file.write('edges: %d\n' % self.graph.core.edgeCount())
+        file.write('strongly connected components: %d (%d cycles)\n' % (self.componentCount, len(cycles)))
+        file.write('condensation edges: %d\n' % len(targets))
+        file.write('transitive reduction: %d of %d condensation edges\n' % (len(self.reduction()), len(targets)))
+        file.write('reduced graph edges: %d\n' % reduced)
+
+        sizes = {}
+        for x in layer:
+            sizes[x] = sizes.get(x, 0) + 1
+        file.write('topological layers: %d\n' % len(sizes))
+        for x in sorted(sizes):
+            file.write('  layer %d: %d component(s)\n' % (x, sizes[x]))
+
+        for i, names in enumerate(cycles):
+            file.write('cycle %d (%d nodes): %s\n' % (i + 1, len(names), ', '.join(names)))
+
+    def interComponentEdges(self):
+        """
+        Number of graph edges, duplicates included, joining two different
+        components.
+        """
+        component = self.components()
+        offsets, targets = self.graph.core.outAdjacency()
+        total = 0
+
+        for v in range(len(component)):
+            c = component[v]
+            for w in targets[offsets[v]:offsets[v+1]]:
+                if component[w] != c:
+                    total += 1
+
+        return total
+
+
+
+class GraphCoarsening(object):
+    """
+    Collapses the nodes of an AdjacencyGraph into clusters, so that graphs
+    too big for graphviz to lay out can still be looked at.  Nodes are
+    grouped by mode:
+
+      'group'    the Maven groupId, the part of the name before the first
+                 ':'.  Coarser levels cut every groupId to one part less,
+                 counted from the root, so org.apache.commons becomes
+                 org.apache, then org, and each level merges clusters of
+                 the level below it.
+      'pattern'  the first group of a regular expression found in the
+                 name, or the whole match if it has no groups.
+      'scc'      the strongly connected component, i.e. the cycle.
+
+    Level 0 leaves every node alone, level 1 is the finest grouping and
+    higher levels are coarser.  Nodes without a key, like names without a
+    ':' or that the pattern doesn't match, stay on their own at every
+    level.
+    """
+
+    MODES=('group', 'pattern', 'scc')
+
+    def __init__(self, graph, mode='group', pattern=None):
+        if mode not in GraphCoarsening.MODES:
+            raise ValueError("unknown clustering mode '%s'" % mode)
+        if mode == 'pattern' and not pattern:
+            raise ValueError("clustering by pattern needs a pattern")
+
+        self.graph=graph
+        self.mode=mode
+        self.pattern=re.compile(pattern) if pattern else None
+        self.groups=None
+        # level -> keys, as chooseLevel and coarsen ask for the same ones
+        self.keyCache={}
+
+    @staticmethod
+    def groupParts(name):
+        """
+        The dot separated parts of the groupId of name, or None.
+        """
+        name = name.strip('"')
+        if ':' not in name:
+            return None
+        return name.split(':', 1)[0].split('.')
+
+    def groupIds(self):
+        if self.groups is None:
+            self.groups = [GraphCoarsening.groupParts(name) for name in self.graph.core.names]
+        return self.groups
+
+    def groupDepth(self):
+        """
+        Number of parts of the longest groupId.
+        """
+        return max([len(parts) for parts in self.groupIds() if parts] or [0])
+
+    def levelCount(self):
+        """
+        Number of levels, level 0 included.
+        """
+        if self.mode == 'group':
+            return 1 + self.groupDepth()
+        return 2
+
+    def keys(self, level):
+        """
+        Cluster key of every node ID at the given level, None for nodes
+        that are their own cluster.
+        """
+        keys = self.keyCache.get(level)
+        if keys is None:
+            keys = self.keyCache[level] = self.computeKeys(level)
+        return keys
+
+    def computeKeys(self, level):
+        n = len(self.graph)
+
+        if level == 0:
+            return [None] * n
+
+        if self.mode == 'group':
+            # level 1 keeps every part; shorter groupIds are only cut once
+            # the depth reaches them, so that levels nest
+            depth = max(1, self.groupDepth() - (level - 1))
+            return [None if parts is None else '.'.join(parts[:depth]) for parts in self.groupIds()]
+
+        if self.mode == 'pattern':
+            keys = []
+            for name in self.graph.core.names:
+                m = self.pattern.search(name)
+                keys.append(None if m is None else (m.group(1) if m.re.groups else m.group(0)))
+            return keys
+
+        # cycles are numbered as in GraphAnalytics.printReport
+        keys = [None] * n
+        ids = self.graph.core.ids
+        for i, names in enumerate(GraphAnalytics(self.graph).cycles()):
+            for name in names:
+                keys[ids[name]] = 'cycle_%d' % (i + 1)
+        return keys
+
+    @staticmethod
+    def clusterCount(keys):
+        return len(set(x for x in keys if x is not None)) + sum(1 for x in keys if x is None)
+
+    def chooseLevel(self, maxNodes):
+        """
+        The finest level with at most maxNodes clusters, or the coarsest
+        level if none is small enough.
+        """
+        levels = self.levelCount()
+        for level in range(levels):
+            if GraphCoarsening.clusterCount(self.keys(level)) <= maxNodes:
+                return level
+        return levels - 1
+
+    def coarsen(self, level, expand=(), clusterName=None):
+        """
+        The graph of clusters at the given level, built in one pass over
+        the edges: a node per cluster and an edge between two clusters if
+        any of their members are joined.  The members of clusters whose
+        key is in expand are kept as nodes of their own.  Cluster nodes
+        are named clusterName(key), the key if it isn't given, with '~'
+        appended to the key until the name is not that of a node kept on
+        its own or of another cluster, so a node a.b next to a cluster
+        a.b stays apart from it as a.b~.
+        Returns (graph, clusters, multiplicities) where clusters maps the
+        name of every cluster node to its key and number of members and
+        multiplicities maps (source name, target name) to the number of
+        edges that became that edge.  Edges inside a cluster are dropped.
+        """
+        names = self.graph.core.names
+        keys = self.keys(level)
+        expand = set(expand)
+        if clusterName is None:
+            clusterName = lambda key: key
+
+        taken = set(names[v] for v, key in enumerate(keys) if key is None or key in expand)
+        clusterNames = {}
+        for key in keys:
+            if key is not None and key not in expand and key not in clusterNames:
+                suffix = ''
+                while clusterName(key + suffix) in taken:
+                    suffix += '~'
+                clusterNames[key] = clusterName(key + suffix)
+                taken.add(clusterNames[key])
+
+        graph = AdjacencyGraph()
+        core = graph.core
+        cluster = array('i', [0]) * len(names)
+        sizes = {}
+
+        for v, key in enumerate(keys):
+            if key is None or key in expand:
+                cluster[v] = core.intern(names[v])
+            else:
+                cluster[v] = core.intern(clusterNames[key])
+                sizes[key] = sizes.get(key, 0) + 1
+
+        offsets, targets = self.graph.core.outAdjacency()
+        counts = {}
+        for v in range(len(names)):
+            c = cluster[v]
+            for w in targets[offsets[v]:offsets[v+1]]:
+                d = cluster[w]
+                if c != d:
+                    counts[(c, d)] = counts.get((c, d), 0) + 1
+
+        multiplicities = {}
+        for c, d in sorted(counts):
+            core.addEdge(c, d)
+            multiplicities[(core.names[c], core.names[d])] = counts[(c, d)]
+
+        clusters = dict((clusterNames[key], (key, size)) for key, size in sizes.items())
+        return graph, clusters, multiplicities
+
+    @staticmethod
+    def labels(clusters):
+        """
+        Node label of every cluster, its key and number of members.
+        """
+        return dict((name, '%s (%d)' % (key, size)) for name, (key, size) in clusters.items())
+
+
+if __name__=='__main__':
+
+    usage="""usage: %prog [options] INPUT_FILE_NAME
+
+Analyzes a directed graph in the properties format read by graph_adjacency_list.py: finds its cycles (strongly
+connected components), the topological layers of the graph of components and its transitive reduction.  Prints a
+report by default, or the graph itself with --format dot or graphml.  The input may also be a binary graph file
+written with --format bin."""
+
+    op = optparse.OptionParser(usage=usage)
+    op.add_option("-o", dest="output_file", default=None, help="Output file name (stdout by default)")
+    op.add_option("--format", dest="format", default='report', help="Output format, one of 'report' (the default), 'dot', 'graphml' or 'bin' (see graph_binary.py)")
+    op.add_option("--color-cycles", dest="color_cycles", action="store_true", default=False, help="With dot or graphml, fill the nodes of each cycle with a color of their own")
+    op.add_option("--reduce", dest="reduce", action="store_true", default=False, help="With dot, graphml or bin, output the transitive reduction of the graph, which graphviz lays out much faster")
+
+    (options, args) = op.parse_args()
+
+    if not args:
+        op.error("You must specify an input file. Use -h option to display help message.")
+    elif len(args) > 1:
+        op.error("You cannot specify more than one input file. Use -h option to display help message.")
+
+    if options.format not in ('report', 'bin') and options.format not in PRINTERS:
+        op.error("Invalid format '%s'. Use -h option to display help message." % options.format)
+
+    if options.format == 'bin' and not options.output_file:
+        op.error("--format bin requires -o. Use -h option to display help message.")
+
+    if options.output_file == args[0]:
+        op.error("You may not specify the same file name (%s) as both input and output file." % options.output_file)
+
+    graph = AdjacencyGraph.load(args[0])
+
+    outputFile = sys.stdout
+    if options.output_file and options.format != 'bin':
+        outputFile = open(options.output_file, 'w')
+
+    analytics = GraphAnalytics(graph)
+
+    if options.format == 'report':
+        analytics.printReport(outputFile)
+    elif options.format == 'bin':
+        if options.reduce:
+            graph = analytics.reducedGraph()
+        graph.writeBinary(options.output_file)
+    else:
+        printer = PRINTERS[options.format](None)
+        # cycles no root leads to are printed too
+        printer.printUnreached = True
+
+        if options.color_cycles:
+            printer.nodeColors = analytics.cycleColors()
+
+        if options.reduce:
+            graph = analytics.reducedGraph()
+
+        printer.printGraph(graph, outputFile)
+
+    if outputFile is not sys.stdout:
+        outputFile.close()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+
+import sys, os, mmap, json, struct, tempfile
+from array import array
+from contextlib import contextmanager
+
+__doc__="""
+
+The binary graph format written and read by both scripts with --format bin.  A file is a 24 byte header (MAGIC,
+version, then the offset and length of a JSON trailer), then sections of little-endian arrays, each aligned to 8
+bytes, then the trailer.  The trailer holds the graph's name, type and attributes, and where each section is, as
+name -> [offset, item count, type] with type 'q' (int64), 'i' (int32) or 'B' (bytes).
+
+Every graph file has these sections, for n nodes and E edges:
+
+  names.offsets, names   string table of the node names, UTF-8; name i is names[offsets[i]:offsets[i+1]]
+  names.sorted           node IDs in name order, for lookups by binary search
+  out.offsets, out.targets, in.offsets, in.targets
+                         CSR adjacency in both directions, as in graph_adjacency_list.GraphCore
+
+and a script may add sections of its own.  Files are opened with mmap and, on Python 3, sections are memoryviews
+of the mapping, so opening a graph copies nothing and a traversal only reads the pages it touches.
+
+"""
+
+MAGIC=b'GRBN'
+VERSION=1
+HEADER=struct.Struct('<4sIQQ')
+
+def int64_typecode():
+    try:
+        array('q')
+        return 'q'
+    except ValueError:
+        # Python 2 has no 'q', but 'l' is 64 bits on LP64 platforms
+        return 'l'
+
+TYPECODES={'q': int64_typecode(), 'i': 'i', 'B': 'B'}
+ITEM_SIZES={'q': 8, 'i': 4, 'B': 1}
+
+# memoryview.cast only exists on Python 3, and the data must already be
+# in native byte order to be used in place
+ZERO_COPY=hasattr(memoryview, 'cast') and sys.byteorder == 'little'
+
+
+# read once, as setting it to read it back is not safe with threads around
+UMASK=os.umask(0)
+os.umask(UMASK)
+
+
+@contextmanager
+def atomic_file(file_name, prefix='.tmp-'):
+    """
+    A binary file open for writing in place of file_name.  It is a
+    temporary file in the same directory, renamed over file_name when the
+    block ends, or removed if the block raises, so readers never see half
+    a file.  It is given the mode open() would have given file_name.
+    """
+    fd, temp_name = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file_name)), prefix=prefix)
+    try:
+        f = os.fdopen(fd, 'wb')
+        try:
+            yield f
+        finally:
+            f.close()
+        # mkstemp makes the file private
+        os.chmod(temp_name, 0o666 & ~UMASK)
+        os.rename(temp_name, file_name)
+    except:
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+        raise
+
+
+def is_binary(file_name):
+    """
+    Whether file_name starts like a binary graph file.
+    """
+    f = open(file_name, 'rb')
+    try:
+        return f.read(len(MAGIC)) == MAGIC
+    finally:
+        f.close()
+
+
+def string_table(strings):
+    """
+    (offsets, data) of the string table of the given strings.
+    """
+    encoded = [x.encode('utf-8') for x in strings]
+    offsets = array(TYPECODES['q'], [0])
+    total = 0
+    for x in encoded:
+        total += len(x)
+        offsets.append(total)
+    return offsets, b''.join(encoded)
+
+
+def string_sections(name, strings):
+    """
+    The two sections of a string table, for write_graph.
+    """
+    offsets, data = string_table(strings)
+    return [(name + '.offsets', 'q', offsets), (name, 'B', data)]
+
+
+def to_bytes(typecode, data):
+    if isinstance(data, bytes):
+        return data
+    if not isinstance(data, array) or data.typecode != TYPECODES[typecode]:
+        data = array(TYPECODES[typecode], data)
+    if sys.byteorder != 'little':
+        data = array(data.typecode, data)
+        data.byteswap()
+    return data.tobytes() if hasattr(data, 'tobytes') else data.tostring()
+
+
+def write_graph(file_name, names, out_csr, in_csr, meta=None, sections=()):
+    """
+    Write a graph file with the given node names, (offsets, targets) in
+    both directions, trailer fields and extra (name, type, data) sections,
+    data being an array, a sequence of ints or bytes.  The file is written
+    to a temporary file and renamed, so readers never see half of it.
+    """
+    order = sorted(range(len(names)), key=names.__getitem__)
+
+    all_sections = string_sections('names', names) + [
+        ('names.sorted', 'i', order),
+        ('out.offsets', 'q', out_csr[0]),
+        ('out.targets', 'i', out_csr[1]),
+        ('in.offsets', 'q', in_csr[0]),
+        ('in.targets', 'i', in_csr[1]),
+    ]
+    all_sections.extend(sections)
+
+    trailer = dict(meta or {})
+    trailer['nodes'] = len(names)
+    trailer['edges'] = len(out_csr[1])
+    trailer['sections'] = {}
+
+    with atomic_file(file_name, '.tmp-graph-') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+        position = HEADER.size
+
+        for name, typecode, values in all_sections:
+            chunk = to_bytes(typecode, values)
+            f.write(b'\0' * (-position % 8))
+            position += -position % 8
+            trailer['sections'][name] = [position, len(chunk) // ITEM_SIZES[typecode], typecode]
+            f.write(chunk)
+            position += len(chunk)
+
+        encoded = json.dumps(trailer, sort_keys=True).encode('utf-8')
+        f.write(encoded)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, position, len(encoded)))
+
+
+class StringTable(object):
+    """
+    Read-only sequence of the strings of a string table, each decoded the
+    first time it is asked for.  With a sorted section, find() looks names
+    up by binary search.
+    """
+
+    def __init__(self, offsets, data, order=None):
+        self.offsets=offsets
+        self.data=data
+        self.order=order
+        self.decoded={}
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        value = self.decoded.get(i)
+        if value is None:
+            if i < 0:
+                i += len(self)
+            if not 0 <= i < len(self):
+                raise IndexError('string table index out of range')
+            value = self.decoded[i] = bytes(self.data[self.offsets[i]:self.offsets[i+1]]).decode('utf-8')
+        return value
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def find(self, value, default=None):
+        """
+        Index of value, or default.
+        """
+        order = self.order
+        if order is None:
+            for i, x in enumerate(self):
+                if x == value:
+                    return i
+            return default
+
+        low, high = 0, len(order)
+        while low < high:
+            middle = (low + high) // 2
+            if self[order[middle]] < value:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(order) and self[order[low]] == value:
+            return order[low]
+        return default
+
+
+class NameIndex(object):
+    """
+    Name -> ID lookups over a StringTable, as a stand-in for a dict.
+    """
+
+    def __init__(self, table):
+        self.table=table
+
+    def get(self, name, default=None):
+        return self.table.find(name, default)
+
+    def __getitem__(self, name):
+        i = self.table.find(name)
+        if i is None:
+            raise KeyError(name)
+        return i
+
+    def __contains__(self, name):
+        return self.table.find(name) is not None
+
+    def __len__(self):
+        return len(self.table)
+
+
+class BinaryGraphFile(object):
+    """
+    A graph file opened with mmap.  meta is its trailer.
+    """
+
+    def __init__(self, file_name):
+        f = open(file_name, 'rb')
+        try:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            f.close()
+
+        if len(self.data) < HEADER.size:
+            raise ValueError('%s is not a binary graph file' % file_name)
+        magic, version, meta_offset, meta_length = HEADER.unpack(self.data[:HEADER.size])
+        if magic != MAGIC:
+            raise ValueError('%s is not a binary graph file' % file_name)
+        if version != VERSION:
+            raise ValueError('%s is a binary graph file of unknown version %d' % (file_name, version))
+
+        self.meta = json.loads(self.data[meta_offset:meta_offset + meta_length].decode('utf-8'))
+        self.view = memoryview(self.data) if ZERO_COPY else None
+
+    def has(self, name):
+        return name in self.meta['sections']
+
+    def section(self, name):
+        """
+        The named section, as a memoryview of the mapping where possible,
+        otherwise as a copy in an array; None if the file has none.
+        """
+        entry = self.meta['sections'].get(name)
+        if entry is None:
+            return None
+
+        offset, count, typecode = entry
+        end = offset + count * ITEM_SIZES[typecode]
+
+        if self.view is not None:
+            view = self.view[offset:end]
+            return view if typecode == 'B' else view.cast(typecode)
+
+        if typecode == 'B':
+            return self.data[offset:end]
+        values = array(TYPECODES[typecode])
+        data = self.data[offset:end]
+        values.frombytes(data) if hasattr(values, 'frombytes') else values.fromstring(data)
+        if sys.byteorder != 'little':
+            values.byteswap()
+        return values
+
+    def strings(self, name):
+        return StringTable(self.section(name + '.offsets'), self.section(name), self.section(name + '.sorted'))
+
+    def names(self):
+        return self.strings('names')
@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+
+import sys, time, json
+from collections import OrderedDict
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+__doc__="""
+
+Phase timers, counters and peak memory sampling shared by the scripts, reported with their --stats, --stats-json
+and --cprofile options.  Code reports to whatever stats() returns, which is a NullStats doing nothing unless
+enable() was called, so a run without those options pays for a few no-op calls per phase.  Counting calls to hot
+methods, like lookups, is done by wrapping the methods only once enabled.
+
+"""
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process so far, or None where the
+    resource module is missing.
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes, except on macOS
+    return rss / float(1<<20 if sys.platform == 'darwin' else 1<<10)
+
+
+class Phase(object):
+    """
+    Times one run of a named phase, as a context manager.
+    """
+
+    def __init__(self, stats, name):
+        self.stats=stats
+        self.name=name
+        self.start=None
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stats.end_phase(self.name, time.time() - self.start)
+        return False
+
+
+class NullPhase(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class CountingFile(object):
+    """
+    File wrapper adding the length of everything written to a counter.
+    """
+
+    def __init__(self, file, stats, counter):
+        self.file=file
+        self.stats=stats
+        self.counter=counter
+
+    def write(self, data):
+        self.stats.count(self.counter, len(data))
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+class Stats(object):
+    """
+    Phases, in the order they first ran, with their number of runs, total
+    time and the peak RSS of the process when they last ended; and named
+    counters.
+    """
+
+    enabled=True
+
+    def __init__(self):
+        self.start=time.time()
+        self.phases=OrderedDict()
+        self.counters=OrderedDict()
+        self.wrapped=[]
+        self.profiler=None
+
+    def phase(self, name):
+        return Phase(self, name)
+
+    def end_phase(self, name, seconds):
+        entry = self.phases.get(name)
+        if entry is None:
+            entry = self.phases[name] = {'phase': name, 'calls': 0, 'seconds': 0.0, 'peak_rss_mb': None}
+        entry['calls'] += 1
+        entry['seconds'] += seconds
+        entry['peak_rss_mb'] = peak_rss_mb()
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def record(self, name, value):
+        self.counters[name] = value
+
+    def count_calls(self, owner, method, counter):
+        """
+        Count the calls made to owner.method from now on, until restore().
+        """
+        original = owner.__dict__[method]
+        function = original.__func__ if isinstance(original, (staticmethod, classmethod)) else original
+        stats = self
+
+        def counting(*args, **kwargs):
+            stats.counters[counter] = stats.counters.get(counter, 0) + 1
+            return function(*args, **kwargs)
+
+        counting.__name__ = function.__name__
+        setattr(owner, method, type(original)(counting) if function is not original else counting)
+        self.wrapped.append((owner, method, original))
+
+    def wrap_file(self, file, counter='bytes written'):
+        return CountingFile(file, self, counter)
+
+    def restore(self):
+        while self.wrapped:
+            owner, method, original = self.wrapped.pop()
+            setattr(owner, method, original)
+
+    def summary(self):
+        return {
+            'seconds': time.time() - self.start,
+            'peak_rss_mb': peak_rss_mb(),
+            'phases': list(self.phases.values()),
+            'counters': self.counters,
+        }
+
+    def write_table(self, file):
+        summary = self.summary()
+
+        file.write('%-20s %8s %10s %12s\n' % ('phase', 'calls', 'seconds', 'peak RSS MB'))
+        for entry in summary['phases']:
+            rss = entry['peak_rss_mb']
+            file.write('%-20s %8d %10.3f %12s\n' % (entry['phase'], entry['calls'], entry['seconds'], '-' if rss is None else '%.1f' % rss))
+        rss = summary['peak_rss_mb']
+        file.write('%-20s %8s %10.3f %12s\n' % ('total', '', summary['seconds'], '-' if rss is None else '%.1f' % rss))
+
+        if summary['counters']:
+            file.write('\n%-30s %12s\n' % ('counter', 'value'))
+            for name, value in summary['counters'].items():
+                file.write('%-30s %12d\n' % (name, value))
+
+    def write_json(self, file_name):
+        f = open(file_name, 'w')
+        try:
+            json.dump(self.summary(), f, indent=2)
+        finally:
+            f.close()
+
+
+class NullStats(object):
+    """
+    Stands in for Stats when instrumentation is off.
+    """
+
+    enabled=False
+    NULL_PHASE=NullPhase()
+
+    def phase(self, name):
+        return NullStats.NULL_PHASE
+
+    def count(self, name, n=1):
+        pass
+
+    def record(self, name, value):
+        pass
+
+    def count_calls(self, owner, method, counter):
+        pass
+
+    def wrap_file(self, file, counter='bytes written'):
+        return file
+
+    def restore(self):
+        pass
+
+
+current=NullStats()
+
+
+def stats():
+    return current
+
+
+def enable():
+    global current
+    current = Stats()
+    return current
+
+
+def add_options(op):
+    """
+    Add the --stats, --stats-json and --cprofile options to an
+    optparse.OptionParser.
+    """
+    op.add_option("--stats", dest="stats", action="store_true", default=False, help="Print the time and peak memory of each phase of the run, and some counters, to stderr")
+    op.add_option("--stats-json", dest="stats_json", default=None, help="Save the --stats figures to this JSON file")
+    op.add_option("--cprofile", dest="cprofile", default=None, help="Profile the run with cProfile and save the stats to this file, for the pstats module")
+
+
+def start(options):
+    """
+    Enable instrumentation if the options made by add_options ask for it,
+    returning stats().
+    """
+    if not (options.stats or options.stats_json or options.cprofile):
+        return stats()
+
+    s = enable()
+    if options.cprofile:
+        import cProfile
+        s.profiler = cProfile.Profile()
+        s.profiler.enable()
+    return s
+
+
+def finish(options):
+    """
+    Stop profiling and write out what start() asked for.
+    """
+    s = stats()
+    if not s.enabled:
+        return
+
+    if s.profiler:
+        s.profiler.disable()
+        s.profiler.dump_stats(options.cprofile)
+
+    s.restore()
+
+    if options.stats:
+        s.write_table(sys.stderr)
+    if options.stats_json:
+        s.write_json(options.stats_json)
@@ -1,7 +1,31 @@
 """
 Makes use of Maven to generate a DOT file of maven project dependencies
 """
-import sys, pydot, optparse, re, json 
+import sys, os, optparse, re, json, multiprocessing, hashlib, struct, pickle, binascii
+from collections import OrderedDict
+from array import array
+from functools import partial
+from bisect import bisect_left
+
+from graph_adjacency_list import AdjacencyGraph, GraphCore, GraphmlPrinter
+from graph_analytics import GraphAnalytics, GraphCoarsening, distinctColor
+import instrumentation
+from instrumentation import stats
+import graph_binary
+
+try:
+    string_types = basestring
+except NameError:
+    string_types = str
+
+try:
+    # the regular expression parser, used to find literal text in patterns
+    import re._parser as sre_parse
+except ImportError:
+    try:
+        import sre_parse
+    except ImportError:
+        sre_parse = None
 
 
 class NodeStyleRule(object):
@@ -33,8 +57,8 @@ class NodeStyleRule(object):
 
 
     def apply(self, graph, edge):
-        self.apply_node(graph, edge.get_source())
-        self.apply_node(graph, edge.get_destination())
+        self.apply_node(graph, edge[0])
+        self.apply_node(graph, edge[1])
 
 
     def apply_node(self, graph, node_name):
@@ -48,57 +72,244 @@ class NodeStyleRule(object):
 
             # if no node, create one so you can
             # hang your styling directives
-            if not n:
-                n = [pydot.Node(node_name)]
-                graph.add_node(n[0])
+            if n is None:
+                n = graph.add_node(node_name)
 
             # actually impose the styles    
-            self.copy_attributes(n[0])
+            self.copy_attributes(n)
         
 
     def copy_attributes(self, node):
         for a in self.style_attributes:
-            node.set(a, self.style_attributes[a])
+            node[a] = self.style_attributes[a]
         
 
 
 
 
+class NodeStyleRuleSet(object):
+    """
+    Applies a list of NodeStyleRules to a graph, matching each distinct node
+    name once instead of once per rule per edge.  Matches are memoized by
+    node name, and attributes are applied in rule order, so the last
+    matching rule still wins.
+
+    Rules whose pattern requires some literal text (say 'slf4j' in
+    '^.*slf4j.*$') are only run against names containing it.  The others
+    are compiled, a run of consecutive rules at a time, into a single
+    alternation with one named group per rule.  match() tries the
+    alternatives in order, so the group that matched is the first rule of
+    the run that matches, and the search resumes after it.  Rules that
+    can't be combined safely (backreferences, inline flags) are matched on
+    their own.
+    """
+
+    # stays clear of the 100 group limit older Pythons put on a pattern
+    MAX_GROUPS=90
+    STANDALONE=re.compile(r'\\[1-9]|\(\?P=|^\(\?[a-zA-Z]+\)')
+
+    def __init__(self, rules):
+        self.rules=list(rules)
+        self.memo={}
+        # pattern matches run, for --stats
+        self.evaluations=0
+        self.combined={}
+
+        # (literal, rule index) for rules that can be prefiltered, and the
+        # indexes of the rest, in rule order
+        self.literals=[]
+        self.unfiltered=[]
+        for i, rule in enumerate(self.rules):
+            literal = NodeStyleRuleSet.required_literal(rule.match_pattern)
+            if literal:
+                self.literals.append((literal, i))
+            else:
+                self.unfiltered.append(i)
+
+        # index the literals by their first few characters, so a name only
+        # has to look up its own substrings of that length
+        self.prefix_length=0
+        self.literal_prefixes={}
+        if self.literals:
+            self.prefix_length = min(4, min(len(literal) for literal, i in self.literals))
+            for literal, i in self.literals:
+                self.literal_prefixes.setdefault(literal[:self.prefix_length], []).append((literal, i))
+            # finds every substring of prefix_length characters in one call
+            self.substrings=re.compile('(?=(.{%d}))' % self.prefix_length, re.DOTALL)
+
+        # split the unfiltered rules into runs that can share a combined
+        # pattern, recording for each position where its run ends
+        self.run_end=[0] * len(self.unfiltered)
+        start = 0
+        groups = 0
+        for k, i in enumerate(self.unfiltered):
+            pattern = self.rules[i].match_pattern
+            standalone = self.STANDALONE.search(pattern.pattern) is not None
+            size = pattern.groups + 1
+
+            if standalone or groups + size > NodeStyleRuleSet.MAX_GROUPS:
+                for j in range(start, k):
+                    self.run_end[j] = k
+                start = k
+                groups = 0
+
+            groups += size
+
+            if standalone:
+                self.run_end[k] = k + 1
+                start = k + 1
+                groups = 0
+
+        for j in range(start, len(self.unfiltered)):
+            self.run_end[j] = len(self.unfiltered)
+
+    @staticmethod
+    def required_literal(pattern):
+        """
+        Longest run of plain characters that every match of the compiled
+        pattern must contain, or None when there isn't one we can be sure of.
+        """
+        if sre_parse is None or '(?' in pattern.pattern or pattern.flags & (re.IGNORECASE | re.VERBOSE):
+            return None
+
+        try:
+            parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+            best = ''
+            run = []
+            # top level items of the pattern all have to match, in sequence
+            for op, av in list(parsed) + [(None, None)]:
+                if op == sre_parse.LITERAL:
+                    run.append(chr(av))
+                else:
+                    if len(run) > len(best):
+                        best = ''.join(run)
+                    run = []
+        except Exception:
+            return None
+
+        return best or None
+
+    def combined_pattern(self, start):
+        """
+        Compiled alternation of the unfiltered rules from position start to
+        the end of its run, and the rule index for each of its named groups.
+        """
+        entry = self.combined.get(start)
+
+        if entry is None:
+            end = self.run_end[start]
+            indexes = self.unfiltered[start:end]
+            if len(indexes) == 1:
+                entry = (self.rules[indexes[0]].match_pattern, None)
+            else:
+                parts = ['(?P<_rule%d>%s)' % (i, self.rules[i].match_pattern.pattern) for i in indexes]
+                try:
+                    pattern = re.compile('|'.join(parts))
+                except re.error:
+                    # e.g. two rules using the same group name; match this
+                    # run one rule at a time instead
+                    for k in range(start, end):
+                        self.run_end[k] = k + 1
+                    return self.combined_pattern(start)
+                groups = dict((pattern.groupindex['_rule%d' % i], k) for k, i in zip(range(start, end), indexes))
+                entry = (pattern, groups)
+            self.combined[start] = entry
+
+        return entry
+
+    def matching_rules(self, node_name):
+        """
+        Indexes of the rules matching node_name, in rule order.
+        """
+        result = self.memo.get(node_name)
+
+        if result is None:
+            result = []
+
+            if self.literal_prefixes:
+                found = set(self.substrings.findall(node_name)).intersection(self.literal_prefixes)
+                for prefix in found:
+                    for literal, i in self.literal_prefixes[prefix]:
+                        if literal in node_name:
+                            self.evaluations += 1
+                            if self.rules[i].match_pattern.match(node_name):
+                                result.append(i)
+            start = 0
+
+            while start < len(self.unfiltered):
+                pattern, groups = self.combined_pattern(start)
+                m = pattern.match(node_name)
+                self.evaluations += 1
+
+                if not m:
+                    start = self.run_end[start]
+                elif groups is None:
+                    result.append(self.unfiltered[start])
+                    start += 1
+                else:
+                    # the outermost group of the matching alternative closes last
+                    k = groups[m.lastindex]
+                    result.append(self.unfiltered[k])
+                    start = k + 1 if k + 1 < self.run_end[start] else self.run_end[start]
+
+            result.sort()
+            self.memo[node_name] = result
+
+        return result
+
+    def apply(self, graph, node_names):
+        """
+        Style the named nodes of graph, creating node statements as needed.
+        """
+        matches = [(name, self.matching_rules(name)) for name in node_names]
+
+        # create missing nodes in the order rule-by-rule application would
+        # have, i.e. grouped by the first rule that matches them
+        missing = [[] for x in self.rules]
+        for name, rules in matches:
+            if rules and graph.get_node(name) is None:
+                missing[rules[0]].append(name)
+        for names in missing:
+            for name in names:
+                graph.add_node(name)
+
+        for name, rules in matches:
+            node = graph.get_node(name)
+            for i in rules:
+                self.rules[i].copy_attributes(node)
+
+
+
 class SquashVersionRule(object):
 
     MVN_VERSION_POSITION=3
     
     def apply(self, graph, edge):
-
-        # create a new edge with the version removed from the node names
-        old_src, old_dst = (edge.get_source(), edge.get_destination()) 
-        new_edge = pydot.Edge(self.squash_version(old_src), self.squash_version(old_dst))
+        """
+        Add edge, a (source, destination, attributes) tuple, to graph with
+        the versions removed from the node names.
+        """
+        old_src, old_dst = edge[0], edge[1]
+        graph.add_edge(self.squash_version(old_src), self.squash_version(old_dst))
 
         # tag the target of the edge's version
         self.tag_version(graph, old_dst)
 
-        # remove old and add new
-        graph.del_edge(old_src, old_dst)
-        graph.add_edge(new_edge)
-
     def tag_version(self, graph, version_name):
 
         no_version_name = self.squash_version(version_name)
 
-        nlist = graph.get_node(no_version_name)
+        n = graph.get_node(no_version_name)
 
         # if no node, create one so you can
         # hang your styling directives
-        if not nlist:
-            n = pydot.Node(no_version_name)
-            graph.add_node(n)        
-        else:
-            n = nlist[0]
+        if n is None:
+            n = graph.add_node(no_version_name)
 
         versions = n.get('versions')
         if not versions:
             versions = set([])
-            n.set('versions', versions)
+            n['versions'] = versions
 
         versions.add(version_name)
 
@@ -111,22 +322,958 @@ class SquashVersionRule(object):
     @staticmethod
     def clean_version_tag(node):
         """
-        remove the 'versions' attribute otherwise dot will barf, and 
-        mark nodes with more than one version by changing the node shape
+        mark nodes with more than one version by changing the node shape;
+        the 'versions' attribute itself is never written out
         """
         versions = node.get('versions')
         if versions:
             if len(versions) > 1:
-                node.set('shape', 'tripleoctagon')
+                node['shape'] = 'tripleoctagon'
                 # for nodes we didn't otherwise style, if they don't 
                 # get styled, the node shape will also not change
                 if not node.get('style'):
-                    node.set('style', 'filled')
-                    node.set('fillcolor', GraphProcessor.DEFAULT_COLORS['conflict'])
+                    node['style'] = 'filled'
+                    node['fillcolor'] = GraphProcessor.DEFAULT_COLORS['conflict']
                 
-        # we don't have a good way of actually removing the attribute, so we set it to a blank string
-        node.set('versions', " ")
-        
+    def squash_graph(self, graph):
+        """
+        Returns a new DependencyGraph with the versions removed from graph,
+        built in one pass.  Edges that collapse onto the same pair are only
+        added once, and each squashed target collects the versioned names
+        it was reached under, as apply() does edge by edge.
+        """
+        squashed = DependencyGraph(graph.name, graph.graph_type, graph.attributes)
+
+        for name, attributes in graph.nodes:
+            squashed.add_node(name, dict(attributes))
+
+        # a coordinate shows up on many edges, so only split it once
+        keys = {}
+        squash_version = self.squash_version
+        edge_index = squashed.edge_index
+        node_index = squashed.node_index
+
+        for src, dst, attributes in graph.edges:
+
+            try:
+                src_key = keys[src]
+            except KeyError:
+                src_key = keys[src] = squash_version(src)
+
+            try:
+                dst_key = keys[dst]
+            except KeyError:
+                dst_key = keys[dst] = squash_version(dst)
+
+            if (src_key, dst_key) not in edge_index:
+                squashed.add_edge(src_key, dst_key)
+
+            n = node_index.get(dst_key)
+            if n is None:
+                n = squashed.add_node(dst_key)
+
+            versions = n.get('versions')
+            if not versions:
+                versions = n['versions'] = set([])
+
+            versions.add(dst)
+
+        return squashed
+
+
+
+class DependencyGraph(object):
+    """
+    Plain-data dependency graph used through the whole pipeline, with pydot
+    only built at the end for output.  Edges are (source, destination,
+    attributes) tuples in pydot's get_edges() order, and explicit node
+    statements are (name, attributes) pairs where attributes is a plain
+    dict that styling updates in place.  Both are indexed, by name and by
+    (source, destination), so lookups don't scan.  It is much cheaper to
+    pickle than pydot objects, so it is what worker processes hand back.
+    """
+
+    def __init__(self, name, graph_type='digraph', attributes=None):
+        self.name=name
+        self.graph_type=graph_type
+        self.attributes=dict(attributes or {})
+        self.edges=[]
+        self.nodes=[]
+        self.node_index={}
+        self.edge_index={}
+        # how many edges came before each node statement, so to_pydot can
+        # interleave them in the order they were added
+        self.node_positions=[]
+        # reverse flag -> (number of edges covered, adjacency), see adjacency()
+        self.adjacency_index={}
+        # (edges, node statements) covered -> sorted names, see resolve()
+        self.sorted_names=None
+
+    def add_edge(self, src, dst, attributes=None):
+        if attributes is None:
+            attributes = {}
+        self.edges.append((src, dst, attributes))
+        self.edge_index.setdefault((src, dst), attributes)
+
+    def add_edges(self, edges):
+        """
+        Add a list of (source, destination, attributes) tuples.
+        """
+        self.edges.extend(edges)
+        index = self.edge_index
+        for src, dst, attributes in edges:
+            if (src, dst) not in index:
+                index[(src, dst)] = attributes
+
+    def add_node(self, name, attributes=None):
+        """
+        Add a node statement and return its attributes dict.
+        """
+        if attributes is None:
+            attributes = {}
+        self.nodes.append((name, attributes))
+        self.node_index[name] = attributes
+        self.node_positions.append(len(self.edges))
+        return attributes
+
+    def get_node(self, name):
+        """
+        Attributes dict of the node statement for name, or None if there
+        isn't one.
+        """
+        return self.node_index.get(name)
+
+    def get_edge(self, src, dst):
+        """
+        Attributes dict of the first edge from src to dst, or None.
+        """
+        return self.edge_index.get((src, dst))
+
+    def edge_node_names(self):
+        """
+        Names of the edge endpoints, each once, in order of first appearance.
+        """
+        seen = set()
+        names = []
+        for src, dst, attributes in self.edges:
+            for name in (src, dst):
+                if name not in seen:
+                    seen.add(name)
+                    names.append(name)
+        return names
+
+    def adjacency(self, reverse=False):
+        """
+        Map every edge endpoint to the indexes of its out-edges, or of its
+        in-edges when reverse is set.  Built on first use, and again if
+        edges were added since.
+        """
+        cached = self.adjacency_index.get(reverse)
+        if cached is not None and cached[0] == len(self.edges):
+            return cached[1]
+
+        index = {}
+        for i, (src, dst, attributes) in enumerate(self.edges):
+            if reverse:
+                src, dst = dst, src
+            edges = index.get(src)
+            if edges is None:
+                edges = index[src] = []
+            edges.append(i)
+            if dst not in index:
+                index[dst] = []
+
+        self.adjacency_index[reverse] = (len(self.edges), index)
+        return index
+
+    def resolve(self, name):
+        """
+        Sorted names of the nodes name stands for, as in
+        ReachabilityIndex.resolve: the node itself, with or without its
+        quotes, or every node whose coordinates it starts.
+        """
+        adjacency = self.adjacency()
+        for x in (name, '"%s"' % name):
+            if x in adjacency or x in self.node_index:
+                return [x]
+
+        covered = (len(self.edges), len(self.nodes))
+        if self.sorted_names is None or self.sorted_names[0] != covered:
+            self.sorted_names = (covered, sorted(set(adjacency).union(self.node_index)))
+
+        sorted_names = self.sorted_names[1]
+        start, stop = coordinate_range(sorted_names, name)
+        return sorted_names[start:stop]
+
+    def reachable(self, roots, depth=None, reverse=False):
+        """
+        Breadth-first walk from the named roots along out-edges, or along
+        in-edges when reverse is set, going at most depth edges deep when
+        depth is given.  Returns the names reached, in the order they were
+        reached; names that aren't in the graph are ignored.
+        """
+        adjacency = self.adjacency(reverse)
+        edges = self.edges
+        end = 0 if reverse else 1
+
+        seen = set()
+        order = []
+        for name in roots:
+            if (name in adjacency or name in self.node_index) and name not in seen:
+                seen.add(name)
+                order.append(name)
+
+        start = 0
+        level = 0
+        while start < len(order) and (depth is None or level < depth):
+            stop = len(order)
+            for name in order[start:stop]:
+                for i in adjacency.get(name, ()):
+                    x = edges[i][end]
+                    if x not in seen:
+                        seen.add(x)
+                        order.append(x)
+            start = stop
+            level += 1
+
+        return order
+
+    def subgraph(self, roots, depth=None, reverse=False):
+        """
+        A new DependencyGraph induced by the nodes reachable(roots, depth,
+        reverse): their node statements and every edge between them, in
+        their original direction and order.  Only the edges of the nodes
+        reached are looked at.  A node reached that is left without edges
+        or a statement, like a root with depth 0, gets an empty statement.
+        """
+        reached = self.reachable(roots, depth, reverse)
+        inside = set(reached)
+        adjacency = self.adjacency(reverse)
+        edges = self.edges
+        end = 0 if reverse else 1
+
+        selected = sorted(i for name in reached for i in adjacency.get(name, ()) if edges[i][end] in inside)
+
+        graph = DependencyGraph(self.name, self.graph_type, self.attributes)
+        graph.add_edges([(edges[i][0], edges[i][1], dict(edges[i][2])) for i in selected])
+
+        # every other node is reached along a selected edge, so only roots
+        # can be left on their own
+        endpoints = set()
+        for i in selected:
+            endpoints.update(edges[i][:2])
+
+        for name in reached:
+            attributes = self.node_index.get(name)
+            if attributes is not None:
+                graph.add_node(name, dict(attributes))
+            elif name not in endpoints:
+                graph.add_node(name)
+
+        return graph
+
+    def to_adjacency(self, rename=None):
+        """
+        An AdjacencyGraph of the edges, each (source, destination) pair
+        once, and of the nodes of the node statements, with every name
+        passed through rename if it is given.  Names are interned in order
+        of first appearance, edges first.
+        """
+        adjacency = AdjacencyGraph()
+        core = adjacency.core
+        intern = core.intern
+        if rename is not None:
+            intern = lambda name: core.intern(rename(name))
+
+        seen = set()
+        for src, dst, attributes in self.edges:
+            if (src, dst) not in seen:
+                seen.add((src, dst))
+                core.addEdge(intern(src), intern(dst))
+        for name, attributes in self.nodes:
+            intern(name)
+
+        return adjacency
+
+    @staticmethod
+    def from_pydot(graph):
+        g = DependencyGraph(graph.get_name(), graph.get_type(), graph.get_attributes())
+
+        for e in graph.get_edges():
+            g.add_edge(e.get_source(), e.get_destination(), dict(e.get_attributes()))
+
+        for n in graph.get_nodes():
+            g.add_node(n.get_name(), dict(n.get_attributes()))
+
+        return g
+
+    def write_binary(self, file_name):
+        """
+        Save the graph in the graph_binary format.  Besides the common
+        sections, 'edges.order' gives the position in out.targets of each
+        edge in the order it was added, 'nodes.ids' and 'nodes.positions'
+        the node statements and the number of edges before each, and
+        string tables hold their attributes and versions as JSON, and the
+        attributes of the edges if any have some.
+        """
+        core = GraphCore()
+        sources = array('i')
+        targets = array('i')
+        for src, dst, attributes in self.edges:
+            sources.append(core.intern(src))
+            targets.append(core.intern(dst))
+        statement_ids = [core.intern(name) for name, attributes in self.nodes]
+
+        n = len(core.names)
+        out_csr = GraphCore.buildCsr(n, sources, targets)
+        in_csr = GraphCore.buildCsr(n, targets, sources)
+
+        # the sort is stable, so each source's edges keep their order
+        position = list(out_csr[0][:n])
+        order = array('i', [0]) * len(sources)
+        for k, src in enumerate(sources):
+            order[k] = position[src]
+            position[src] += 1
+
+        attributes = []
+        versions = []
+        for name, node_attributes in self.nodes:
+            node_attributes = dict(node_attributes)
+            node_versions = node_attributes.pop('versions', None)
+            attributes.append(json.dumps(node_attributes) if node_attributes else '')
+            versions.append(json.dumps(sorted(node_versions)) if node_versions is not None else '')
+
+        sections = [
+            ('edges.order', 'i', order),
+            ('nodes.ids', 'i', statement_ids),
+            ('nodes.positions', 'q', self.node_positions),
+        ]
+        sections.extend(graph_binary.string_sections('nodes.attributes', attributes))
+        sections.extend(graph_binary.string_sections('nodes.versions', versions))
+        if any(attributes for src, dst, attributes in self.edges):
+            edge_attributes = [json.dumps(attributes) if attributes else '' for src, dst, attributes in self.edges]
+            sections.extend(graph_binary.string_sections('edges.attributes', edge_attributes))
+
+        meta = {'name': self.name, 'type': self.graph_type, 'attributes': self.attributes}
+        graph_binary.write_graph(file_name, core.names, out_csr, in_csr, meta, sections)
+
+    @staticmethod
+    def from_binary(binary):
+        """
+        The DependencyGraph in a graph_binary.BinaryGraphFile.  Files
+        written by graph_adjacency_list.py have no node statements and
+        give their edges in CSR order.  This skips parsing, but unlike
+        MappedGraphCore it copies every edge and attribute out of the
+        mapping, as the rest of the pipeline works on those.
+        """
+        meta = binary.meta
+        graph = DependencyGraph(meta.get('name', 'G'), meta.get('type', 'digraph'), meta.get('attributes'))
+
+        names = list(binary.names())
+        offsets = binary.section('out.offsets')
+        targets = binary.section('out.targets')
+
+        pairs = []
+        for i, name in enumerate(names):
+            pairs.extend([(name, names[x]) for x in targets[offsets[i]:offsets[i+1]]])
+
+        order = binary.section('edges.order')
+        if order is not None:
+            pairs = [pairs[k] for k in order]
+
+        if binary.has('edges.attributes'):
+            attributes = binary.strings('edges.attributes')
+            edges = [(src, dst, json.loads(a) if a else {}) for (src, dst), a in zip(pairs, attributes)]
+        else:
+            edges = [(src, dst, {}) for src, dst in pairs]
+
+        start = 0
+        if binary.has('nodes.ids'):
+            attributes = binary.strings('nodes.attributes')
+            versions = binary.strings('nodes.versions')
+            positions = binary.section('nodes.positions')
+
+            # put the node statements back between the edges they came between
+            for k, i in enumerate(binary.section('nodes.ids')):
+                node_attributes = json.loads(attributes[k]) if attributes[k] else {}
+                if versions[k]:
+                    node_attributes['versions'] = set(json.loads(versions[k]))
+                graph.add_edges(edges[start:positions[k]])
+                graph.add_node(names[i], node_attributes)
+                start = max(start, positions[k])
+
+        graph.add_edges(edges[start:])
+        return graph
+
+    def statements(self):
+        """
+        Yield ('edge', (src, dst, attributes)) and ('node', (name,
+        attributes)) in the order they were added.
+        """
+        nodes = self.nodes
+        positions = self.node_positions
+        n = 0
+
+        for count, edge in enumerate(self.edges):
+            while n < len(nodes) and positions[n] <= count:
+                yield 'node', nodes[n]
+                n += 1
+            yield 'edge', edge
+
+        for node in nodes[n:]:
+            yield 'node', node
+
+    def to_pydot(self):
+        """
+        Build the pydot graph, for rendering with dot.  Only needed for
+        output formats other than raw DOT, which DotWriter writes directly.
+        """
+        import pydot
+
+        graph = pydot.Dot(graph_name=self.name, graph_type=self.graph_type)
+
+        for a in self.attributes:
+            graph.set(a, self.attributes[a])
+
+        internal = DotWriter.INTERNAL_ATTRIBUTES
+
+        for kind, statement in self.statements():
+            if kind == 'edge':
+                src, dst, attributes = statement
+                graph.add_edge(pydot.Edge(src, dst, **attributes))
+            else:
+                name, attributes = statement
+                attributes = dict((a, v) for a, v in attributes.items() if a not in internal)
+                graph.add_node(pydot.Node(name, None, **attributes))
+
+        return graph
+
+
+
+class DotWriter(object):
+    """
+    Writes a DependencyGraph as DOT straight to a file, laid out the way
+    pydot's to_string lays it out, without building pydot objects first.
+    Text is gathered into chunks of about buffer_size characters for each
+    write, and quoted names are worked out once per name.  Attributes in
+    INTERNAL_ATTRIBUTES, like the 'versions' sets squashing hangs on
+    nodes, are left out.
+
+    Statements are written in DependencyGraph order, which follows
+    pydot's get_edges() and get_nodes() rather than the input file: an
+    edge that appears more than once has its copies written together at
+    its first position, and node statements of files read through pydot
+    come after the edges.  pydot's to_string wrote the parsed graph in
+    file order.  Besides the 'versions' attributes and the trailing blank
+    line print() added, that is the only difference from pydot's output.
+    """
+
+    INTERNAL_ATTRIBUTES=frozenset(['versions'])
+    KEYWORDS=frozenset(['graph', 'subgraph', 'digraph', 'node', 'edge', 'strict'])
+    # pydot reads 'node [shape=box];' and the like as node statements of
+    # these names, which must stay unquoted to set the defaults again
+    DEFAULT_STATEMENTS=frozenset(['graph', 'node', 'edge'])
+    # IDs that need no quotes: plain identifiers, numerals, and strings
+    # that are already quoted or HTML
+    PLAIN_ID=re.compile(r'^(?:[_a-zA-Z][a-zA-Z0-9_]*|[0-9]+\.?[0-9]*|[0-9]*\.[0-9]+|".*"|<.*>)$', re.S)
+
+    def __init__(self, file, buffer_size=1<<20):
+        self.file=file
+        self.buffer_size=buffer_size
+        self.ids={}
+
+    def quote(self, value):
+        if isinstance(value, bool):
+            return str(value).lower()
+        if not isinstance(value, string_types):
+            return str(value)
+        if value == '':
+            return '""'
+        if value.lower() not in DotWriter.KEYWORDS and DotWriter.PLAIN_ID.match(value):
+            return value
+        return '"%s"' % value.replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r')
+
+    def quote_id(self, name):
+        quoted = self.ids.get(name)
+        if quoted is None:
+            quoted = self.ids[name] = self.quote(name)
+        return quoted
+
+    def format_attributes(self, attributes):
+        formatted = []
+        for a, v in attributes.items():
+            if a in DotWriter.INTERNAL_ATTRIBUTES:
+                continue
+            if v is None:
+                formatted.append(a)
+            else:
+                formatted.append('%s=%s' % (a, self.quote(v)))
+
+        if not formatted:
+            return ''
+        return ' [%s]' % ', '.join(formatted)
+
+    def write(self, graph):
+        arrow = ' -> ' if graph.graph_type == 'digraph' else ' -- '
+        quote_id = self.quote_id
+
+        chunk = []
+        size = 0
+
+        chunk.append('%s %s {\n' % (graph.graph_type, quote_id(graph.name)) if graph.name else '%s {\n' % graph.graph_type)
+        for a, v in graph.attributes.items():
+            chunk.append('%s=%s;\n' % (a, self.quote(v)))
+
+        for kind, statement in graph.statements():
+            if kind == 'edge':
+                src, dst, attributes = statement
+                line = quote_id(src) + arrow + quote_id(dst)
+            else:
+                name, attributes = statement
+                line = name if name in DotWriter.DEFAULT_STATEMENTS else quote_id(name)
+
+            if attributes:
+                line += self.format_attributes(attributes)
+
+            line += ';\n'
+            chunk.append(line)
+            size += len(line)
+
+            if size >= self.buffer_size:
+                self.file.write(''.join(chunk))
+                chunk = []
+                size = 0
+
+        chunk.append('}\n')
+        self.file.write(''.join(chunk))
+
+
+
+def read_dot_file(file_name):
+    # pydot loads pyparsing, which takes a while, so it is only imported
+    # for input MavenDotReader can't handle or output other than raw DOT
+    import pydot
+
+    # newer pydot versions return a list of all the graphs in the file
+    graph = pydot.graph_from_dot_file(file_name)
+    if isinstance(graph, list):
+        graph = graph[0]
+    return graph
+
+
+class MavenDotReader(object):
+    """
+    Reads the DOT files written by mvn dependency:tree -DoutputType=dot
+    straight into a DependencyGraph, one line at a time.  Those files only
+    ever contain a
+
+      digraph "group:artifact:type:version" {
+        "a" -> "b" ;
+      }
+
+    shape, which a few regular expressions handle far faster than pydot's
+    general grammar.  read() returns None for anything outside that
+    subset, so the caller can fall back to pydot.
+    """
+
+    HEADER=re.compile(r'^\s*digraph\s+("[^"\\]*")\s*\{\s*$')
+    EDGE=re.compile(r'^\s*("[^"\\]*")\s*->\s*("[^"\\]*")\s*;?\s*$')
+    FOOTER=re.compile(r'^\s*\}\s*$')
+
+    def read(self, lines):
+        graph = None
+        done = False
+        edges = {}
+        edge_order = []
+        match_edge = self.EDGE.match
+
+        for line in lines:
+            m = match_edge(line)
+
+            if m and graph and not done:
+                # pydot groups repeated edges under their first occurrence,
+                # so do the same to keep its get_edges() order
+                key = m.groups()
+                same = edges.get(key)
+                if same is None:
+                    edges[key] = [key]
+                    edge_order.append(key)
+                else:
+                    same.append(key)
+
+            elif not line.strip():
+                continue
+
+            elif graph is None:
+                m = self.HEADER.match(line)
+                if not m:
+                    return None
+                graph = DependencyGraph(m.group(1))
+
+            elif not done and self.FOOTER.match(line):
+                done = True
+
+            else:
+                return None
+
+        if not done:
+            return None
+
+        for key in edge_order:
+            for src, dst in edges[key]:
+                graph.add_edge(src, dst)
+
+        return graph
+
+    def read_file(self, file_name):
+        f = open(file_name, 'r')
+        try:
+            return self.read(f)
+        finally:
+            f.close()
+
+
+class ParsedGraphCache(object):
+    """
+    On-disk cache of parsed DependencyGraphs, so unchanged inputs don't
+    have to be parsed again on the next run.
+
+    Entries are stored by the SHA-1 of the file content, in a compact
+    binary form: a string table of node names, the edges as pairs of
+    32 bit indexes into it, and a small JSON block for the graph name and
+    any attributes.  To avoid hashing every input on every run, a record
+    per input path remembers the size, mtime and hash seen last time; the
+    content is only hashed again when the size or mtime changed, and a
+    file that was merely touched (a fresh checkout, say) still hits.
+
+    Every file is written to a temporary name and renamed into place, so
+    worker processes can share a cache directory.  evict() trims the
+    entries, least recently used first, to max_bytes.
+    """
+
+    MAGIC=b'MDGC'
+    VERSION=1
+
+    def __init__(self, cache_dir, max_bytes=512<<20):
+        self.cache_dir=cache_dir
+        self.max_bytes=max_bytes
+        self.paths_dir=os.path.join(cache_dir, 'paths')
+        for d in (self.cache_dir, self.paths_dir):
+            if not os.path.isdir(d):
+                try:
+                    os.makedirs(d)
+                except OSError:
+                    # another process got there first
+                    if not os.path.isdir(d):
+                        raise
+
+    def load(self, file_name, parse):
+        """
+        The DependencyGraph for file_name, from the cache if possible and
+        otherwise by calling parse(file_name) and storing the result.
+        """
+        digest = self.content_hash(file_name)
+        entry = os.path.join(self.cache_dir, digest + '.graph')
+
+        try:
+            f = open(entry, 'rb')
+        except IOError:
+            f = None
+
+        if f is not None:
+            try:
+                graph = ParsedGraphCache.decode(f.read())
+            finally:
+                f.close()
+            if graph is not None:
+                # the entry's mtime is its last use, for eviction
+                os.utime(entry, None)
+                return graph
+
+        graph = parse(file_name)
+        self.write_atomically(entry, ParsedGraphCache.encode(graph))
+        return graph
+
+    def content_hash(self, file_name):
+        path = os.path.abspath(file_name)
+        st = os.stat(path)
+        record = os.path.join(self.paths_dir, hashlib.sha1(path.encode('utf-8')).hexdigest())
+
+        try:
+            f = open(record, 'r')
+            try:
+                size, mtime, digest = f.read().split()
+            finally:
+                f.close()
+            if int(size) == st.st_size and mtime == repr(st.st_mtime):
+                return digest
+        except (IOError, ValueError):
+            pass
+
+        digest = file_sha1(path)
+        self.write_atomically(record, ('%d %s %s' % (st.st_size, repr(st.st_mtime), digest)).encode('ascii'))
+        return digest
+
+    def write_atomically(self, path, data):
+        with graph_binary.atomic_file(path) as f:
+            f.write(data)
+
+    def evict(self):
+        """
+        Remove least recently used entries until the cache fits max_bytes.
+        """
+        entries = []
+        total = 0
+        for x in os.listdir(self.cache_dir):
+            if x.endswith('.graph'):
+                path = os.path.join(self.cache_dir, x)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    @staticmethod
+    def encode(graph):
+        strings = {}
+        table = []
+        endpoints = array('I')
+        edge_attributes = {}
+
+        for i, (src, dst, attributes) in enumerate(graph.edges):
+            for name in (src, dst):
+                index = strings.get(name)
+                if index is None:
+                    index = strings[name] = len(table)
+                    table.append(name.encode('utf-8'))
+                endpoints.append(index)
+            if attributes:
+                edge_attributes[str(i)] = attributes
+
+        meta = json.dumps({
+            'name': graph.name,
+            'type': graph.graph_type,
+            'attributes': graph.attributes,
+            'edge_attributes': edge_attributes,
+            'nodes': [[name, attributes, position] for (name, attributes), position in zip(graph.nodes, graph.node_positions)],
+        }).encode('utf-8')
+
+        lengths = array('I', [len(x) for x in table])
+        if sys.byteorder != 'little':
+            lengths.byteswap()
+            endpoints.byteswap()
+
+        return b''.join([
+            ParsedGraphCache.MAGIC,
+            struct.pack('<IIII', ParsedGraphCache.VERSION, len(table), len(graph.edges), len(meta)),
+            array_bytes(lengths),
+            b''.join(table),
+            array_bytes(endpoints),
+            meta,
+        ])
+
+    @staticmethod
+    def decode(data):
+        """
+        The DependencyGraph encoded in data, or None if data is not a cache
+        entry this version understands.
+        """
+        if data[:4] != ParsedGraphCache.MAGIC or len(data) < 20:
+            return None
+
+        version, num_strings, num_edges, meta_length = struct.unpack('<IIII', data[4:20])
+        if version != ParsedGraphCache.VERSION:
+            return None
+
+        offset = 20
+        lengths = array('I')
+        array_frombytes(lengths, data[offset:offset + 4 * num_strings])
+        offset += 4 * num_strings
+
+        table = []
+        for length in lengths:
+            table.append(data[offset:offset + length].decode('utf-8'))
+            offset += length
+
+        endpoints = array('I')
+        array_frombytes(endpoints, data[offset:offset + 8 * num_edges])
+        offset += 8 * num_edges
+
+        if sys.byteorder != 'little':
+            endpoints.byteswap()
+
+        meta = json.loads(data[offset:offset + meta_length].decode('utf-8'))
+
+        graph = DependencyGraph(meta['name'], meta['type'], meta['attributes'])
+        edge_attributes = meta['edge_attributes']
+
+        names = iter([table[i] for i in endpoints])
+        if edge_attributes:
+            edges = [(src, dst, edge_attributes.get(str(i), {})) for i, (src, dst) in enumerate(zip(names, names))]
+        else:
+            edges = [(src, dst, {}) for src, dst in zip(names, names)]
+
+        # put the node statements back between the edges they came between
+        start = 0
+        for name, attributes, position in meta['nodes']:
+            graph.add_edges(edges[start:position])
+            graph.add_node(name, attributes)
+            start = max(start, position)
+        graph.add_edges(edges[start:])
+
+        return graph
+
+
+def coordinate_range(sorted_names, name):
+    """
+    (start, stop) of the names in sorted_names whose coordinates name
+    starts, so group:artifact:jar:1.0 finds that version in any scope.
+    The quotes that are part of node names may be left out of name.
+    """
+    prefix = name.rstrip('"')
+    if not prefix.startswith('"'):
+        prefix = '"' + prefix
+    prefix += ':'
+
+    # names starting with prefix sort right after it
+    start = stop = bisect_left(sorted_names, prefix)
+    while stop < len(sorted_names) and sorted_names[stop].startswith(prefix):
+        stop += 1
+    return start, stop
+
+
+def file_sha1(file_name):
+    h = hashlib.sha1()
+    f = open(file_name, 'rb')
+    try:
+        for chunk in iter(lambda: f.read(1<<20), b''):
+            h.update(chunk)
+    finally:
+        f.close()
+    return h.hexdigest()
+
+
+def int_to_bytes(n):
+    """
+    Big-endian bytes of a non-negative int, as short as they can be.
+    """
+    if hasattr(n, 'to_bytes'):
+        return n.to_bytes((n.bit_length() + 7) // 8, 'big')
+    h = '%x' % n
+    return binascii.unhexlify(('0' * (len(h) % 2)) + h) if n else b''
+
+
+NONZERO_BYTE=re.compile(b'[^\x00]')
+
+
+def bit_positions(bits, offset=0):
+    """
+    Sorted positions of the set bits of a non-negative int, plus offset.
+    Only the non-zero bytes are looked at one by one.
+    """
+    data = int_to_bytes(bits)[::-1]
+    positions = []
+
+    for m in NONZERO_BYTE.finditer(data):
+        i = m.start()
+        byte = bytearray(data[i:i+1])[0]
+        base = offset + 8 * i
+        while byte:
+            low = byte & -byte
+            positions.append(base + low.bit_length() - 1)
+            byte ^= low
+
+    return positions
+
+
+def int_from_bytes(data):
+    if hasattr(int, 'from_bytes'):
+        return int.from_bytes(data, 'big')
+    return int(binascii.hexlify(data), 16) if data else 0
+
+
+def array_bytes(a):
+    return a.tobytes() if hasattr(a, 'tobytes') else a.tostring()
+
+
+def array_frombytes(a, data):
+    if hasattr(a, 'frombytes'):
+        a.frombytes(data)
+    else:
+        a.fromstring(data)
+
+
+def parse_dependency_graph(file_name):
+    """
+    Parse a DOT file into a DependencyGraph.  Plain Maven output is read
+    directly, anything else goes through pydot.  Binary graph files, see
+    graph_binary, are loaded instead.
+    """
+    if graph_binary.is_binary(file_name):
+        return DependencyGraph.from_binary(graph_binary.BinaryGraphFile(file_name))
+
+    graph = MavenDotReader().read_file(file_name)
+
+    if graph is None:
+        graph = DependencyGraph.from_pydot(read_dot_file(file_name))
+
+    return graph
+
+
+def load_dependency_graph(file_name, squash_versions=False, cache_dir=None):
+    """
+    Parse a DOT file into a DependencyGraph, or fetch it from the cache in
+    cache_dir, squashing its versions if asked.  Lives at module level so
+    it can run in a worker process.
+    """
+    with stats().phase('parse'):
+        # binary files load faster than the cache would
+        if cache_dir and not graph_binary.is_binary(file_name):
+            graph = ParsedGraphCache(cache_dir).load(file_name, parse_dependency_graph)
+        else:
+            graph = parse_dependency_graph(file_name)
+
+    stats().count('input edges', len(graph.edges))
+
+    if squash_versions:
+        with stats().phase('squash'):
+            graph = SquashVersionRule().squash_graph(graph)
+
+    return graph
+
+
+
+
+def load_style_rules(styles_file=None, highlight_pattern=None):
+    """
+    The NodeStyleRules of the --styles JSON file, if any, followed by the
+    --highlight-pattern rule, if any.
+    """
+    rules = []
+
+    if styles_file:
+        style_f = open(styles_file, 'r')
+        try:
+            rules.extend(NodeStyleRule.from_json(json.load(style_f)))
+        finally:
+            style_f.close()
+
+    if highlight_pattern:
+        rules.append(NodeStyleRule(highlight_pattern, {'fillcolor': GraphProcessor.DEFAULT_COLORS['highlight'], 'style':'filled'}))
+
+    return rules
+
 
 
 
@@ -146,183 +1293,1480 @@ class GraphProcessor(object):
 
     
     @staticmethod
-    def intersecting_nodes(graphs):
-
-        # list of nodes per graph
-        node_sets=[]
-        for x in graphs:
-            nset=set([])
-            for y in x.get_edges():
-                nset.add(y.get_source())
-                nset.add(y.get_destination())
-            node_sets.append(nset)
-
-        return node_sets, reduce(lambda x, y: x.intersection(y) , node_sets, node_sets[0])
-    
+    def analysis_color(i):
+        """
+        Fill color of the nodes found only in the i-th input graph.  The
+        palette is used first, then graph_analytics.distinctColor.
+        """
+        palette = GraphProcessor.DEFAULT_COLORS['non_intersect_list']
+        if i < len(palette):
+            return palette[i]
+
+        return distinctColor(i)
+
     @staticmethod
-    def non_intersecting_nodes_per_graph(graphs, node_sets):
-    
-        non_intersect = {}
-        for i in range(0, len(graphs)):
+    def node_memberships(graphs):
+        """
+        Map each node name to a bitmask of the graphs it appears in, bit i
+        being set for graphs[i].
+        """
+        memberships = {}
+        get = memberships.get
 
-            gname = graphs[i].get_name()
-            self_set = node_sets[i]
+        for i, g in enumerate(graphs):
+            bit = 1 << i
+            for src, dst, attributes in g.edges:
+                memberships[src] = get(src, 0) | bit
+                memberships[dst] = get(dst, 0) | bit
 
-            # get the node sets minus yourself
-            minus_self_set = node_sets[0:i] + node_sets[i+1:]
-            minus_self_set.insert(i, set([]))
-        
-            non_intersect[gname] = reduce(lambda x, y: x.difference(y) , minus_self_set, self_set)
-    
-        return non_intersect
+        return memberships
 
     @staticmethod
-    def merge_graphs(graphs):
+    def shared_nodes(memberships):
+        """
+        Group the node names of node_memberships by bitmask, giving the
+        nodes shared by exactly each subset of graphs.
+        """
+        subsets = {}
+        for name, mask in memberships.items():
+            subsets.setdefault(mask, []).append(name)
+
+        for names in subsets.values():
+            names.sort()
+
+        return subsets
+
+    @staticmethod
+    def write_subset_report(file, labels, subsets):
+        """
+        Write the nodes shared by each subset of graphs, largest subsets
+        first, labelling graph i with labels[i].
+        """
+        def members(mask):
+            return [i for i in range(len(labels)) if mask >> i & 1]
+
+        order = sorted(subsets, key=lambda m: (-len(members(m)), members(m)))
 
-        merged = pydot.Dot()
+        for mask in order:
+            names = subsets[mask]
+            file.write('%s: %d node(s)\n' % (', '.join(labels[i] for i in members(mask)), len(names)))
+            for name in names:
+                file.write('    %s\n' % name)
+
+    @staticmethod
+    def merge_graphs(graphs):
+        """
+        Merge DependencyGraphs into a new one.
+        """
+        merged = DependencyGraph('G')
 
         for g in graphs:
 
             # copy all the edges in to the merged graph
-            for e in g.get_edges():
-                merged.add_edge(pydot.Edge(e.get_source(), e.get_destination()))
+            for src, dst, attributes in g.edges:
+                merged.add_edge(src, dst)
             
             # copy the nodes in too, but specifically merge their 'versions' attributes
-            for n in g.get_nodes():
+            for name, attributes in g.nodes:
 
-                nn = pydot.Node(n.get_name(), None, **n.get_attributes())
-                mn = merged.get_node(n.get_name())
+                mn = merged.get_node(name)
 
-                if mn:
-                    mversions = mn[0].get('versions')
-                    nversions = nn.get('versions')
+                if mn is not None:
+                    mversions = mn.get('versions')
+                    nversions = attributes.get('versions')
                     if mversions and nversions:
                         mversions.update(nversions)
                     elif nversions:
-                        mn[0].set('versions', nversions)
+                        mn['versions'] = nversions
 
                 else:
-                    merged.add_node(nn)
+                    merged.add_node(name, dict(attributes))
 
 
         return merged
 
 
+    @staticmethod
+    def analyze_graphs(final_graph, graphs):
+        """
+        Color the nodes of the merged final_graph found in every one of
+        graphs, and those found in only one of them, returning the
+        shared_nodes subsets.
+        """
+        memberships = GraphProcessor.node_memberships(graphs)
+        subsets = GraphProcessor.shared_nodes(memberships)
+
+        everywhere = (1 << len(graphs)) - 1
+
+        style=NodeStyleRule.globalRule({'fillcolor': GraphProcessor.DEFAULT_COLORS['intersect'], 'style':'filled'}) 
+
+        for x in subsets.get(everywhere, ()):
+            style.apply_node(final_graph, x)
+
+        for i in range(len(graphs)):
+
+            style = NodeStyleRule.globalRule({'fillcolor': GraphProcessor.analysis_color(i), 'style':'filled'})
+
+            for y in subsets.get(1 << i, ()):
+                style.apply_node(final_graph, y)
+
+        return subsets
+
+
     @staticmethod
     def do_squash_versions(graph):
-        squash = SquashVersionRule()
-        for e in graph.get_edges():
-            squash.apply(graph, e)
+        """
+        Returns a copy of the DependencyGraph with versions squashed.
+        """
+        return SquashVersionRule().squash_graph(graph)
     
             
     @staticmethod
-    def maximum_input_graphs():
-        # we're probably bound by ram before this, but this is our "logical" limit
-        max_inputs = len(GraphProcessor.DEFAULT_COLORS['non_intersect_list'])
-        return max_inputs
+    def extract_subgraph(graph, root, depth=None, reverse=False):
+        """
+        The part of graph within depth edges of root, following
+        dependencies, or dependents if reverse is set; see
+        DependencyGraph.subgraph.  root is resolved by
+        DependencyGraph.resolve, and must stand for a single dependency.
+        """
+        names = graph.resolve(root)
+        if not names:
+            raise ValueError("no dependency named %s" % root)
+        if len(names) > 1:
+            shown = ', '.join(names[:5]) + (', ...' if len(names) > 5 else '')
+            raise ValueError("%s matches %d dependencies: %s" % (root, len(names), shown))
+
+        return graph.subgraph(names, depth, reverse)
+
+
+    @staticmethod
+    def coarsen_graph(graph, mode, pattern=None, max_nodes=None, expand=()):
+        """
+        The graph of the clusters of graph, see GraphCoarsening, at the
+        finest level with at most max_nodes nodes, or the finest level if
+        max_nodes isn't given.  Clusters are labelled with their number of
+        members and edges that stand for several dependencies with their
+        number.  Nodes left alone keep their node statements.  Returns the
+        new graph and the level used.
+        """
+        adjacency = graph.to_adjacency()
+
+        coarsening = GraphCoarsening(adjacency, mode, pattern)
+        if max_nodes is not None:
+            level = coarsening.chooseLevel(max_nodes)
+        else:
+            level = min(1, coarsening.levelCount() - 1)
+        # cluster keys have none of the quotes node names have
+        clusters, members, multiplicities = coarsening.coarsen(level, expand, lambda key: '"%s"' % key)
+        labels = GraphCoarsening.labels(members)
+
+        coarse = DependencyGraph(graph.name, graph.graph_type, graph.attributes)
+        names = clusters.core.names
+        offsets, targets = clusters.core.outAdjacency()
+        for c in range(len(names)):
+            for d in targets[offsets[c]:offsets[c+1]]:
+                count = multiplicities[(names[c], names[d])]
+                coarse.add_edge(names[c], names[d], {'label': str(count)} if count > 1 else {})
+
+        for name in names:
+            if name in members:
+                coarse.add_node(name, {'label': labels[name], 'shape': 'box3d'})
+            elif graph.get_node(name) is not None:
+                coarse.add_node(name, dict(graph.get_node(name)))
 
+        return coarse, level
 
-    def process_graphs(self, file_names, squash_versions=False, analyze=False):
+
+    @staticmethod
+    def load_graphs(file_names, squash_versions=False, jobs=1, cache=None):
+        """
+        Parse the DOT files into DependencyGraphs, in input order, using up
+        to jobs worker processes and the given ParsedGraphCache, if any.
+        """
+        load = partial(load_dependency_graph, squash_versions=squash_versions, cache_dir=cache and cache.cache_dir)
+
+        if jobs > 1 and len(file_names) > 1:
+            pool = multiprocessing.Pool(min(jobs, len(file_names)))
+            try:
+                graphs = pool.map(load, file_names, 1)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            graphs = [load(x) for x in file_names]
+
+        if cache:
+            cache.evict()
+
+        return graphs
+
+
+    def process_graphs(self, file_names, squash_versions=False, analyze=False, jobs=1, cache=None, report_file=None, root=None, depth=None, reverse=False):
     
-        graphs = []
-        for x in file_names:
-            xg = pydot.graph_from_dot_file(x)
-            graphs.append(xg)
+        # versions are only squashed when there is something to merge
+        with stats().phase('load'):
+            graphs = GraphProcessor.load_graphs(file_names, squash_versions and len(file_names) > 1, jobs, cache)
         
-        final_graph = graphs[0]
-
         if len(graphs) > 1:
 
-            if squash_versions:
-                for g in graphs:
-                    GraphProcessor.do_squash_versions(g)
-        
-            final_graph = GraphProcessor.merge_graphs(graphs)    
+            with stats().phase('merge'):
+                final_graph = GraphProcessor.merge_graphs(graphs)    
 
             # we're a little broken here, because the version squashing 
             # plus merging does some implicit analysis of version conflicts
             if analyze:
 
-                per_graph_node_sets, intersection = GraphProcessor.intersecting_nodes(graphs)
+                with stats().phase('analyze'):
+                    subsets = GraphProcessor.analyze_graphs(final_graph, graphs)
+
+                if report_file:
+                    GraphProcessor.write_subset_report(report_file, file_names, subsets)
 
-                style=NodeStyleRule.globalRule({'fillcolor': GraphProcessor.DEFAULT_COLORS['intersect'], 'style':'filled'}) 
+        else:
+            final_graph = graphs[0]
 
-                for x in intersection:        
-                    style.apply_node(final_graph, x)
+        if root:
+            with stats().phase('subgraph'):
+                final_graph = GraphProcessor.extract_subgraph(final_graph, root, depth, reverse)
 
-                non_intersect = GraphProcessor.non_intersecting_nodes_per_graph(graphs, per_graph_node_sets)
+        with stats().phase('styles'):
+            if squash_versions:
+                # necessary because we wedged a non-standard
+                # attribute into the nodes marking their versions
+                for name, attributes in final_graph.nodes:
+                    SquashVersionRule.clean_version_tag(attributes)
 
-                for x in non_intersect:
+            # styles go on each edge endpoint once, in edge order
+            node_names = final_graph.edge_node_names()
 
-                    color = GraphProcessor.DEFAULT_COLORS['non_intersect_list'].pop(0)
-                    style = NodeStyleRule.globalRule({'fillcolor':color, 'style':'filled'})
+            rule_set = NodeStyleRuleSet(self.style_rules)
+            rule_set.apply(final_graph, node_names)
+            stats().count('regex evaluations', rule_set.evaluations)
 
-                    for y in non_intersect[x]:
-                        style.apply_node(final_graph, y)
+        # otherwise it's unreadable
+        final_graph.attributes['rankdir'] = 'LR'
 
+        return final_graph
+
+    def process_incremental(self, file_names, state_file, squash_versions=False, analyze=False, jobs=1, cache=None, report_file=None, root=None, depth=None, reverse=False):
+        """
+        Like process_graphs, but updates the MergeState saved in
+        state_file, starting over if there is none or it was made with
+        other squash_versions or analyze settings.
+        """
+        # versions are only squashed when there is something to merge
+        squash_versions = squash_versions and len(file_names) > 1
+
+        state = MergeState.load(state_file)
+        if state is None or (state.squash_versions, state.analyze) != (squash_versions, analyze):
+            state = MergeState(squash_versions, analyze)
+
+        load = partial(GraphProcessor.load_graphs, squash_versions=squash_versions, jobs=jobs, cache=cache)
+        with stats().phase('update state'):
+            changed = state.update(file_names, load, self.style_rules)
+        if changed:
+            with stats().phase('save state'):
+                state.save(state_file)
+
+        if state.analysis_enabled() and report_file:
+            GraphProcessor.write_subset_report(report_file, state.input_names(), state.shared_nodes())
+
+        # as in process_graphs, the rules only create the node statements
+        # of the subgraph
+        graph = state.merged_graph()
+        if root:
+            with stats().phase('subgraph'):
+                graph = GraphProcessor.extract_subgraph(graph, root, depth, reverse)
+        state.add_styled_nodes(graph)
+        graph.attributes['rankdir'] = 'LR'
+
+        return graph
+
+
+
+class MergeState(object):
+    """
+    The merged graph of a set of inputs, kept between runs by --state so
+    that when inputs are added, removed or replaced only their share of
+    the work is redone.
+
+    Every input holds a slot, whose bit it gets in the node membership
+    masks, so they stay put while other inputs come and go.  What depends
+    on the position of an input, its --analyze color and which node
+    statement wins, follows the order of the inputs as given, as in
+    process_graphs.  Alongside what each input contributed, its edges and
+    node statements, the state counts the contributions to every version
+    of every node, and keeps the final attributes of each styled node.  It
+    is all plain data, so it pickles the same whether this module ran as a
+    script or was imported.  update() takes the contributions of changed
+    inputs out, puts the new ones in, and restyles only the nodes those
+    inputs touch plus the ones whose standing against all inputs, or whose
+    input's position, changed.  to_graph() then lays the graph out the way
+    process_graphs does.
+    """
+
+    VERSION=2
+
+    def __init__(self, squash_versions=False, analyze=False):
+        self.squash_versions=squash_versions
+        self.analyze=analyze
+        self.rules_key=None
+        # input file name per slot, None for a free slot
+        self.slots=[]
+        # the slots of the inputs, in input order
+        self.order=[]
+        # file name -> (size, mtime, sha1) when it was loaded
+        self.signatures={}
+        # slot -> (flat list of edge endpoints, {name: node statement},
+        # (name, type, attributes, {edge index: attributes}, statement
+        # positions) to lay out a single input as it was read)
+        self.inputs={}
+        # node name -> {versioned name: contributions}
+        self.versions={}
+        # node name -> slots that have a node statement for it
+        self.statements={}
+        self.memberships={}
+        self.by_mask={}
+        self.styles={}
+        # node name -> first style rule matching it, as rules create the
+        # node statements they need grouped by it
+        self.first_rules={}
+
+    @staticmethod
+    def load(file_name):
+        """
+        The MergeState saved in file_name, or None if there isn't a usable
+        one.
+        """
+        try:
+            f = open(file_name, 'rb')
+        except IOError:
+            return None
+
+        try:
+            try:
+                version, data = pickle.load(f)
+            except Exception:
+                return None
+        finally:
+            f.close()
+
+        if version != MergeState.VERSION:
+            return None
+
+        state = MergeState()
+        state.__dict__.update(data)
+        return state
+
+    def save(self, file_name):
+        with graph_binary.atomic_file(file_name) as f:
+            pickle.dump((MergeState.VERSION, self.__dict__), f, pickle.HIGHEST_PROTOCOL)
+
+    def copy(self):
+        """
+        A separate copy of the state, which updating leaves this one alone.
+        """
+        state = MergeState(self.squash_versions, self.analyze)
+        state.__dict__.update(pickle.loads(pickle.dumps(self.__dict__, pickle.HIGHEST_PROTOCOL)))
+        return state
+
+    @staticmethod
+    def signature(file_name, previous=None):
+        """
+        (size, mtime, sha1) of file_name, only hashing the content again
+        if the size or mtime differ from previous.
+        """
+        st = os.stat(file_name)
+        if previous and previous[:2] == (st.st_size, st.st_mtime):
+            return previous
+        return (st.st_size, st.st_mtime, file_sha1(file_name))
+
+    def live_mask(self):
+        mask = 0
+        for slot, file_name in enumerate(self.slots):
+            if file_name is not None:
+                mask |= 1 << slot
+        return mask
+
+    def positions(self):
+        """
+        Map the slot of every input to its position in input order.
+        """
+        return dict((slot, i) for i, slot in enumerate(self.order))
+
+    def input_names(self):
+        """
+        The input file names, in input order.
+        """
+        return [self.slots[slot] for slot in self.order]
+
+    def analysis_enabled(self):
+        return self.analyze and len(self.inputs) > 1
+
+    def update(self, file_names, load_graphs, style_rules=()):
+        """
+        Bring the state in line with the inputs in file_names, calling
+        load_graphs(names) for the DependencyGraphs of the new or changed
+        ones, and restyle the affected nodes.  Returns whether anything
+        needs saving.
+        """
+        old_live = self.live_mask()
+        old_analysis = self.analysis_enabled()
+        old_signatures = dict(self.signatures)
+        old_order = list(self.order)
+        old_positions = self.positions()
+        affected = set()
+
+        wanted = set(file_names)
+        for slot, file_name in enumerate(self.slots):
+            if file_name is not None and file_name not in wanted:
+                affected.update(self.remove_graph(slot))
+                self.slots[slot] = None
+                del self.signatures[file_name]
+
+        # inputs still present only count as changed if their content did
+        load = []
+        for file_name in file_names:
+            if file_name in load:
+                continue
+            previous = self.signatures.get(file_name)
+            signature = MergeState.signature(file_name, previous)
+            if previous is None or previous[2] != signature[2]:
+                load.append(file_name)
+            self.signatures[file_name] = signature
+
+        for file_name, graph in zip(load, load_graphs(load) if load else ()):
+            if file_name in self.slots:
+                slot = self.slots.index(file_name)
+                affected.update(self.remove_graph(slot))
+            elif None in self.slots:
+                slot = self.slots.index(None)
+            else:
+                slot = len(self.slots)
+                self.slots.append(None)
+            self.slots[slot] = file_name
+            affected.update(self.add_graph(slot, graph))
+
+        while self.slots and self.slots[-1] is None:
+            self.slots.pop()
+
+        self.order = []
+        for file_name in file_names:
+            slot = self.slots.index(file_name)
+            if slot not in self.order:
+                self.order.append(slot)
+
+        # inputs that moved change the colors of the nodes only they have
+        # and which node statements win
+        positions = self.positions()
+        for slot, position in positions.items():
+            if old_positions.get(slot, position) != position:
+                affected.update(self.inputs[slot][1])
+                affected.update(self.by_mask.get(1 << slot, ()))
+
+        live = self.live_mask()
+        rules_key = repr([(r.match_pattern.pattern, sorted(r.style_attributes.items())) for r in style_rules])
+
+        if rules_key != self.rules_key or old_analysis != self.analysis_enabled():
+            affected = set(self.memberships).union(self.statements, self.styles)
+        elif self.analyze:
+            # nodes that were in every input, or now are, without being touched
+            affected.update(self.by_mask.get(old_live, ()))
+            affected.update(self.by_mask.get(live, ()))
+
+        self.rules_key = rules_key
+        rule_set = NodeStyleRuleSet(style_rules)
+        for name in sorted(affected):
+            self.restyle(name, rule_set, positions)
+        stats().count('regex evaluations', rule_set.evaluations)
+
+        return bool(affected) or self.signatures != old_signatures or self.order != old_order
+
+    def add_graph(self, slot, graph):
+        """
+        Add graph's contribution in slot, returning the node names it
+        touches.
+        """
+        endpoints = []
+        edge_attributes = {}
+        for i, (src, dst, attributes) in enumerate(graph.edges):
+            endpoints.append(src)
+            endpoints.append(dst)
+            if attributes:
+                edge_attributes[i] = attributes
+
+        statements = OrderedDict()
+        statement_positions = []
+        for (name, attributes), position in zip(graph.nodes, graph.node_positions):
+            # the first statement wins, as in merge_graphs
+            if name not in statements:
+                statements[name] = attributes
+                statement_positions.append(position)
+
+        layout = (graph.name, graph.graph_type, graph.attributes, edge_attributes, statement_positions)
+        self.inputs[slot] = (endpoints, statements, layout)
+        bit = 1 << slot
+
+        touched = set(endpoints)
+        for name in touched:
+            self.move_node(name, self.memberships.get(name, 0) | bit)
+
+        for name, attributes in statements.items():
+            self.statements.setdefault(name, set()).add(slot)
+            versions = self.versions.setdefault(name, {})
+            for v in attributes.get('versions') or ():
+                versions[v] = versions.get(v, 0) + 1
+            touched.add(name)
+
+        return touched
+
+    def remove_graph(self, slot):
+        """
+        Take out the contribution of the input in slot, returning the node
+        names it touched.
+        """
+        endpoints, statements, layout = self.inputs.pop(slot)
+        bit = 1 << slot
+
+        touched = set(endpoints)
+        for name in touched:
+            self.move_node(name, self.memberships[name] & ~bit)
+
+        for name, attributes in statements.items():
+            slots = self.statements[name]
+            slots.discard(slot)
+            if not slots:
+                del self.statements[name]
+            versions = self.versions[name]
+            for v in attributes.get('versions') or ():
+                count = versions[v] - 1
+                if count:
+                    versions[v] = count
+                else:
+                    del versions[v]
+            if not versions:
+                del self.versions[name]
+            touched.add(name)
+
+        return touched
+
+    def move_node(self, name, mask):
+        old = self.memberships.get(name)
+        if old is not None:
+            names = self.by_mask[old]
+            names.discard(name)
+            if not names:
+                del self.by_mask[old]
+
+        if mask:
+            self.memberships[name] = mask
+            self.by_mask.setdefault(mask, set()).add(name)
+        elif old is not None:
+            del self.memberships[name]
+
+    def restyle(self, name, rule_set, positions):
+        """
+        Work out the attributes of node name the way process_graphs
+        would: merged node statement, analysis colors, version conflict
+        marker, then the style rules.  positions maps slots to input
+        positions.
+        """
+        attributes = None
+
+        slots = self.statements.get(name)
+        if slots:
+            attributes = dict(self.inputs[min(slots, key=positions.get)][1][name])
+            attributes.pop('versions', None)
+
+        mask = self.memberships.get(name)
+        if mask and self.analysis_enabled():
+            fillcolor = None
+            if mask == self.live_mask():
+                fillcolor = GraphProcessor.DEFAULT_COLORS['intersect']
+            elif not mask & (mask - 1):
+                fillcolor = GraphProcessor.analysis_color(positions[mask.bit_length() - 1])
+            if fillcolor:
+                if attributes is None:
+                    attributes = {}
+                attributes['fillcolor'] = fillcolor
+                attributes['style'] = 'filled'
+
+        if self.squash_versions and (attributes is not None or name in self.versions):
+            if attributes is None:
+                attributes = {}
+            attributes['versions'] = set(self.versions.get(name, ()))
+            SquashVersionRule.clean_version_tag(attributes)
+
+        self.first_rules.pop(name, None)
+        if mask:
+            rules = rule_set.matching_rules(name)
+            if rules:
+                self.first_rules[name] = rules[0]
+                if attributes is None:
+                    attributes = {}
+            for i in rules:
+                rule_set.rules[i].copy_attributes(attributes)
+
+        if attributes is None:
+            self.styles.pop(name, None)
+        else:
+            self.styles[name] = attributes
+
+    def shared_nodes(self):
+        """
+        The node names shared by exactly each subset of the inputs, by
+        bitmask of input positions, as GraphProcessor.shared_nodes gives
+        them.
+        """
+        positions = self.positions()
+        subsets = {}
+        for mask, names in self.by_mask.items():
+            position_mask = 0
+            for slot, position in positions.items():
+                if mask >> slot & 1:
+                    position_mask |= 1 << position
+            subsets[position_mask] = sorted(names)
+        return subsets
+
+    def merged_graph(self):
+        """
+        The graph as process_graphs has it before applying the style
+        rules: a single input as it was read, or the inputs merged as
+        merge_graphs does, each one's edges followed by its new node
+        statements, then the nodes analyze_graphs colors.  Nodes have
+        their final attributes.
+        """
+        styles = self.styles
+
+        if len(self.order) == 1:
+            endpoints, statements, layout = self.inputs[self.order[0]]
+            name, graph_type, attributes, edge_attributes, statement_positions = layout
+            graph = DependencyGraph(name, graph_type, dict(attributes))
+            pairs = iter(endpoints)
+            edges = [(src, dst, dict(edge_attributes.get(i, ()))) for i, (src, dst) in enumerate(zip(pairs, pairs))]
+            done = 0
+            for name, position in zip(statements, statement_positions):
+                graph.add_edges(edges[done:position])
+                done = position
+                graph.add_node(name, dict(styles[name]))
+            graph.add_edges(edges[done:])
+            return graph
+
+        graph = DependencyGraph('G')
+        for slot in self.order:
+            endpoints, statements, layout = self.inputs[slot]
+            pairs = iter(endpoints)
+            graph.add_edges([(src, dst, {}) for src, dst in zip(pairs, pairs)])
+            for name in statements:
+                if graph.get_node(name) is None:
+                    graph.add_node(name, dict(styles[name]))
+
+        if self.analysis_enabled():
+            colored = sorted(self.by_mask.get(self.live_mask(), ()))
+            for slot in self.order:
+                colored.extend(sorted(self.by_mask.get(1 << slot, ())))
+            for name in colored:
+                if graph.get_node(name) is None:
+                    graph.add_node(name, dict(styles[name]))
+
+        return graph
+
+    def add_styled_nodes(self, graph):
+        """
+        Add the node statements the style rules create in graph, in the
+        order NodeStyleRuleSet.apply creates them.
+        """
+        missing = {}
+        for name in graph.edge_node_names():
+            rule = self.first_rules.get(name)
+            if rule is not None and graph.get_node(name) is None:
+                missing.setdefault(rule, []).append(name)
+
+        for rule in sorted(missing):
+            for name in missing[rule]:
+                graph.add_node(name, dict(self.styles[name]))
+
+    def to_graph(self):
+        """
+        The graph process_graphs makes of the same inputs.
+        """
+        graph = self.merged_graph()
+        self.add_styled_nodes(graph)
+        return graph
+
+
+
+
+class GraphDiff(object):
+    """
+    What changed between two DependencyGraphs, old and new: the nodes and
+    edges only one of them has, and the artifacts whose versions differ.
+    Nodes and edges are compared as hashed sets, so the work is linear in
+    the size of the graphs, and only the changes are sorted.  With
+    squash_versions the graphs are compared with their versions squashed
+    by SquashVersionRule, so that an upgrade shows up as a version change
+    rather than as a removed node and an added one.
+    """
+
+    COLORS={
+        'added': '#00CC00',
+        'removed': '#FF3333',
+        'changed': '#FFCC00',
+    }
+
+    def __init__(self, old, new, squash_versions=False):
+        self.squash_versions=squash_versions
+        rule = SquashVersionRule()
+
+        old_nodes = GraphDiff.node_names(old)
+        new_nodes = GraphDiff.node_names(new)
+
+        # versions are taken from the names, before anything is squashed
+        self.old_versions=GraphDiff.artifact_versions(old_nodes, rule)
+        self.new_versions=GraphDiff.artifact_versions(new_nodes, rule)
 
         if squash_versions:
-            # necessary because we wedged a non-standard
-            # attribute into the nodes marking their versions
-            for n in final_graph.get_nodes():
-                SquashVersionRule.clean_version_tag(n)
+            old = rule.squash_graph(old)
+            new = rule.squash_graph(new)
+            old_nodes = GraphDiff.node_names(old)
+            new_nodes = GraphDiff.node_names(new)
+        self.old=old
+        self.new=new
 
-        for rule in self.style_rules:
-            for e in final_graph.get_edges():
-                rule.apply(final_graph, e)
+        self.added_nodes=sorted(new_nodes - old_nodes)
+        self.removed_nodes=sorted(old_nodes - new_nodes)
 
-        # otherwise it's unreadable
-        final_graph.set('rankdir', 'LR')
+        old_edges = set(old.edge_index)
+        new_edges = set(new.edge_index)
+        self.added_edges=sorted(new_edges - old_edges)
+        self.removed_edges=sorted(old_edges - new_edges)
+
+        old_versions = self.old_versions
+        new_versions = self.new_versions
+        self.changed_versions=sorted(key for key in old_versions if key in new_versions and old_versions[key] != new_versions[key])
+
+    @staticmethod
+    def node_names(graph):
+        names = set(graph.node_index)
+        names.update([src for src, dst in graph.edge_index])
+        names.update([dst for src, dst in graph.edge_index])
+        return names
+
+    @staticmethod
+    def artifact_versions(names, rule):
+        """
+        Map the squashed name of every versioned name in names to the set
+        of versioned names it stands for.
+        """
+        keys = {}
+        for name in names:
+            if name.count(':') >= SquashVersionRule.MVN_VERSION_POSITION:
+                keys.setdefault(rule.squash_version(name), set()).add(name)
+        return keys
+
+    @staticmethod
+    def unquote(name):
+        """
+        name without the quotes that are part of node names.
+        """
+        if len(name) > 1 and name[0] == name[-1] == '"':
+            return name[1:-1]
+        return name
+
+    @staticmethod
+    def version_suffixes(names):
+        """
+        The versions, and scopes, of a set of versioned names, sorted.
+        """
+        position = SquashVersionRule.MVN_VERSION_POSITION
+        return sorted(GraphDiff.unquote(x).split(':', position)[position] for x in names)
+
+    def __len__(self):
+        return len(self.added_nodes) + len(self.removed_nodes) + len(self.added_edges) + len(self.removed_edges) + len(self.changed_versions)
+
+    def changes(self):
+        """
+        The change list as plain data, for JSON, with node names unquoted.
+        """
+        unquote = GraphDiff.unquote
+        return {
+            'squash_versions': self.squash_versions,
+            'nodes': {
+                'added': [unquote(x) for x in self.added_nodes],
+                'removed': [unquote(x) for x in self.removed_nodes],
+            },
+            'edges': {
+                'added': [[unquote(src), unquote(dst)] for src, dst in self.added_edges],
+                'removed': [[unquote(src), unquote(dst)] for src, dst in self.removed_edges],
+            },
+            'versions': [{
+                'artifact': unquote(key),
+                'old': GraphDiff.version_suffixes(self.old_versions[key]),
+                'new': GraphDiff.version_suffixes(self.new_versions[key]),
+            } for key in self.changed_versions],
+        }
+
+    def changed_graph(self, context=1):
+        """
+        A DependencyGraph of the changed neighborhood: the nodes and edges
+        of both graphs within context edges, either way, of a change, with
+        added ones in green, removed ones in red and dashed, and artifacts
+        whose versions changed, with squash_versions, in yellow and labelled
+        with both versions.
+        Nothing is added for unchanged nodes, which keep the default look.
+        """
+        old_index = self.old.edge_index
+        new_index = self.new.edge_index
+
+        # every edge of both graphs once, the removed ones last
+        union = DependencyGraph('G')
+        union.add_edges([(src, dst, {}) for src, dst in new_index])
+        union.add_edges([(src, dst, {}) for src, dst in self.removed_edges])
+
+        seeds = set(self.added_nodes)
+        seeds.update(self.removed_nodes)
+        for src, dst in self.added_edges + self.removed_edges:
+            seeds.add(src)
+            seeds.add(dst)
+        # without squashing, the versioned names that changed are added or
+        # removed nodes already
+        if self.squash_versions:
+            seeds.update(self.changed_versions)
+        seeds = sorted(seeds)
+
+        # seeds with no edges are kept too, the walks ignore them
+        region = set(seeds)
+        region.update(union.reachable(seeds, context))
+        region.update(union.reachable(seeds, context, reverse=True))
+
+        graph = DependencyGraph('G')
+        graph.attributes['rankdir'] = 'LR'
+
+        for src, dst, attributes in union.edges:
+            if src in region and dst in region:
+                if (src, dst) not in old_index:
+                    attributes['color'] = GraphDiff.COLORS['added']
+                elif (src, dst) not in new_index:
+                    attributes['color'] = GraphDiff.COLORS['removed']
+                    attributes['style'] = 'dashed'
+                graph.add_edge(src, dst, attributes)
+
+        def fill(name, color):
+            if name in region:
+                graph.add_node(name, {'style': 'filled', 'fillcolor': color})
+
+        for name in self.added_nodes:
+            fill(name, GraphDiff.COLORS['added'])
+        for name in self.removed_nodes:
+            fill(name, GraphDiff.COLORS['removed'])
+        for key in self.changed_versions:
+            if self.squash_versions:
+                label = '%s\n%s -> %s' % (GraphDiff.unquote(key), ', '.join(GraphDiff.version_suffixes(self.old_versions[key])),
+                                          ', '.join(GraphDiff.version_suffixes(self.new_versions[key])))
+                graph.add_node(key, {'style': 'filled', 'fillcolor': GraphDiff.COLORS['changed'], 'label': label})
+
+        return graph
+
+    @staticmethod
+    def write_graphml(graph, file):
+        """
+        Write a DependencyGraph as GraphML with the GraphmlPrinter of
+        graph_adjacency_list, which keeps node fill colors but not edge
+        styles.
+        """
+        unquote = GraphDiff.unquote
+        adjacency = graph.to_adjacency(unquote)
+
+        printer = GraphmlPrinter(None)
+        # cycles and lone nodes are printed too
+        printer.printUnreached = True
+        printer.nodeColors = dict((unquote(name), attributes['fillcolor']) for name, attributes in graph.nodes if 'fillcolor' in attributes)
+        printer.printGraph(adjacency, file)
+
+
+
+class ReachabilityIndex(object):
+    """
+    Answers "does A depend on B, directly or not?" about a whole graph
+    without walking it, and can be saved and loaded again for later
+    queries.
+
+    Nodes are grouped into strongly connected components, which Tarjan's
+    algorithm numbers so that every edge goes from a higher number to a
+    lower one.  Each component is labelled with the set of other
+    components it reaches, built sinks first from the sets of its
+    successors as Python int bitsets.  Most of these sets are sparse, so
+    a label is kept either as a sorted array of components, searched by
+    bisection, or as a bitset shifted down to its lowest member,
+    whichever is smaller.  A point query is one lookup in the source's
+    label.  Saved labels are only decoded when first used, so loading an
+    index is quick.  Listing dependencies or dependents walks the
+    condensation instead, touching only the components found.
+    """
+
+    MAGIC=b'MDGI'
+    VERSION=1
+
+    def __init__(self, names, component, offsets, targets, labels):
+        self.names=names
+        self.ids=dict((name, i) for i, name in enumerate(names))
+        self.component=component
+        self.offsets=offsets
+        self.targets=targets
+        # component -> label, or None until decoded from label_data
+        self.labels=labels
+        self.label_data=None
+        self.label_offsets=None
+        self.reverse=None
+        self.member_csr=None
+        # node IDs in name order, and the names in that order, for prefix
+        # lookups by bisection; sorted on first use
+        self.name_order=None
+        self.sorted_names=None
+
+    @staticmethod
+    def build(graph):
+        """
+        Index the edges and node statements of a DependencyGraph.
+        """
+        adjacency = graph.to_adjacency()
+        core = adjacency.core
+
+        analytics = GraphAnalytics(adjacency)
+        component = analytics.components()
+        offsets, targets = analytics.condensation()
+        count = analytics.componentCount
+
+        # full bitsets are only kept until every predecessor has used them
+        remaining = [0] * count
+        for d in targets:
+            remaining[d] += 1
+
+        reach = [0] * count
+        labels = []
+
+        for c in range(count):
+            bits = 0
+            for d in targets[offsets[c]:offsets[c+1]]:
+                bits |= reach[d] | (1 << d)
+                remaining[d] -= 1
+                if not remaining[d]:
+                    reach[d] = 0
+            if remaining[c]:
+                reach[c] = bits
+            labels.append(ReachabilityIndex.compact(bits))
+
+        return ReachabilityIndex(list(core.names), component, offsets, targets, labels)
+
+    @staticmethod
+    def compact(bits):
+        """
+        The label for a bitset of components: a sorted array('I') of them,
+        or (lowest, bits >> lowest) when that takes less room.
+        """
+        if not bits:
+            return array('I')
+
+        low = (bits & -bits).bit_length() - 1
+        members = bin(bits).count('1')
+
+        if 4 * members < (bits.bit_length() - low + 7) // 8:
+            return array('I', bit_positions(bits >> low, low))
+
+        return (low, bits >> low)
+
+    def label(self, c):
+        label = self.labels[c]
+        if label is None:
+            data = self.label_data[self.label_offsets[c]:self.label_offsets[c+1]]
+            label = self.labels[c] = ReachabilityIndex.decode_label(data)
+        return label
+
+    @staticmethod
+    def encode_label(label):
+        if isinstance(label, tuple):
+            return b'B' + struct.pack('<I', label[0]) + int_to_bytes(label[1])
+        label = array('I', label)
+        if sys.byteorder != 'little':
+            label.byteswap()
+        return b'A' + array_bytes(label)
+
+    @staticmethod
+    def decode_label(data):
+        if data[:1] == b'B':
+            return (struct.unpack('<I', data[1:5])[0], int_from_bytes(data[5:]))
+        label = array('I')
+        array_frombytes(label, data[1:])
+        if sys.byteorder != 'little':
+            label.byteswap()
+        return label
+
+    def resolve(self, name):
+        """
+        IDs of the nodes name stands for.  The quotes that are part of node
+        names may be left out, and a name that isn't a node stands for
+        every node whose coordinates it starts, so group:artifact:jar:1.0
+        matches that version in any scope.
+        """
+        for x in (name, '"%s"' % name):
+            if x in self.ids:
+                return [self.ids[x]]
+
+        if self.name_order is None:
+            self.name_order = sorted(range(len(self.names)), key=self.names.__getitem__)
+            self.sorted_names = [self.names[i] for i in self.name_order]
+
+        start, stop = coordinate_range(self.sorted_names, name)
+        return sorted(self.name_order[start:stop])
+
+    def reaches(self, src, dst):
+        """
+        Whether node ID src reaches node ID dst; every node reaches itself.
+        """
+        c = self.component[src]
+        d = self.component[dst]
+
+        if c == d:
+            return True
+
+        label = self.label(c)
+        if isinstance(label, tuple):
+            return d >= label[0] and bool(label[1] >> (d - label[0]) & 1)
+
+        i = bisect_left(label, d)
+        return i < len(label) and label[i] == d
+
+    def depends_on(self, src_name, dst_name):
+        """
+        Whether any node src_name stands for reaches any node dst_name
+        stands for, see resolve().
+        """
+        sources = self.resolve(src_name)
+        destinations = self.resolve(dst_name)
+
+        for name, ids in ((src_name, sources), (dst_name, destinations)):
+            if not ids:
+                raise ValueError("no dependency named %s" % name)
+
+        return any(self.reaches(s, d) for s in sources for d in destinations)
+
+    def members(self):
+        if self.member_csr is None:
+            self.member_csr = GraphCore.buildCsr(len(self.offsets) - 1, self.component, array('i', range(len(self.names))))
+        return self.member_csr
+
+    def walk(self, ids, reverse=False):
+        """
+        IDs of the nodes reachable from the given ones, or leading to them
+        if reverse is set.  As in reaches(), a given node counts when it is
+        on a cycle, which leads back to it, or reaches another given node.
+        """
+        if reverse:
+            if self.reverse is None:
+                count = len(self.offsets) - 1
+                sources = array('i')
+                for c in range(count):
+                    sources.extend(array('i', [c]) * (self.offsets[c+1] - self.offsets[c]))
+                self.reverse = GraphCore.buildCsr(count, self.targets, sources)
+            offsets, targets = self.reverse
+        else:
+            offsets, targets = self.offsets, self.targets
+
+        seen = set()
+        queue = []
+        for c in set(self.component[i] for i in ids):
+            for d in targets[offsets[c]:offsets[c+1]]:
+                if d not in seen:
+                    seen.add(d)
+                    queue.append(d)
+
+        for c in queue:
+            for d in targets[offsets[c]:offsets[c+1]]:
+                if d not in seen:
+                    seen.add(d)
+                    queue.append(d)
+
+        # the rest of a given node's own cycle is reachable too
+        member_offsets, member_ids = self.members()
+        given = set(ids)
+        found = []
+        for c in sorted(seen.union(self.component[i] for i in ids)):
+            cycle = member_offsets[c+1] - member_offsets[c] > 1
+            for i in member_ids[member_offsets[c]:member_offsets[c+1]]:
+                if i not in given or cycle or c in seen:
+                    found.append(i)
+
+        return found
+
+    def roots(self):
+        """
+        IDs of the nodes nothing depends on, the modules of a merged graph.
+        """
+        count = len(self.offsets) - 1
+        has_in_edges = bytearray(count)
+        for d in self.targets:
+            has_in_edges[d] = 1
+
+        member_offsets, member_ids = self.members()
+        return [member_ids[member_offsets[c]] for c in range(count)
+                if not has_in_edges[c] and member_offsets[c+1] - member_offsets[c] == 1]
+
+    def save(self, file_name):
+        table = [x.encode('utf-8') for x in self.names]
+        lengths = array('I', [len(x) for x in table])
+        component = array('I', self.component)
+        offsets = array('I', self.offsets)
+        targets = array('I', self.targets)
+
+        labels = [ReachabilityIndex.encode_label(self.label(c)) for c in range(len(self.offsets) - 1)]
+        label_offsets = array('I', [0])
+        for x in labels:
+            label_offsets.append(label_offsets[-1] + len(x))
+
+        arrays = [lengths, component, offsets, targets, label_offsets]
+        if sys.byteorder != 'little':
+            for a in arrays:
+                a.byteswap()
+
+        with graph_binary.atomic_file(file_name) as f:
+            f.write(ReachabilityIndex.MAGIC)
+            f.write(struct.pack('<IIII', ReachabilityIndex.VERSION, len(table), len(offsets) - 1, len(targets)))
+            f.write(array_bytes(lengths))
+            f.write(b''.join(table))
+            for a in arrays[1:]:
+                f.write(array_bytes(a))
+            f.write(b''.join(labels))
+
+    @staticmethod
+    def load(file_name):
+        f = open(file_name, 'rb')
+        try:
+            data = f.read()
+        finally:
+            f.close()
+
+        if data[:4] != ReachabilityIndex.MAGIC or len(data) < 20:
+            raise ValueError("%s is not a reachability index" % file_name)
+
+        version, num_names, num_components, num_targets = struct.unpack('<IIII', data[4:20])
+        if version != ReachabilityIndex.VERSION:
+            raise ValueError("%s is a reachability index of an unsupported version" % file_name)
+
+        offset = [20]
+        def read_array(length):
+            a = array('I')
+            array_frombytes(a, data[offset[0]:offset[0] + 4 * length])
+            if sys.byteorder != 'little':
+                a.byteswap()
+            offset[0] += 4 * length
+            return a
+
+        lengths = read_array(num_names)
+        names = []
+        for length in lengths:
+            names.append(data[offset[0]:offset[0] + length].decode('utf-8'))
+            offset[0] += length
+
+        component = read_array(num_names)
+        offsets = read_array(num_components + 1)
+        targets = read_array(num_targets)
+        label_offsets = read_array(num_components + 1)
+
+        index = ReachabilityIndex(names, component, offsets, targets, [None] * num_components)
+        index.label_data = data[offset[0]:]
+        index.label_offsets = label_offsets
+        return index
+
+
+
+def query_main(args):
+    """
+    The 'mvndepgraph.py query' entry point, answering questions from an
+    index saved with --save-index.  Returns the exit status.
+    """
+    usage = """usage: %prog query [options] INDEX_FILE [DEPENDENT DEPENDENCY]
+
+Answers dependency questions from a reachability index saved with --save-index.  Given two names, tells whether the
+first depends on the second, directly or transitively, and exits with status 1 if it doesn't.  Names may leave out
+their quotes, and a name that is not a node stands for every node it is a coordinate prefix of, so
+group:artifact:jar:1.0 matches that version in any scope."""
+
+    op = optparse.OptionParser(usage=usage)
+    op.add_option("--dependencies", dest="dependencies", default=None, help="List everything this depends on, directly or transitively")
+    op.add_option("--dependents", dest="dependents", default=None, help="List everything that depends on this, directly or transitively")
+    op.add_option("--modules", dest="modules", action="store_true", default=False, help="With --dependents, only list the modules, i.e. what nothing depends on")
+    op.add_option("--batch", dest="batch_file", default=None, help="Answer a query per line of this file ('-' for stdin), each line naming a dependent and a dependency, and print them with yes, no or unknown")
+
+    (options, args) = op.parse_args(args)
+
+    if not args:
+        op.error("You must specify an index file. Use -h option to display help message.")
+
+    index = ReachabilityIndex.load(args[0])
+    names = args[1:]
+
+    if options.modules and not options.dependents:
+        op.error("--modules requires --dependents.  Use -h to display help message.")
+
+    if len([x for x in (names, options.dependencies, options.dependents, options.batch_file) if x]) != 1 or len(names) not in (0, 2):
+        op.error("Give either two names, --dependencies, --dependents or --batch.  Use -h to display help message.")
+
+    out = sys.stdout
+
+    try:
+        if names:
+            found = index.depends_on(names[0], names[1])
+            out.write('yes\n' if found else 'no\n')
+            return 0 if found else 1
+
+        if options.dependencies or options.dependents:
+            name = options.dependencies or options.dependents
+            ids = index.resolve(name)
+            if not ids:
+                raise ValueError("no dependency named %s" % name)
+
+            found = index.walk(ids, reverse=bool(options.dependents))
+            if options.modules:
+                roots = set(index.roots())
+                found = [i for i in found if i in roots]
+
+            out.write(''.join('%s\n' % index.names[i] for i in found))
+            return 0
+
+        f = sys.stdin if options.batch_file == '-' else open(options.batch_file, 'r')
+        try:
+            for line in f:
+                pair = line.split()
+                if len(pair) != 2:
+                    continue
+                try:
+                    answer = 'yes' if index.depends_on(pair[0], pair[1]) else 'no'
+                except ValueError:
+                    answer = 'unknown'
+                out.write('%s %s %s\n' % (pair[0], pair[1], answer))
+        finally:
+            if f is not sys.stdin:
+                f.close()
+        return 0
+
+    except ValueError as e:
+        op.error(str(e))
+
+
+
+
+def diff_main(args):
+    """
+    The 'mvndepgraph.py diff' entry point.  Returns the exit status: 0 if
+    the graphs are the same, 1 if they differ.
+    """
+    usage = """usage: %prog diff [options] OLD_FILE NEW_FILE
+
+Compares two dependency graphs, e.g. of two releases, and writes a graph of what changed and of the unchanged
+dependencies within --context levels of a change.  Added nodes and edges are green, removed ones red, and with
+--squash-version artifacts whose versions changed are yellow.  --changes also saves the list of changes as JSON.
+Exits with status 1 if the graphs differ, like diff."""
+
+    op = optparse.OptionParser(usage=usage)
+    op.add_option("-o", dest="output_file", default=None, help="Output file name (stdout by default)")
+    op.add_option("--format", dest="format", default='raw', help="Output format (raw by default).  Any output format supported by dot, or 'graphml'.  Must be used in conjunction with -o option.")
+    op.add_option("--changes", dest="changes_file", default=None, help="Also write the added and removed nodes and edges and the changed versions to this file as JSON ('-' for stdout, with -o)")
+    op.add_option("--squash-version", dest="squash_version", action="store_true", default=False, help="Compare the graphs without their versions, so that upgrades are version changes rather than other nodes")
+    op.add_option("--context", dest="context", type="int", default=1, help="Levels of unchanged dependencies and dependents to show around each change (1 by default)")
+    op.add_option("--jobs", dest="jobs", type="int", default=1, help="Number of processes used to parse the two input files (1 by default)")
+    op.add_option("--cache-dir", dest="cache_dir", default=None, help="Directory in which to cache parsed input files between runs (no caching by default)")
+    instrumentation.add_options(op)
+
+    (options, args) = op.parse_args(args)
+
+    if len(args) != 2:
+        op.error("You must specify two input files. Use -h option to display help message.")
+
+    if options.context < 0:
+        op.error("--context must not be negative.  Use -h to display help message.")
+
+    if options.format != 'raw' and not options.output_file:
+        op.error("--format requires -o.  Use -h to display help message.")
+
+    if options.changes_file == '-' and not options.output_file:
+        op.error("--changes - requires -o.  Use -h to display help message.")
+
+    instrumentation.start(options)
+
+    cache = ParsedGraphCache(options.cache_dir) if options.cache_dir else None
+
+    with stats().phase('load'):
+        old, new = GraphProcessor.load_graphs(args, jobs=options.jobs, cache=cache)
+
+    with stats().phase('diff'):
+        diff = GraphDiff(old, new, options.squash_version)
+
+    stats().record('changes', len(diff))
+
+    with stats().phase('neighborhood'):
+        g = diff.changed_graph(options.context)
+
+    with stats().phase('write'):
+        if options.changes_file:
+            changes = diff.changes()
+            changes['old'], changes['new'] = args
+            f = sys.stdout if options.changes_file == '-' else open(options.changes_file, 'w')
+            try:
+                json.dump(changes, f, indent=2, sort_keys=True)
+                f.write('\n')
+            finally:
+                if f is not sys.stdout:
+                    f.close()
+
+        if not options.output_file:
+            DotWriter(sys.stdout).write(g)
+        elif options.format in ('raw', 'graphml'):
+            f = open(options.output_file, 'w')
+            try:
+                if options.format == 'raw':
+                    DotWriter(f).write(g)
+                else:
+                    GraphDiff.write_graphml(g, f)
+            finally:
+                f.close()
+        else:
+            g.to_pydot().write(options.output_file, format=options.format)
+
+    instrumentation.finish(options)
+
+    return 1 if len(diff) else 0
 
-        return final_graph
 
 
 
-    
 if __name__ == '__main__':
 
-    op = optparse.OptionParser(usage="usage: %prog [options] INPUT_FILE_NAMES")
+    if sys.argv[1:2] == ['query']:
+        sys.exit(query_main(sys.argv[2:]))
+
+    if sys.argv[1:2] == ['diff']:
+        sys.exit(diff_main(sys.argv[2:]))
+
+    op = optparse.OptionParser(usage="usage: %prog [options] INPUT_FILE_NAMES\n       %prog query [options] INDEX_FILE [DEPENDENT DEPENDENCY]\n       %prog diff [options] OLD_FILE NEW_FILE")
     op.add_option("-o", dest="output_file", default=None, help="Output file name (stdout by default)")
     op.add_option("--squash-version", dest="squash_version", action="store_true", default=False, help="Remove versions from dependencies (disabled by default, and applicable only to multiple graphs)")
     op.add_option("--analyze", dest="analyze", action="store_true", default=False, help="Analyze intersections, differences, etc (disabled by default, and applicable only to multiple graphs)")
-    op.add_option("--format", dest="format", default='raw', help="Output format (raw by default).  Any output format supported by dot.  Must be used in conjunction with -o option.")
+    op.add_option("--report", dest="report_file", default=None, help="With --analyze, write the nodes shared by each subset of the input graphs to this file ('-' for stderr)")
+    op.add_option("--format", dest="format", default='raw', help="Output format (raw by default).  Any output format supported by dot, or 'bin' for the binary format of graph_binary.py, which is also accepted as input.  Must be used in conjunction with -o option.")
     op.add_option("--highlight-pattern", dest="highlight_pattern", default=None, help="Regular expression that includes dependencies to highlight.  Must be a full match.  Applied after other colorings.")
     op.add_option("--styles", dest="styles_file", default=None, help="Path to JSON file containing style rules. See NodeStyleRule.from_json for more details.")
+    op.add_option("--root", dest="root", default=None, help="Only output the dependencies reachable from this one, e.g. com.google.guava:guava:jar:31.1-jre, or the start of its coordinates if no other dependency shares it, e.g. com.google.guava:guava:jar (or its dependents, with --reverse)")
+    op.add_option("--depth", dest="depth", type="int", default=None, help="With --root, only output dependencies at most this many levels away from it")
+    op.add_option("--reverse", dest="reverse", action="store_true", default=False, help="With --root, output what depends on it instead of what it depends on")
+    op.add_option("--save-index", dest="index_file", default=None, help="Also save a reachability index of the output graph to this file, for 'mvndepgraph.py query'")
+    op.add_option("--jobs", dest="jobs", type="int", default=1, help="Number of processes used to parse the input files (1 by default, 0 for one per CPU)")
+    op.add_option("--cache-dir", dest="cache_dir", default=None, help="Directory in which to cache parsed input files between runs (no caching by default)")
+    op.add_option("--state", dest="state_file", default=None, help="File in which to keep the merged graph between runs, so that only added, removed or changed input files are processed again")
+    op.add_option("--cache-size", dest="cache_size", type="int", default=512, help="Size limit of the --cache-dir cache in MB; least recently used entries are removed beyond it (512 by default)")
+    op.add_option("--cluster", dest="cluster", default=None, help="Collapse dependencies into clusters, labelled with their number of members, before writing: 'group' by groupId, 'scc' by cycle, or 'pattern' by --cluster-pattern")
+    op.add_option("--cluster-pattern", dest="cluster_pattern", default=None, help="Regular expression whose first group, or whole match, is the cluster of the dependencies it is found in; implies --cluster pattern")
+    op.add_option("--max-nodes", dest="max_nodes", type="int", default=None, help="With --cluster, use the finest clustering with at most this many nodes, e.g. org.apache.commons before org.apache")
+    op.add_option("--expand", dest="expand", action="append", default=[], help="With --cluster, write the members of this cluster instead of the cluster, e.g. org.apache.commons (may be repeated)")
+    instrumentation.add_options(op)
 
     (options, args) = op.parse_args()
 
-    max_inputs = GraphProcessor.maximum_input_graphs()
-
     if not args:
         op.error("You must specify at least one input file. Use -h option to display help message.")
-    elif len(args) > max_inputs:
-        op.error("You cannot specify more than %d input files.  Use -h option to display help message." % max_inputs)
     
     input_file_names = args
     output_file_name = options.output_file
 
-    if len(input_file_names) < 2 and options.squash_version:
+    # with --state, later runs may add inputs to a single one
+    if len(input_file_names) < 2 and options.squash_version and not options.state_file:
         op.error("--squash-version is not effective for a single input file.  Use -h to display help message.")
 
-    if len(input_file_names) < 2 and options.analyze:
+    if len(input_file_names) < 2 and options.analyze and not options.state_file:
         op.error("--analyze is not effective for a single input file.  Use -h to display help message.")
 
+    if options.report_file and not options.analyze:
+        op.error("--report requires --analyze.  Use -h to display help message.")
 
-    gp = GraphProcessor()
+    if (options.depth is not None or options.reverse) and not options.root:
+        op.error("--depth and --reverse require --root.  Use -h to display help message.")
 
-    if options.styles_file:
-        style_f = open(options.styles_file, 'r')
-        style_json = json.load(style_f)
-        rules = NodeStyleRule.from_json(style_json)
-        gp.style_rules.extend(rules)
+    if options.depth is not None and options.depth < 0:
+        op.error("--depth must not be negative.  Use -h to display help message.")
 
-    if options.highlight_pattern:
-        gp.style_rules.append(NodeStyleRule(options.highlight_pattern, {'fillcolor': GraphProcessor.DEFAULT_COLORS['highlight'], 'style':'filled'}))
+    if options.format == 'bin' and not options.output_file:
+        op.error("--format bin requires -o.  Use -h to display help message.")
 
-    g = gp.process_graphs(input_file_names, options.squash_version, options.analyze)
+    if options.cluster_pattern and not options.cluster:
+        options.cluster = 'pattern'
 
-    if not options.output_file:
-        print(g.to_string())
-    else:
-        g.write(output_file_name, format=options.format)
+    if (options.max_nodes is not None or options.expand) and not options.cluster:
+        op.error("--max-nodes and --expand require --cluster.  Use -h to display help message.")
+
+    if options.cluster and options.cluster not in GraphCoarsening.MODES:
+        op.error("Invalid --cluster '%s'.  Use -h to display help message." % options.cluster)
+
+    if options.cluster == 'pattern' and not options.cluster_pattern:
+        op.error("--cluster pattern requires --cluster-pattern.  Use -h to display help message.")
+
+
+    if instrumentation.start(options).enabled:
+        stats().count_calls(DependencyGraph, 'get_node', 'get_node lookups')
+
+    gp = GraphProcessor(load_style_rules(options.styles_file, options.highlight_pattern))
+
+    jobs = options.jobs
+    if jobs < 0:
+        op.error("--jobs must not be negative.  Use -h to display help message.")
+    elif jobs == 0:
+        jobs = multiprocessing.cpu_count()
+
+    cache = None
+    if options.cache_dir:
+        cache = ParsedGraphCache(options.cache_dir, options.cache_size << 20)
+
+    report_file = None
+    if options.report_file == '-':
+        report_file = sys.stderr
+    elif options.report_file:
+        report_file = open(options.report_file, 'w')
+
+    try:
+        if options.state_file:
+            g = gp.process_incremental(input_file_names, options.state_file, options.squash_version, options.analyze, jobs, cache, report_file, options.root, options.depth, options.reverse)
+        else:
+            g = gp.process_graphs(input_file_names, options.squash_version, options.analyze, jobs, cache, report_file, options.root, options.depth, options.reverse)
+    except ValueError as e:
+        op.error(str(e))
+
+    if report_file and report_file is not sys.stderr:
+        report_file.close()
+
+    stats().record('nodes', len(g.nodes))
+    stats().record('edges', len(g.edges))
+
+    if options.index_file:
+        with stats().phase('index'):
+            ReachabilityIndex.build(g).save(options.index_file)
+
+    # the index is of the dependencies themselves, not the clusters
+    if options.cluster:
+        with stats().phase('coarsen'):
+            g, level = GraphProcessor.coarsen_graph(g, options.cluster, options.cluster_pattern, options.max_nodes, options.expand)
+        stats().record('cluster level', level)
+
+    with stats().phase('write'):
+        if not options.output_file:
+            DotWriter(stats().wrap_file(sys.stdout)).write(g)
+        elif options.format == 'bin':
+            g.write_binary(output_file_name)
+        elif options.format == 'raw':
+            f = open(output_file_name, 'w')
+            try:
+                DotWriter(stats().wrap_file(f)).write(g)
+            finally:
+                f.close()
+        else:
+            g.to_pydot().write(output_file_name, format=options.format)
+
+    instrumentation.finish(options)
     
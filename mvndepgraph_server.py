@@ -0,0 +1,392 @@
+#!/usr/bin/env python
+"""
+Serves the merged graph of mvndepgraph.py over HTTP, so that repeated
+requests don't each pay for starting Python and parsing every input.
+"""
+import sys, os, stat, json, time, signal, threading, optparse, multiprocessing, traceback
+from functools import partial
+from io import StringIO
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import UnixStreamServer
+    from urllib.parse import urlparse, parse_qs
+    from queue import Queue
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import UnixStreamServer
+    from urlparse import urlparse, parse_qs
+    from Queue import Queue
+
+from mvndepgraph import (GraphProcessor, MergeState, ReachabilityIndex, DotWriter, ParsedGraphCache,
+                         load_style_rules)
+
+
+class GraphSnapshot(object):
+    """
+    One version of the served graph.  It is never changed once built, so
+    requests can use it without locking while a newer one is loaded; only
+    the reachability index is built, once, on first use.
+    """
+
+    def __init__(self, generation, graph, inputs, subsets):
+        self.generation=generation
+        self.loaded=time.time()
+        self.graph=graph
+        self.inputs=inputs
+        self.subsets=subsets
+        self.index=None
+        self.lock=threading.Lock()
+
+        # the adjacency --root needs, built now rather than by racing requests
+        graph.adjacency()
+        graph.adjacency(True)
+
+    def reachability(self):
+        with self.lock:
+            if self.index is None:
+                self.index = ReachabilityIndex.build(self.graph)
+        return self.index
+
+
+class GraphService(object):
+    """
+    Keeps the inputs merged in a MergeState, so that when some of them
+    change on disk only those are parsed again, and publishes the result
+    as a new GraphSnapshot.
+    """
+
+    def __init__(self, file_names, processor, squash_versions=False, analyze=False, jobs=1, cache=None):
+        self.file_names=file_names
+        self.processor=processor
+        # versions are only squashed when there is something to merge
+        self.squash_versions=squash_versions and len(file_names) > 1
+        self.analyze=analyze
+        self.load=partial(GraphProcessor.load_graphs, squash_versions=self.squash_versions, jobs=jobs, cache=cache)
+        self.state=None
+        # (size, mtime) of each input at the last refresh that got past
+        # them, good or failed, so a failure is only retried on a change
+        self.stamps=None
+        self.snapshot=None
+        self.lock=threading.Lock()
+
+    def refresh(self):
+        """
+        Merge what changed since the last call, returning whether there is
+        a new snapshot.
+        """
+        with self.lock:
+            stamps = self.input_stamps()
+            if stamps == self.stamps:
+                return False
+            self.stamps = stamps
+
+            if self.state is None:
+                state = MergeState(self.squash_versions, self.analyze)
+                before = None
+            else:
+                # a failed update may leave the state half done, so work
+                # on a copy and keep the last good state until it succeeds
+                state = self.state.copy()
+                before = self.contents()
+
+            state.update(self.file_names, self.load, self.processor.style_rules)
+            self.state = state
+
+            # update() also asks for a save when it merely restyled nodes
+            if self.contents() == before and self.snapshot is not None:
+                return False
+
+            graph = self.state.to_graph()
+            graph.attributes['rankdir'] = 'LR'
+            generation = self.snapshot.generation + 1 if self.snapshot else 1
+            self.snapshot = GraphSnapshot(generation, graph, self.state.input_names(), self.state.shared_nodes())
+            return True
+
+    def input_stamps(self):
+        """
+        (size, mtime) of every input, None for one that can't be read.
+        """
+        stamps = []
+        for file_name in self.file_names:
+            try:
+                st = os.stat(file_name)
+                stamps.append((st.st_size, st.st_mtime))
+            except OSError:
+                stamps.append(None)
+        return stamps
+
+    def contents(self):
+        """
+        The inputs merged in the state, by content hash.
+        """
+        return sorted((name, signature[2]) for name, signature in self.state.signatures.items())
+
+    def watch(self, interval, log):
+        """
+        Call refresh() every interval seconds, forever.  Errors, like an
+        input caught half written, are logged, and retried once an input
+        changes again.
+        """
+        while True:
+            time.sleep(interval)
+            try:
+                if self.refresh():
+                    log('reloaded inputs, generation %d' % self.snapshot.generation)
+            except Exception:
+                log('reload failed, still serving generation %d\n%s' % (self.snapshot.generation, traceback.format_exc()))
+
+
+class RequestError(Exception):
+
+    def __init__(self, code, message):
+        Exception.__init__(self, message)
+        self.code=code
+
+
+class GraphRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET endpoints, each answering from the current snapshot:
+
+      /render    the graph as DOT, or ?format= any format dot can write;
+                 ?root=, ?depth= and ?reverse=1 work as the options of
+                 the same names
+      /subgraph  /render, with ?root= required
+      /analyze   the nodes shared by each subset of the inputs, as JSON
+      /depends   ?from=A&to=B, whether A depends on B, as JSON
+      /status    generation, load time and size of the graph, as JSON
+    """
+
+    protocol_version='HTTP/1.1'
+
+    def setup(self):
+        # every connection holds a worker of the pool, so an idle
+        # keep-alive client must let go of it
+        self.timeout = self.server.idle_timeout
+        BaseHTTPRequestHandler.setup(self)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = dict((k, v[-1]) for k, v in parse_qs(url.query).items())
+        snapshot = self.server.service.snapshot
+
+        handler = getattr(self, 'get_' + url.path.strip('/'), None)
+
+        try:
+            if handler is None:
+                raise RequestError(404, 'no such endpoint: %s' % url.path)
+            content_type, body = handler(snapshot, params)
+        except RequestError as e:
+            content_type, body = 'text/plain; charset=utf-8', str(e) + '\n'
+            self.reply(e.code, content_type, body)
+            return
+
+        self.reply(200, content_type, body)
+
+    def reply(self, code, content_type, body):
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def get_render(self, snapshot, params):
+        graph = snapshot.graph
+        root = params.get('root')
+
+        if root:
+            try:
+                depth = int(params['depth']) if 'depth' in params else None
+            except ValueError:
+                raise RequestError(400, 'depth must be a number')
+            if depth is not None and depth < 0:
+                raise RequestError(400, 'depth must not be negative')
+            try:
+                graph = GraphProcessor.extract_subgraph(graph, root, depth, params.get('reverse') in ('1', 'true', 'yes'))
+            except ValueError as e:
+                raise RequestError(404, str(e))
+            graph.attributes['rankdir'] = 'LR'
+        elif 'depth' in params or 'reverse' in params:
+            raise RequestError(400, 'depth and reverse require root')
+
+        format = params.get('format', 'dot')
+        if format in ('dot', 'raw'):
+            out = StringIO()
+            DotWriter(out).write(graph)
+            return 'text/vnd.graphviz; charset=utf-8', out.getvalue()
+
+        try:
+            return 'application/octet-stream', graph.to_pydot().create(format=format)
+        except Exception as e:
+            raise RequestError(400, 'cannot render format %s: %s' % (format, e))
+
+    def get_subgraph(self, snapshot, params):
+        if not params.get('root'):
+            raise RequestError(400, 'root is required')
+        return self.get_render(snapshot, params)
+
+    def get_analyze(self, snapshot, params):
+        subsets = []
+        for mask in sorted(snapshot.subsets, key=lambda m: (-bin(m).count('1'), m)):
+            inputs = [x for i, x in enumerate(snapshot.inputs) if mask >> i & 1]
+            subsets.append({'inputs': inputs, 'nodes': snapshot.subsets[mask]})
+        return 'application/json', json.dumps({'inputs': [x for x in snapshot.inputs if x is not None], 'subsets': subsets})
+
+    def get_depends(self, snapshot, params):
+        if not params.get('from') or not params.get('to'):
+            raise RequestError(400, 'from and to are required')
+        try:
+            answer = snapshot.reachability().depends_on(params['from'], params['to'])
+        except ValueError as e:
+            raise RequestError(404, str(e))
+        return 'application/json', json.dumps({'from': params['from'], 'to': params['to'], 'depends': answer})
+
+    def get_status(self, snapshot, params):
+        return 'application/json', json.dumps({
+            'generation': snapshot.generation,
+            'loaded': snapshot.loaded,
+            'inputs': [x for x in snapshot.inputs if x is not None],
+            'nodes': len(snapshot.graph.edge_node_names()),
+            'edges': len(snapshot.graph.edges),
+        })
+
+    def address_string(self):
+        # clients of a Unix socket have no address
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return 'unix'
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+class ThreadPoolMixIn(object):
+    """
+    Hands accepted connections to a fixed number of worker threads, rather
+    than to a new thread each like ThreadingMixIn.
+    """
+
+    def start_workers(self, count):
+        self.connections = Queue()
+        for i in range(count):
+            worker = threading.Thread(target=self.work)
+            worker.daemon = True
+            worker.start()
+
+    def process_request(self, request, client_address):
+        self.connections.put((request, client_address))
+
+    def work(self):
+        while True:
+            request, client_address = self.connections.get()
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+
+class GraphHTTPServer(ThreadPoolMixIn, HTTPServer):
+    pass
+
+
+class GraphUnixServer(ThreadPoolMixIn, UnixStreamServer):
+
+    def server_bind(self):
+        # a socket left behind by an earlier server, not some other file
+        try:
+            if stat.S_ISSOCK(os.stat(self.server_address).st_mode):
+                os.remove(self.server_address)
+        except OSError:
+            pass
+        UnixStreamServer.server_bind(self)
+
+
+def log(message):
+    sys.stderr.write('%s %s\n' % (time.strftime('%Y-%m-%d %H:%M:%S'), message))
+
+
+if __name__ == '__main__':
+
+    usage="""usage: %prog [options] INPUT_FILE_NAMES
+
+Loads and merges the DOT files of mvn dependency:tree once, like mvndepgraph.py, then answers requests for the
+graph over HTTP on localhost or on a Unix socket, reloading inputs that change on disk.  Endpoints: /render,
+/subgraph?root=, /analyze, /depends?from=&to= and /status."""
+
+    op = optparse.OptionParser(usage=usage)
+    op.add_option("--port", dest="port", type="int", default=8000, help="Port to listen on, on 127.0.0.1 (8000 by default)")
+    op.add_option("--socket", dest="socket", default=None, help="Listen on this Unix socket instead of a port")
+    op.add_option("--threads", dest="threads", type="int", default=4, help="Number of threads serving requests (4 by default)")
+    op.add_option("--poll", dest="poll", type="float", default=2.0, help="Seconds between checks of the inputs for changes (2 by default, 0 never to reload)")
+    op.add_option("--idle-timeout", dest="idle_timeout", type="float", default=5.0, help="Seconds after which an idle keep-alive connection is closed, freeing its thread (5 by default)")
+    op.add_option("--quiet", dest="quiet", action="store_true", default=False, help="Don't log every request to stderr")
+    op.add_option("--squash-version", dest="squash_version", action="store_true", default=False, help="Remove versions from dependencies, as with mvndepgraph.py")
+    op.add_option("--analyze", dest="analyze", action="store_true", default=False, help="Color intersections and differences of the inputs, as with mvndepgraph.py")
+    op.add_option("--highlight-pattern", dest="highlight_pattern", default=None, help="Regular expression that includes dependencies to highlight, as with mvndepgraph.py")
+    op.add_option("--styles", dest="styles_file", default=None, help="Path to JSON file containing style rules, as with mvndepgraph.py")
+    op.add_option("--jobs", dest="jobs", type="int", default=1, help="Number of processes used to parse the input files (1 by default, 0 for one per CPU)")
+    op.add_option("--cache-dir", dest="cache_dir", default=None, help="Directory in which to cache parsed input files between runs (no caching by default)")
+
+    (options, args) = op.parse_args()
+
+    if not args:
+        op.error("You must specify at least one input file. Use -h option to display help message.")
+
+    if options.threads < 1:
+        op.error("--threads must be at least 1.  Use -h to display help message.")
+
+    if options.idle_timeout <= 0:
+        op.error("--idle-timeout must be positive.  Use -h to display help message.")
+
+    if options.poll < 0:
+        op.error("--poll must not be negative.  Use -h to display help message.")
+
+    jobs = options.jobs
+    if jobs < 0:
+        op.error("--jobs must not be negative.  Use -h to display help message.")
+    elif jobs == 0:
+        jobs = multiprocessing.cpu_count()
+
+    cache = None
+    if options.cache_dir:
+        cache = ParsedGraphCache(options.cache_dir)
+
+    processor = GraphProcessor(load_style_rules(options.styles_file, options.highlight_pattern))
+    service = GraphService(args, processor, options.squash_version, options.analyze, jobs, cache)
+    service.refresh()
+
+    if options.socket:
+        server = GraphUnixServer(options.socket, GraphRequestHandler)
+        address = options.socket
+    else:
+        server = GraphHTTPServer(('127.0.0.1', options.port), GraphRequestHandler)
+        address = 'http://127.0.0.1:%d/' % server.server_address[1]
+
+    server.service = service
+    server.quiet = options.quiet
+    server.idle_timeout = options.idle_timeout
+    server.start_workers(options.threads)
+
+    if options.poll:
+        watcher = threading.Thread(target=service.watch, args=(options.poll, log))
+        watcher.daemon = True
+        watcher.start()
+
+    # clean up on kill as on Ctrl-C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    log('serving %d input(s) on %s' % (len(args), address))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if options.socket:
+            os.remove(options.socket)
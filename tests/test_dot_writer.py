@@ -0,0 +1,79 @@
+"""
+Round trips of mvndepgraph.DotWriter output.
+"""
+import os, sys, tempfile, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from mvndepgraph import DependencyGraph, DotWriter, parse_dependency_graph
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+try:
+    import pydot
+except ImportError:
+    pydot = None
+
+
+DEFAULTS_DOT = """digraph G {
+rankdir=LR;
+node [shape=box];
+"a:b:jar:1.0" -> "c:d:jar:2.0:compile";
+edge [color=red];
+"c:d:jar:2.0:compile" -> "e:f:jar:3.0:test";
+}
+"""
+
+
+def write(graph):
+    out = StringIO()
+    DotWriter(out).write(graph)
+    return out.getvalue()
+
+
+class DotWriterTest(unittest.TestCase):
+
+    def test_default_statements_are_not_quoted(self):
+        # what pydot hands back for the 'node [...]' and 'edge [...]' lines
+        graph = DependencyGraph('G')
+        graph.add_node('node', {'shape': 'box'})
+        graph.add_edge('"a"', '"b"')
+        graph.add_node('edge', {'color': 'red'})
+        graph.add_node('graph', {'rankdir': 'LR'})
+
+        lines = write(graph).splitlines()
+        self.assertIn('node [shape=box];', lines)
+        self.assertIn('edge [color=red];', lines)
+        self.assertIn('graph [rankdir=LR];', lines)
+
+    def test_node_named_like_a_keyword_in_an_edge_is_quoted(self):
+        graph = DependencyGraph('G')
+        graph.add_edge('node', 'edge')
+        self.assertIn('"node" -> "edge";', write(graph).splitlines())
+
+    @unittest.skipUnless(pydot, 'pydot is not installed')
+    def test_round_trip_through_pydot_keeps_defaults(self):
+        fd, file_name = tempfile.mkstemp(suffix='.dot')
+        try:
+            f = os.fdopen(fd, 'w')
+            f.write(DEFAULTS_DOT)
+            f.close()
+
+            graph = parse_dependency_graph(file_name)
+            first = write(graph)
+            self.assertIn('node [shape=box];', first.splitlines())
+            self.assertIn('edge [color=red];', first.splitlines())
+
+            f = open(file_name, 'w')
+            f.write(first)
+            f.close()
+            self.assertEqual(first, write(parse_dependency_graph(file_name)))
+        finally:
+            os.remove(file_name)
+
+
+if __name__ == '__main__':
+    unittest.main()
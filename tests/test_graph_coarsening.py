@@ -0,0 +1,82 @@
+"""
+Clusters built by graph_analytics.GraphCoarsening.
+"""
+import os, sys, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from graph_adjacency_list import AdjacencyGraph
+from graph_analytics import GraphCoarsening
+from mvndepgraph import DependencyGraph, GraphProcessor
+
+
+def adjacency(edges, names=()):
+    graph = AdjacencyGraph()
+    core = graph.core
+    for src, dst in edges:
+        core.addEdge(core.intern(src), core.intern(dst))
+    for name in names:
+        core.intern(name)
+    return graph
+
+
+def edge_names(graph):
+    names = graph.core.names
+    offsets, targets = graph.core.outAdjacency()
+    return set((names[v], names[w]) for v in range(len(names)) for w in targets[offsets[v]:offsets[v+1]])
+
+
+class GroupLevelTest(unittest.TestCase):
+
+    def test_levels_nest(self):
+        graph = adjacency([('org.example:app', 'org.example.io:files'),
+                           ('org.example.io:files', 'org.example.net.http:client'),
+                           ('org.example.net.http:client', 'com.other:lib')])
+        coarsening = GraphCoarsening(graph, 'group')
+        self.assertEqual(coarsening.levelCount(), 5)
+
+        self.assertEqual(coarsening.keys(1), ['org.example', 'org.example.io', 'org.example.net.http', 'com.other'])
+        self.assertEqual(coarsening.keys(2), ['org.example', 'org.example.io', 'org.example.net', 'com.other'])
+        self.assertEqual(coarsening.keys(3), ['org.example', 'org.example', 'org.example', 'com.other'])
+        self.assertEqual(coarsening.keys(4), ['org', 'org', 'org', 'com'])
+
+        for level in range(1, coarsening.levelCount() - 1):
+            finer = coarsening.keys(level)
+            coarser = coarsening.keys(level + 1)
+            merged = {}
+            for fine, coarse in zip(finer, coarser):
+                self.assertEqual(merged.setdefault(fine, coarse), coarse)
+
+
+class ClusterNameTest(unittest.TestCase):
+
+    def test_cluster_does_not_swallow_node_of_same_name(self):
+        graph = adjacency([('a.b:1', 'a.b'), ('a.b:2', 'a.b'), ('a.b:1', 'a.b:2')])
+        clusters, members, multiplicities = GraphCoarsening(graph, 'group').coarsen(1)
+
+        self.assertEqual(sorted(clusters.core.names), ['a.b', 'a.b~'])
+        self.assertEqual(members, {'a.b~': ('a.b', 2)})
+        self.assertEqual(GraphCoarsening.labels(members), {'a.b~': 'a.b (2)'})
+        self.assertEqual(edge_names(clusters), set([('a.b~', 'a.b')]))
+        self.assertEqual(multiplicities, {('a.b~', 'a.b'): 2})
+
+    def test_expanded_cluster_keeps_its_members(self):
+        graph = adjacency([('a.b:1', 'a.b'), ('a.b:2', 'c:1')])
+        clusters, members, multiplicities = GraphCoarsening(graph, 'group').coarsen(1, ['a.b'])
+
+        self.assertEqual(members, {'c': ('c', 1)})
+        self.assertEqual(edge_names(clusters), set([('a.b:1', 'a.b'), ('a.b:2', 'c')]))
+
+    def test_quoted_dependency_graph(self):
+        graph = DependencyGraph('G', 'digraph', {})
+        graph.add_edge('"a.b:1"', '"a.b"')
+        graph.add_edge('"a.b:2"', '"a.b"')
+        coarse, level = GraphProcessor.coarsen_graph(graph, 'group')
+
+        self.assertEqual(level, 1)
+        self.assertEqual([(src, dst) for src, dst, attributes in coarse.edges], [('"a.b~"', '"a.b"')])
+        self.assertEqual(coarse.get_node('"a.b~"')['label'], 'a.b (2)')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+"""
+Incremental merges through mvndepgraph.MergeState, checked against
+process_graphs on the same inputs.
+"""
+import os, shutil, sys, tempfile, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from mvndepgraph import GraphProcessor, DotWriter, load_style_rules
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+try:
+    import pydot
+except ImportError:
+    pydot = None
+
+
+INPUTS = {
+    'app': [('g:app:jar:1', 'g:core:jar:1'), ('g:app:jar:1', 'org.slf4j:slf4j-api:jar:1.7'),
+            ('g:core:jar:1', 'g:util:jar:1'), ('g:app:jar:1', 'g:core:jar:1')],
+    'web': [('g:web:war:1', 'g:core:jar:1'), ('g:core:jar:1', 'g:util:jar:2'),
+            ('g:web:war:1', 'org.slf4j:slf4j-api:jar:1.7')],
+    'cli': [('g:cli:jar:1', 'g:core:jar:1'), ('g:cli:jar:1', 'g:util:jar:1'),
+            ('g:core:jar:1', 'g:util:jar:1')],
+}
+
+
+def dot(name, edges):
+    lines = ['digraph "%s" {' % name]
+    lines.extend(' "%s" -> "%s" ; ' % edge for edge in edges)
+    lines.append(' } ')
+    return '\n'.join(lines) + '\n'
+
+
+def write_dot(graph):
+    out = StringIO()
+    DotWriter(out).write(graph)
+    return out.getvalue()
+
+
+class MergeStateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.state_file = os.path.join(self.dir, 'state')
+        self.processor = GraphProcessor(load_style_rules(None, '^"org\\.slf4j.*$'))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write_input(self, name, edges):
+        file_name = os.path.join(self.dir, name + '.dot')
+        f = open(file_name, 'w')
+        try:
+            f.write(dot(edges[0][0], edges))
+        finally:
+            f.close()
+        return file_name
+
+    def check(self, file_names, **options):
+        expected = write_dot(self.processor.process_graphs(file_names, **options))
+        actual = write_dot(self.processor.process_incremental(file_names, self.state_file, **options))
+        self.assertEqual(actual, expected)
+
+    def check_steps(self, **options):
+        app = self.write_input('app', INPUTS['app'])
+        web = self.write_input('web', INPUTS['web'])
+        cli = self.write_input('cli', INPUTS['cli'])
+
+        self.check([app, web], **options)
+        # added
+        self.check([app, web, cli], **options)
+        # changed
+        self.write_input('web', INPUTS['web'] + [('g:web:war:1', 'g:extra:jar:1')])
+        self.check([app, web, cli], **options)
+        # removed, so the inputs after it move up
+        self.check([web, cli], **options)
+        # added again, now last
+        self.check([web, cli, app], **options)
+        self.check([web], **options)
+
+    def test_merge(self):
+        self.check_steps()
+
+    def test_analyze(self):
+        self.check_steps(analyze=True)
+
+    def test_squash_and_analyze(self):
+        self.check_steps(squash_versions=True, analyze=True)
+
+    def test_root(self):
+        self.check_steps(analyze=True, root='g:core:jar:1')
+
+    @unittest.skipIf(pydot is None, 'pydot is not installed')
+    def test_node_statements(self):
+        file_name = os.path.join(self.dir, 'styled.dot')
+        f = open(file_name, 'w')
+        try:
+            f.write('digraph G {\nbgcolor=white;\nx [color=red];\nx -> y [style=dashed];\n'
+                    '"org.slf4j:api" [shape=box];\ny -> "org.slf4j:api";\n}\n')
+        finally:
+            f.close()
+        app = self.write_input('app', INPUTS['app'])
+
+        self.check([file_name])
+        self.check([file_name, app], analyze=True)
+        self.check([app, file_name], analyze=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+"""
+--root subgraphs of mvndepgraph.DependencyGraph.
+"""
+import os, sys, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from mvndepgraph import DependencyGraph, GraphProcessor, ReachabilityIndex
+
+
+def module():
+    graph = DependencyGraph('"g:app:jar:1"')
+    graph.add_edge('"g:app:jar:1"', '"g:lib:jar:2.0:compile"')
+    graph.add_edge('"g:app:jar:1"', '"g:lib:jar:2.0:test"')
+    graph.add_edge('"g:app:jar:1"', '"g:other:jar:1:compile"')
+    graph.add_edge('"g:other:jar:1:compile"', '"g:leaf:jar:1:compile"')
+    return graph
+
+
+def edges(graph):
+    return [(src, dst) for src, dst, attributes in graph.edges]
+
+
+def nodes(graph):
+    return [name for name, attributes in graph.nodes]
+
+
+class SubgraphTest(unittest.TestCase):
+
+    def test_leaf_root(self):
+        graph = GraphProcessor.extract_subgraph(module(), 'g:leaf:jar:1:compile')
+        self.assertEqual(edges(graph), [])
+        self.assertEqual(nodes(graph), ['"g:leaf:jar:1:compile"'])
+
+    def test_depth_zero(self):
+        graph = GraphProcessor.extract_subgraph(module(), 'g:app:jar:1', 0)
+        self.assertEqual(edges(graph), [])
+        self.assertEqual(nodes(graph), ['"g:app:jar:1"'])
+
+    def test_reached_nodes_get_no_extra_statements(self):
+        graph = GraphProcessor.extract_subgraph(module(), 'g:other:jar:1:compile', 1)
+        self.assertEqual(edges(graph), [('"g:other:jar:1:compile"', '"g:leaf:jar:1:compile"')])
+        self.assertEqual(nodes(graph), [])
+
+    def test_coordinate_prefix(self):
+        graph = GraphProcessor.extract_subgraph(module(), 'g:other:jar', reverse=True)
+        self.assertEqual(edges(graph), [('"g:app:jar:1"', '"g:other:jar:1:compile"')])
+
+    def test_ambiguous_prefix(self):
+        with self.assertRaises(ValueError) as raised:
+            GraphProcessor.extract_subgraph(module(), 'g:lib:jar')
+        self.assertIn('matches 2 dependencies', str(raised.exception))
+
+    def test_unknown_root(self):
+        self.assertRaises(ValueError, GraphProcessor.extract_subgraph, module(), 'g:nope')
+
+    def test_resolve_matches_index(self):
+        graph = module()
+        index = ReachabilityIndex.build(graph)
+        for name in ('g:lib:jar', 'g:lib:jar:2.0:test', '"g:app:jar:1"', 'g:app', 'g:nope'):
+            self.assertEqual(graph.resolve(name), [index.names[i] for i in index.resolve(name)])
+
+
+if __name__ == '__main__':
+    unittest.main()